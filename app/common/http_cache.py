@@ -0,0 +1,169 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import (
+    format_datetime,
+    parsedate_to_datetime,
+)
+
+
+def get_strong_etag(value: str) -> str:
+    return f'"{value}"'
+
+
+def get_weak_etag(*values) -> str:
+    """
+    Weak etag of a representation which is identified by values,
+    e.g. rows count and last modification date of a listing
+    """
+    values_hash = hashlib.sha1(
+        repr(values).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return f'W/"{values_hash}"'
+
+
+def to_http_date(date: datetime) -> str:
+    """
+    Naive datetimes are stored in UTC
+    """
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return format_datetime(date, usegmt=True)
+
+
+def parse_http_date(
+    value: str | None,
+) -> datetime | None:
+    if not value:
+        return None
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date
+
+
+def is_etag_matched(
+    if_none_match: str | None, etag: str
+) -> bool:
+    """
+    If-None-Match uses weak comparison, so W/"a" matches "a"
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    etag = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == etag
+        for tag in if_none_match.split(",")
+    )
+
+
+def is_not_modified(
+    if_none_match: str | None,
+    if_modified_since: str | None,
+    etag: str,
+    last_modified: datetime | None = None,
+) -> bool:
+    """
+    If-Modified-Since is ignored if If-None-Match is sent
+    """
+    if if_none_match:
+        return is_etag_matched(
+            if_none_match, etag
+        )
+
+    modified_since = parse_http_date(
+        if_modified_since
+    )
+    if not modified_since or not last_modified:
+        return False
+
+    return (
+        parse_http_date(
+            to_http_date(last_modified)
+        )
+        <= modified_since
+    )
+
+
+def parse_cache_control(
+    value: str | None,
+) -> dict[str, str | None]:
+    """
+    Cache-Control directives by lowercase name, e.g. {"max-age": "60", "no-cache": None}
+    """
+    directives = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.partition(
+            "="
+        )
+        name = name.strip().lower()
+        if name:
+            directives[name] = (
+                argument.strip().strip('"')
+                or None
+            )
+    return directives
+
+
+def is_shared_cache_storable(
+    cache_control: str | None,
+) -> bool:
+    directives = parse_cache_control(
+        cache_control
+    )
+    return not (
+        "no-store" in directives
+        or "private" in directives
+    )
+
+
+def get_freshness_lifetime(
+    cache_control: str | None,
+    expires: str | None,
+    date: str | None,
+    default: int,
+) -> int:
+    """
+    Seconds a response stays fresh in a shared cache: s-maxage, max-age,
+    Expires relative to Date, otherwise default
+    """
+    directives = parse_cache_control(
+        cache_control
+    )
+    if "no-cache" in directives:
+        return 0
+
+    for directive in ("s-maxage", "max-age"):
+        lifetime = directives.get(directive)
+        if lifetime is not None:
+            try:
+                return max(int(lifetime), 0)
+            except ValueError:
+                return 0
+
+    if expires is not None:
+        expires_date = parse_http_date(expires)
+        if not expires_date:
+            return 0
+        response_date = parse_http_date(
+            date
+        ) or datetime.now(timezone.utc)
+        return max(
+            int(
+                (
+                    expires_date - response_date
+                ).total_seconds()
+            ),
+            0,
+        )
+
+    return default
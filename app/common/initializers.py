@@ -6,13 +6,28 @@ from folder_router.utils import (
 from layers_router.utils import (
     LayerDatabaseGetter,
 )
+from services.storage_service.async_storage import (
+    AsyncMinioInitializer,
+    get_async_minio_initializer,
+)
 from services.storage_service.utils import (
     MinioInitializer,
+    get_minio_initializer,
+)
+from upload_session_router.utils import (
+    UploadSessionDatabaseGetter,
 )
 
 
 class Initializer:
-    def __init__(self, session: Session):
+    def __init__(
+        self,
+        session: Session,
+        minio_client: MinioInitializer
+        | None = None,
+        async_minio_client: AsyncMinioInitializer
+        | None = None,
+    ):
         self._session = session
 
         self._layer_db_getter = (
@@ -21,4 +36,16 @@ class Initializer:
         self._folder_db_getter = (
             FolderDatabaseGetter(session=session)
         )
-        self._minio_client = MinioInitializer()
+        self._upload_session_db_getter = (
+            UploadSessionDatabaseGetter(
+                session=session
+            )
+        )
+        self._minio_client = (
+            minio_client
+            or get_minio_initializer()
+        )
+        self._async_minio_client = (
+            async_minio_client
+            or get_async_minio_initializer()
+        )
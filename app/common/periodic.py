@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Callable
+
+from starlette.concurrency import (
+    run_in_threadpool,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Runs blocking func in the thread pool every interval seconds
+    while the application is running. Next run can be started earlier by trigger
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], object],
+        interval: float,
+    ):
+        self._name = name
+        self._func = func
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+        self._triggered: asyncio.Event | None = (
+            None
+        )
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(
+                    self._func
+                )
+            except Exception:
+                logger.exception(
+                    "Periodic task %s failed",
+                    self._name,
+                )
+            try:
+                await asyncio.wait_for(
+                    self._triggered.wait(),
+                    timeout=self._interval,
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._triggered.clear()
+
+    def start(self):
+        if self._task is None:
+            self._triggered = asyncio.Event()
+            self._task = asyncio.create_task(
+                self._run(), name=self._name
+            )
+
+    def trigger(self):
+        """
+        Starts the next run without waiting for the interval. Must be called
+        from the event loop the task is running in, does nothing if task is not started
+        """
+        if self._triggered is not None:
+            self._triggered.set()
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,44 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: while a call is in flight other
+    callers with the same key wait for it and get its result (or exception).
+    Waiters are shielded, so a cancelled caller doesn't cancel the shared call
+    """
+
+    def __init__(self):
+        self._calls: dict[
+            Hashable, asyncio.Task
+        ] = {}
+
+    def _forget(
+        self, key: Hashable, task: asyncio.Task
+    ):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    async def run(
+        self,
+        key: Hashable,
+        func: Callable[[], Awaitable],
+    ):
+        task = self._calls.get(key)
+        if (
+            task is None
+            or task.get_loop()
+            is not asyncio.get_running_loop()
+        ):
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(
+                lambda done_task: self._forget(
+                    key, done_task
+                )
+            )
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,29 @@
+import os
+
+CONTENT_CACHE_MEMORY_SIZE = int(
+    os.environ.get(
+        "CONTENT_CACHE_MEMORY_SIZE",
+        256 * 1024 * 1024,
+    )
+)
+CONTENT_CACHE_MEMORY_MAX_ITEM_SIZE = int(
+    os.environ.get(
+        "CONTENT_CACHE_MEMORY_MAX_ITEM_SIZE",
+        16 * 1024 * 1024,
+    )
+)
+CONTENT_CACHE_DISK_DIRECTORY = os.environ.get(
+    "CONTENT_CACHE_DISK_DIRECTORY", None
+)
+CONTENT_CACHE_DISK_SIZE = int(
+    os.environ.get(
+        "CONTENT_CACHE_DISK_SIZE",
+        4 * 1024 * 1024 * 1024,
+    )
+)
+CONTENT_CACHE_DISK_MAX_ITEM_SIZE = int(
+    os.environ.get(
+        "CONTENT_CACHE_DISK_MAX_ITEM_SIZE",
+        1024 * 1024 * 1024,
+    )
+)
@@ -0,0 +1,21 @@
+import os
+
+LAYER_INGEST_INTERVAL = int(
+    os.environ.get("LAYER_INGEST_INTERVAL", 10)
+)
+LAYER_INGEST_BATCH_SIZE = int(
+    os.environ.get("LAYER_INGEST_BATCH_SIZE", 1)
+)
+LAYER_INGEST_TIMEOUT = int(
+    os.environ.get(
+        "LAYER_INGEST_TIMEOUT", 60 * 60
+    )
+)
+LAYER_INGEST_MAX_ATTEMPTS = int(
+    os.environ.get("LAYER_INGEST_MAX_ATTEMPTS", 5)
+)
+LAYER_INGEST_MAX_SIZE = int(
+    os.environ.get(
+        "LAYER_INGEST_MAX_SIZE", 256 * 1024 * 1024
+    )
+)
@@ -0,0 +1,32 @@
+import os
+
+LINK_CACHE_CONNECT_TIMEOUT = float(
+    os.environ.get(
+        "LINK_CACHE_CONNECT_TIMEOUT", 5
+    )
+)
+LINK_CACHE_FETCH_TIMEOUT = float(
+    os.environ.get("LINK_CACHE_FETCH_TIMEOUT", 60)
+)
+LINK_CACHE_MAX_CONNECTIONS = int(
+    os.environ.get(
+        "LINK_CACHE_MAX_CONNECTIONS", 32
+    )
+)
+LINK_CACHE_DEFAULT_TTL = int(
+    os.environ.get(
+        "LINK_CACHE_DEFAULT_TTL", 5 * 60
+    )
+)
+LINK_CACHE_MAX_SIZE = int(
+    os.environ.get(
+        "LINK_CACHE_MAX_SIZE", 256 * 1024 * 1024
+    )
+)
+LINK_CACHE_ALLOWED_HOSTS = {
+    host.strip()
+    for host in os.environ.get(
+        "LINK_CACHE_ALLOWED_HOSTS", ""
+    ).split(",")
+    if host.strip()
+}
@@ -15,3 +15,63 @@ MINIO_BUCKET = os.environ.get(
 MINIO_SECURE = os.environ.get(
     "MINIO_SECURE", "False"
 ).upper() in ("TRUE", "Y", "YES", "1")
+MINIO_PART_SIZE = int(
+    os.environ.get(
+        "MINIO_PART_SIZE", 10 * 1024 * 1024
+    )
+)
+MINIO_PARALLEL_UPLOADS = int(
+    os.environ.get("MINIO_PARALLEL_UPLOADS", 4)
+)
+MINIO_MULTIPART_THRESHOLD = int(
+    os.environ.get(
+        "MINIO_MULTIPART_THRESHOLD",
+        64 * 1024 * 1024,
+    )
+)
+MINIO_PRESIGNED_URL_EXPIRES = int(
+    os.environ.get(
+        "MINIO_PRESIGNED_URL_EXPIRES", 60 * 60
+    )
+)
+MINIO_MAX_CONNECTIONS = int(
+    os.environ.get("MINIO_MAX_CONNECTIONS", 32)
+)
+MINIO_CONNECT_TIMEOUT = float(
+    os.environ.get("MINIO_CONNECT_TIMEOUT", 5)
+)
+MINIO_READ_TIMEOUT = float(
+    os.environ.get("MINIO_READ_TIMEOUT", 300)
+)
+MINIO_RETRIES = int(
+    os.environ.get("MINIO_RETRIES", 3)
+)
+MINIO_EXECUTOR_WORKERS = int(
+    os.environ.get(
+        "MINIO_EXECUTOR_WORKERS",
+        MINIO_MAX_CONNECTIONS,
+    )
+)
+MINIO_OPERATION_TIMEOUT = float(
+    os.environ.get("MINIO_OPERATION_TIMEOUT", 30)
+)
+MINIO_REDIRECT_URL_EXPIRES = int(
+    os.environ.get(
+        "MINIO_REDIRECT_URL_EXPIRES", 5 * 60
+    )
+)
+MINIO_REDIRECT_URL_REFRESH_MARGIN = int(
+    os.environ.get(
+        "MINIO_REDIRECT_URL_REFRESH_MARGIN", 60
+    )
+)
+MINIO_REDIRECT_URL_CACHE_SIZE = int(
+    os.environ.get(
+        "MINIO_REDIRECT_URL_CACHE_SIZE", 10000
+    )
+)
+MINIO_UPLOAD_TIMEOUT = float(
+    os.environ.get(
+        "MINIO_UPLOAD_TIMEOUT", 60 * 60
+    )
+)
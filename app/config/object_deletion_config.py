@@ -0,0 +1,15 @@
+import os
+
+OBJECT_DELETION_INTERVAL = int(
+    os.environ.get("OBJECT_DELETION_INTERVAL", 10)
+)
+OBJECT_DELETION_BATCH_SIZE = int(
+    os.environ.get(
+        "OBJECT_DELETION_BATCH_SIZE", 1000
+    )
+)
+OBJECT_DELETION_MAX_RETRY_DELAY = int(
+    os.environ.get(
+        "OBJECT_DELETION_MAX_RETRY_DELAY", 60 * 60
+    )
+)
@@ -0,0 +1,17 @@
+import os
+
+SPATIAL_INDEX_NODE_SIZE = int(
+    os.environ.get("SPATIAL_INDEX_NODE_SIZE", 16)
+)
+SPATIAL_INDEX_CACHE_SIZE = int(
+    os.environ.get(
+        "SPATIAL_INDEX_CACHE_SIZE",
+        64 * 1024 * 1024,
+    )
+)
+SPATIAL_INDEX_MAX_RANGE_GAP = int(
+    os.environ.get(
+        "SPATIAL_INDEX_MAX_RANGE_GAP",
+        64 * 1024,
+    )
+)
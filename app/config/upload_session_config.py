@@ -0,0 +1,18 @@
+import os
+
+UPLOAD_SESSION_TTL = int(
+    os.environ.get(
+        "UPLOAD_SESSION_TTL", 60 * 60 * 24
+    )
+)
+UPLOAD_SESSION_GC_INTERVAL = int(
+    os.environ.get(
+        "UPLOAD_SESSION_GC_INTERVAL", 60 * 60
+    )
+)
+UPLOAD_SESSION_MAX_PART_SIZE = int(
+    os.environ.get(
+        "UPLOAD_SESSION_MAX_PART_SIZE",
+        64 * 1024 * 1024,
+    )
+)
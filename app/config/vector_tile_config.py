@@ -0,0 +1,32 @@
+import os
+
+VECTOR_TILE_EXTENT = int(
+    os.environ.get("VECTOR_TILE_EXTENT", 4096)
+)
+VECTOR_TILE_BUFFER = int(
+    os.environ.get("VECTOR_TILE_BUFFER", 64)
+)
+VECTOR_TILE_SIMPLIFY_TOLERANCE = float(
+    os.environ.get(
+        "VECTOR_TILE_SIMPLIFY_TOLERANCE", 1.0
+    )
+)
+VECTOR_TILE_MAX_ZOOM = int(
+    os.environ.get("VECTOR_TILE_MAX_ZOOM", 24)
+)
+VECTOR_TILE_CACHE_SIZE = int(
+    os.environ.get(
+        "VECTOR_TILE_CACHE_SIZE",
+        64 * 1024 * 1024,
+    )
+)
+VECTOR_TILE_PYRAMID_MAX_ZOOM = int(
+    os.environ.get(
+        "VECTOR_TILE_PYRAMID_MAX_ZOOM", 12
+    )
+)
+VECTOR_TILE_PYRAMID_MAX_TILES = int(
+    os.environ.get(
+        "VECTOR_TILE_PYRAMID_MAX_TILES", 100000
+    )
+)
@@ -0,0 +1,341 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from config.content_cache_config import (
+    CONTENT_CACHE_DISK_DIRECTORY,
+    CONTENT_CACHE_DISK_SIZE,
+    CONTENT_CACHE_DISK_MAX_ITEM_SIZE,
+)
+
+
+@dataclass
+class CachedFile:
+    path: str
+    size: int
+    content_type: str | None
+    file_descriptor: int | None = field(
+        default=None, repr=False, compare=False
+    )
+
+    def open(self) -> "CachedFile":
+        """
+        Copy of the cached file with an open descriptor, an evicted file stays readable
+        until the copy is closed
+        """
+        return CachedFile(
+            path=self.path,
+            size=self.size,
+            content_type=self.content_type,
+            file_descriptor=os.open(
+                self.path, os.O_RDONLY
+            ),
+        )
+
+    def close(self):
+        if self.file_descriptor is not None:
+            os.close(self.file_descriptor)
+            self.file_descriptor = None
+
+    def __del__(self):
+        self.close()
+
+    def _read_chunks(
+        self,
+        file_descriptor: int,
+        offset: int,
+        remaining: int,
+        chunk_size: int,
+    ) -> Iterator[bytes]:
+        while remaining > 0:
+            chunk = os.pread(
+                file_descriptor,
+                min(chunk_size, remaining),
+                offset,
+            )
+            if not chunk:
+                break
+            offset += len(chunk)
+            remaining -= len(chunk)
+            yield chunk
+
+    def get_chunks(
+        self,
+        offset: int = 0,
+        length: int = 0,
+        chunk_size: int = 1024 * 1024,
+    ) -> Iterator[bytes]:
+        """
+        Same interface as MinioInitializer.get_file_chunks, length 0 means till the end.
+        Not opened file is opened on the first chunk
+        """
+        remaining = length or self.size - offset
+        if self.file_descriptor is not None:
+            yield from self._read_chunks(
+                file_descriptor=self.file_descriptor,
+                offset=offset,
+                remaining=remaining,
+                chunk_size=chunk_size,
+            )
+            return
+
+        with open(self.path, "rb") as file:
+            yield from self._read_chunks(
+                file_descriptor=file.fileno(),
+                offset=offset,
+                remaining=remaining,
+                chunk_size=chunk_size,
+            )
+
+
+class DiskContentCache:
+    """
+    LRU cache of minio objects in a local directory, bounded by total size of cached
+    files. Objects are keyed by object name and etag. Files are downloaded to a temporary
+    file and renamed, so a cached file is always complete. Returned files are opened
+    under the cache lock, so eviction can't remove a file before it is read.
+    Cache index is kept in memory, so every worker process has its own directory
+    """
+
+    def __init__(
+        self,
+        directory: str
+        | None = CONTENT_CACHE_DISK_DIRECTORY,
+        max_size: int = CONTENT_CACHE_DISK_SIZE,
+        max_item_size: int = CONTENT_CACHE_DISK_MAX_ITEM_SIZE,
+    ):
+        self._max_size = max_size
+        self._max_item_size = min(
+            max_item_size, max_size
+        )
+        self._directory: str | None = None
+        self._parent_directory = directory
+        self._files: OrderedDict[
+            tuple[str, str], CachedFile
+        ] = OrderedDict()
+        self._size = 0
+        self._writing_keys: set[
+            tuple[str, str]
+        ] = set()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _get_directory(self) -> str:
+        if self._directory is None:
+            if self._parent_directory:
+                os.makedirs(
+                    self._parent_directory,
+                    exist_ok=True,
+                )
+            self._directory = tempfile.mkdtemp(
+                prefix="layers-content-",
+                dir=self._parent_directory,
+            )
+        return self._directory
+
+    def is_cacheable(self, size: int) -> bool:
+        return 0 < size <= self._max_item_size
+
+    def get(
+        self, object_name: str, etag: str
+    ) -> CachedFile | None:
+        """
+        Opened cached file, it should be closed after reading
+        """
+        key = (object_name, etag)
+        with self._lock:
+            cached_file = self._files.get(key)
+            if not cached_file:
+                self._misses += 1
+                return None
+
+            self._files.move_to_end(key)
+            self._hits += 1
+            return cached_file.open()
+
+    def _evict(self) -> list[CachedFile]:
+        evicted_files = []
+        while self._size > self._max_size:
+            _, cached_file = self._files.popitem(
+                last=False
+            )
+            self._size -= cached_file.size
+            self._evictions += 1
+            evicted_files.append(cached_file)
+        return evicted_files
+
+    def _create_temp_file(
+        self,
+    ) -> tuple[int, str]:
+        return tempfile.mkstemp(
+            dir=self._get_directory(),
+            suffix=".tmp",
+        )
+
+    def _add(
+        self,
+        object_name: str,
+        etag: str,
+        content_type: str | None,
+        temp_path: str,
+        size: int,
+    ) -> CachedFile:
+        path = os.path.join(
+            self._get_directory(),
+            hashlib.sha256(
+                f"{object_name}:{etag}".encode()
+            ).hexdigest(),
+        )
+        os.replace(temp_path, path)
+
+        cached_file = CachedFile(
+            path=path,
+            size=size,
+            content_type=content_type,
+        )
+        key = (object_name, etag)
+        with self._lock:
+            replaced_file = self._files.pop(
+                key, None
+            )
+            if replaced_file:
+                self._size -= replaced_file.size
+            self._files[key] = cached_file
+            self._size += size
+            evicted_files = self._evict()
+
+        for evicted_file in evicted_files:
+            try:
+                os.remove(evicted_file.path)
+            except FileNotFoundError:
+                pass
+        return cached_file
+
+    def put(
+        self,
+        object_name: str,
+        etag: str,
+        content_type: str | None,
+        chunks: Iterable[bytes],
+    ) -> CachedFile:
+        """
+        Blocking, writes chunks to the cache directory and returns cached file
+        """
+        file_descriptor, temp_path = (
+            self._create_temp_file()
+        )
+        try:
+            with os.fdopen(
+                file_descriptor, "wb"
+            ) as temp_file:
+                for chunk in chunks:
+                    temp_file.write(chunk)
+                size = temp_file.tell()
+
+            return self._add(
+                object_name=object_name,
+                etag=etag,
+                content_type=content_type,
+                temp_path=temp_path,
+                size=size,
+            )
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def get_caching_chunks(
+        self,
+        object_name: str,
+        etag: str,
+        content_type: str | None,
+        chunks: Iterable[bytes],
+    ) -> Iterator[bytes]:
+        """
+        Yields chunks while writing them to the cache directory, so the object is
+        streamed and cached with one download. The file is cached only if all chunks
+        were read. Chunks of an object which is already being written are passed as is
+        """
+        key = (object_name, etag)
+        with self._lock:
+            is_writing = key in self._writing_keys
+            self._writing_keys.add(key)
+        if is_writing:
+            yield from chunks
+            return
+
+        try:
+            file_descriptor, temp_path = (
+                self._create_temp_file()
+            )
+            try:
+                with os.fdopen(
+                    file_descriptor, "wb"
+                ) as temp_file:
+                    for chunk in chunks:
+                        temp_file.write(chunk)
+                        yield chunk
+                    size = temp_file.tell()
+
+                self._add(
+                    object_name=object_name,
+                    etag=etag,
+                    content_type=content_type,
+                    temp_path=temp_path,
+                    size=size,
+                )
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        finally:
+            with self._lock:
+                self._writing_keys.discard(key)
+
+    def close(self):
+        with self._lock:
+            self._files.clear()
+            self._size = 0
+            if self._directory:
+                shutil.rmtree(
+                    self._directory,
+                    ignore_errors=True,
+                )
+                self._directory = None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "items": len(self._files),
+                "size": self._size,
+                "max_size": self._max_size,
+            }
+
+
+_shared_disk_content_cache: (
+    DiskContentCache | None
+) = None
+_shared_disk_content_cache_lock = threading.Lock()
+
+
+def get_disk_content_cache() -> DiskContentCache:
+    global _shared_disk_content_cache
+
+    if _shared_disk_content_cache is None:
+        with _shared_disk_content_cache_lock:
+            if _shared_disk_content_cache is None:
+                _shared_disk_content_cache = (
+                    DiskContentCache()
+                )
+
+    return _shared_disk_content_cache
@@ -0,0 +1,167 @@
+import threading
+from dataclasses import dataclass
+from typing import Iterator
+
+from cachetools import LRUCache
+
+from config.content_cache_config import (
+    CONTENT_CACHE_MEMORY_SIZE,
+    CONTENT_CACHE_MEMORY_MAX_ITEM_SIZE,
+)
+
+
+@dataclass
+class CachedContent:
+    content: bytes
+    content_type: str | None
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    def get_chunks(
+        self,
+        offset: int = 0,
+        length: int = 0,
+        chunk_size: int = 1024 * 1024,
+    ) -> Iterator[bytes]:
+        """
+        Same interface as MinioInitializer.get_file_chunks, length 0 means till the end
+        """
+        end = (
+            offset + length
+            if length
+            else self.size
+        )
+        content = memoryview(self.content)
+        for chunk_start in range(
+            offset, end, chunk_size
+        ):
+            yield bytes(
+                content[
+                    chunk_start : min(
+                        chunk_start + chunk_size,
+                        end,
+                    )
+                ]
+            )
+
+
+class _EvictionCountingLRUCache(LRUCache):
+    def __init__(self, maxsize: int, getsizeof):
+        super().__init__(
+            maxsize=maxsize, getsizeof=getsizeof
+        )
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+class MemoryContentCache:
+    """
+    Per process LRU cache of layer files content, bounded by total size of cached
+    content in bytes. Content is keyed by layer id and object etag, so a changed
+    object is never served from the cache
+    """
+
+    def __init__(
+        self,
+        max_size: int = CONTENT_CACHE_MEMORY_SIZE,
+        max_item_size: int = CONTENT_CACHE_MEMORY_MAX_ITEM_SIZE,
+    ):
+        self._max_size = max_size
+        self._max_item_size = min(
+            max_item_size, max_size
+        )
+        self._cache = _EvictionCountingLRUCache(
+            maxsize=max(max_size, 1),
+            getsizeof=lambda cached_content: cached_content.size,
+        )
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def is_cacheable(self, size: int) -> bool:
+        return 0 < size <= self._max_item_size
+
+    def get(
+        self, layer_id: int, etag: str
+    ) -> CachedContent | None:
+        with self._lock:
+            cached_content = self._cache.get(
+                (layer_id, etag)
+            )
+            if cached_content:
+                self._hits += 1
+            else:
+                self._misses += 1
+            return cached_content
+
+    def put(
+        self,
+        layer_id: int,
+        etag: str,
+        cached_content: CachedContent,
+    ):
+        if not self.is_cacheable(
+            cached_content.size
+        ):
+            return
+
+        with self._lock:
+            self._cache[(layer_id, etag)] = (
+                cached_content
+            )
+
+    def invalidate_layer(self, layer_id: int):
+        with self._lock:
+            for key in [
+                key
+                for key in self._cache.keys()
+                if key[0] == layer_id
+            ]:
+                del self._cache[key]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._cache.evictions,
+                "items": len(self._cache),
+                "size": self._cache.currsize,
+                "max_size": self._max_size,
+            }
+
+
+_shared_memory_content_cache: (
+    MemoryContentCache | None
+) = None
+_shared_memory_content_cache_lock = (
+    threading.Lock()
+)
+
+
+def get_memory_content_cache() -> (
+    MemoryContentCache
+):
+    global _shared_memory_content_cache
+
+    if _shared_memory_content_cache is None:
+        with _shared_memory_content_cache_lock:
+            if (
+                _shared_memory_content_cache
+                is None
+            ):
+                _shared_memory_content_cache = (
+                    MemoryContentCache()
+                )
+
+    return _shared_memory_content_cache
@@ -1,9 +1,10 @@
 import copy
 import datetime
 
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlmodel import Session
 
+from common.http_cache import get_weak_etag
 from common.initializers import Initializer
 from folder_router.exceptions import (
     FolderAlreadyExists,
@@ -14,7 +15,19 @@ from folder_router.schemas import (
     FolderCreateRequest,
     FolderUpdateRequest,
 )
+from folder_router.utils import (
+    FolderDatabaseGetter,
+)
+from layers_router.utils import (
+    get_released_object_names,
+)
+from link_cache.utils import (
+    release_orphaned_link_cache_entries,
+)
 from models import Folder
+from object_deletion.utils import (
+    enqueue_object_deletions,
+)
 
 
 class GetFolders:
@@ -28,6 +41,16 @@ class GetFolders:
         self._offset = offset
         self._session = session
 
+    def get_etag(self) -> str:
+        folders_version = FolderDatabaseGetter(
+            session=self._session
+        ).get_folders_version()
+        return get_weak_etag(
+            self._limit,
+            self._offset,
+            *folders_version,
+        )
+
     def execute(self):
         result_objects = self._session.execute(
             select(Folder)
@@ -194,8 +217,32 @@ class DeleteFolder(Initializer):
         )
 
     def execute(self):
-        self._session.delete(
-            self._folder_instance
+        """
+        Child folders and layers are deleted by the database cascade,
+        their minio objects and cached server links which are not used anymore
+        are queued for deletion in the same transaction
+        """
+        subtree_layers = self._folder_db_getter.get_subtree_layers(
+            folder_id=self._folder_id
+        )
+        enqueue_object_deletions(
+            session=self._session,
+            object_names=get_released_object_names(
+                session=self._session,
+                layers=subtree_layers,
+            ),
+        )
+
+        self._session.execute(
+            delete(Folder).where(
+                Folder.id == self._folder_id
+            )
+        )
+        enqueue_object_deletions(
+            session=self._session,
+            object_names=release_orphaned_link_cache_entries(
+                session=self._session
+            ),
         )
         self._session.commit()
 
@@ -234,6 +281,18 @@ class GetFolderByParentFolderId(Initializer):
 
         return None
 
+    def get_etag(self) -> str:
+        folders_version = self._folder_db_getter.get_folders_version(
+            parent_folder_id=self._parent_folder_id,
+            by_parent=True,
+        )
+        return get_weak_etag(
+            self._parent_folder_id,
+            self._limit,
+            self._offset,
+            *folders_version,
+        )
+
     def execute(self):
         return self._folder_db_getter.get_folder_instance_by_parent_id(
             parent_folder_id=self._parent_folder_id
@@ -3,10 +3,13 @@ from typing import List
 from fastapi import (
     APIRouter,
     Depends,
+    Header,
     HTTPException,
+    Response,
 )
 from sqlmodel import Session
 
+from common.http_cache import is_etag_matched
 from database import get_session
 from folder_router.exceptions import (
     FolderException,
@@ -35,8 +38,12 @@ router = APIRouter()
     response_model=List[FolderResponse],
 )
 def get_folders(
+    response: Response,
     limit: int = None,
     offset: int = None,
+    if_none_match: str | None = Header(
+        default=None
+    ),
     session: Session = Depends(get_session),
 ):
     task = GetFolders(
@@ -44,6 +51,14 @@ def get_folders(
         offset=offset,
         session=session,
     )
+    etag = task.get_etag()
+    if is_etag_matched(if_none_match, etag):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag},
+        )
+
+    response.headers["ETag"] = etag
     folders = task.execute()
     return folders
 
@@ -54,9 +69,13 @@ def get_folders(
     response_model=List[FolderResponse],
 )
 def get_folder_by_parent_folder_id(
+    response: Response,
     parent_folder_id: int = None,
     limit: int = None,
     offset: int = None,
+    if_none_match: str | None = Header(
+        default=None
+    ),
     session: Session = Depends(get_session),
 ):
     task = GetFolderByParentFolderId(
@@ -65,6 +84,14 @@ def get_folder_by_parent_folder_id(
         session=session,
         parent_folder_id=parent_folder_id,
     )
+    etag = task.get_etag()
+    if is_etag_matched(if_none_match, etag):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag},
+        )
+
+    response.headers["ETag"] = etag
     folders = task.execute()
     return folders
 
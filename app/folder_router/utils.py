@@ -1,7 +1,10 @@
-from sqlalchemy import select
+from typing import List
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 
-from models import Folder
+from models import Folder, Layer
 
 
 class FolderDatabaseGetter:
@@ -40,6 +43,47 @@ class FolderDatabaseGetter:
 
         return None
 
+    def get_folder_instances_by_names(
+        self, folder_names: List[str]
+    ) -> dict[str, Folder]:
+        if not folder_names:
+            return {}
+
+        query = select(Folder).where(
+            Folder.name.in_(folder_names)
+        )
+        return {
+            folder_instance.name: folder_instance
+            for folder_instance in self._session.execute(
+                query
+            )
+            .scalars()
+            .all()
+        }
+
+    def get_folders_version(
+        self,
+        parent_folder_id: int | None = None,
+        by_parent: bool = False,
+    ) -> tuple:
+        """
+        Count, ids sum and last modification date of folders change
+        whenever a folder is created, updated or deleted
+        """
+        query = select(
+            func.count(Folder.id),
+            func.sum(Folder.id),
+            func.max(Folder.modification_date),
+        )
+        if by_parent:
+            query = query.where(
+                Folder.parent_id
+                == parent_folder_id
+            )
+        return tuple(
+            self._session.execute(query).one()
+        )
+
     def get_folder_instance_by_parent_id(
         self, parent_folder_id: int
     ) -> Folder | None:
@@ -56,3 +100,32 @@ class FolderDatabaseGetter:
             .all()
         )
         return folder_instance
+
+    def get_subtree_layers(
+        self, folder_id: int
+    ) -> List[Row]:
+        """
+        Returns storage related columns of all layers of the folder
+        and its descendant folders with one recursive query
+        """
+        subtree = (
+            select(Folder.id)
+            .where(Folder.id == folder_id)
+            .cte(name="subtree", recursive=True)
+        )
+        subtree = subtree.union(
+            select(Folder.id).where(
+                Folder.parent_id == subtree.c.id
+            )
+        )
+        query = select(
+            Layer.id,
+            Layer.name,
+            Layer.file_link,
+            Layer.object_name,
+        ).where(
+            Layer.folder_id.in_(
+                select(subtree.c.id)
+            )
+        )
+        return self._session.execute(query).all()
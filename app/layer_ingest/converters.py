@@ -0,0 +1,267 @@
+from typing import Callable, Iterator
+from xml.etree import ElementTree
+
+from layers_router.constants import (
+    GEO_FILE_CONTENT_TYPES,
+)
+
+
+def _get_tag(element: ElementTree.Element) -> str:
+    """
+    Tag without xml namespace, KML and GPX files use several namespace versions
+    """
+    return element.tag.rsplit("}", 1)[-1]
+
+
+def _find_children(
+    element: ElementTree.Element, tag: str
+) -> list[ElementTree.Element]:
+    return [
+        child
+        for child in element
+        if _get_tag(child) == tag
+    ]
+
+
+def _find_child_text(
+    element: ElementTree.Element, tag: str
+) -> str | None:
+    for child in _find_children(element, tag):
+        return (child.text or "").strip()
+    return None
+
+
+def _parse_kml_coordinates(
+    element: ElementTree.Element,
+) -> list[list[float]]:
+    coordinates_text = _find_child_text(
+        element, "coordinates"
+    )
+    return [
+        [
+            float(value)
+            for value in position.split(",")[:3]
+        ]
+        for position in (
+            coordinates_text or ""
+        ).split()
+    ]
+
+
+def _parse_kml_polygon(
+    element: ElementTree.Element,
+) -> list:
+    rings = []
+    for tag in (
+        "outerBoundaryIs",
+        "innerBoundaryIs",
+    ):
+        for boundary in _find_children(
+            element, tag
+        ):
+            for ring in _find_children(
+                boundary, "LinearRing"
+            ):
+                rings.append(
+                    _parse_kml_coordinates(ring)
+                )
+    return rings
+
+
+def _parse_kml_geometries(
+    element: ElementTree.Element,
+) -> Iterator[dict]:
+    tag = _get_tag(element)
+    if tag == "Point":
+        coordinates = _parse_kml_coordinates(
+            element
+        )
+        if coordinates:
+            yield {
+                "type": "Point",
+                "coordinates": coordinates[0],
+            }
+    elif tag in ("LineString", "LinearRing"):
+        yield {
+            "type": "LineString",
+            "coordinates": _parse_kml_coordinates(
+                element
+            ),
+        }
+    elif tag == "Polygon":
+        yield {
+            "type": "Polygon",
+            "coordinates": _parse_kml_polygon(
+                element
+            ),
+        }
+    elif tag == "MultiGeometry":
+        for child in element:
+            yield from _parse_kml_geometries(
+                child
+            )
+
+
+def _get_kml_properties(
+    placemark: ElementTree.Element,
+) -> dict:
+    properties = {}
+    for tag in ("name", "description"):
+        value = _find_child_text(placemark, tag)
+        if value is not None:
+            properties[tag] = value
+
+    for extended_data in _find_children(
+        placemark, "ExtendedData"
+    ):
+        for data in extended_data.iter():
+            data_tag = _get_tag(data)
+            if data_tag == "Data":
+                properties[data.get("name")] = (
+                    _find_child_text(
+                        data, "value"
+                    )
+                )
+            elif data_tag == "SimpleData":
+                properties[data.get("name")] = (
+                    data.text or ""
+                ).strip()
+    return properties
+
+
+def _to_geometry(
+    geometries: list[dict],
+) -> dict | None:
+    if not geometries:
+        return None
+    if len(geometries) == 1:
+        return geometries[0]
+    return {
+        "type": "GeometryCollection",
+        "geometries": geometries,
+    }
+
+
+def read_kml_features(data: bytes) -> list[dict]:
+    """
+    Geojson features of KML placemarks, properties are the placemark name,
+    description and extended data
+    """
+    features = []
+    for element in ElementTree.fromstring(
+        data
+    ).iter():
+        if _get_tag(element) != "Placemark":
+            continue
+
+        geometries = [
+            geometry
+            for child in element
+            for geometry in _parse_kml_geometries(
+                child
+            )
+        ]
+        features.append(
+            {
+                "type": "Feature",
+                "properties": _get_kml_properties(
+                    element
+                ),
+                "geometry": _to_geometry(
+                    geometries
+                ),
+            }
+        )
+    return features
+
+
+def _parse_gpx_point(
+    element: ElementTree.Element,
+) -> list[float]:
+    position = [
+        float(element.get("lon")),
+        float(element.get("lat")),
+    ]
+    elevation = _find_child_text(element, "ele")
+    if elevation:
+        position.append(float(elevation))
+    return position
+
+
+def _get_gpx_properties(
+    element: ElementTree.Element,
+) -> dict:
+    properties = {}
+    for tag in ("name", "desc", "type"):
+        value = _find_child_text(element, tag)
+        if value is not None:
+            properties[tag] = value
+    return properties
+
+
+def read_gpx_features(data: bytes) -> list[dict]:
+    """
+    Geojson features of GPX waypoints (points), routes (lines)
+    and tracks (multi lines of track segments)
+    """
+    features = []
+    for element in ElementTree.fromstring(data):
+        tag = _get_tag(element)
+        if tag == "wpt":
+            geometry = {
+                "type": "Point",
+                "coordinates": _parse_gpx_point(
+                    element
+                ),
+            }
+        elif tag == "rte":
+            geometry = {
+                "type": "LineString",
+                "coordinates": [
+                    _parse_gpx_point(point)
+                    for point in _find_children(
+                        element, "rtept"
+                    )
+                ],
+            }
+        elif tag == "trk":
+            geometry = {
+                "type": "MultiLineString",
+                "coordinates": [
+                    [
+                        _parse_gpx_point(point)
+                        for point in _find_children(
+                            segment, "trkpt"
+                        )
+                    ]
+                    for segment in _find_children(
+                        element, "trkseg"
+                    )
+                ],
+            }
+        else:
+            continue
+
+        features.append(
+            {
+                "type": "Feature",
+                "properties": _get_gpx_properties(
+                    element
+                ),
+                "geometry": geometry,
+            }
+        )
+    return features
+
+
+# readers of vector formats converted to features on ingest by content type
+FEATURE_READERS: dict[
+    str, Callable[[bytes], list[dict]]
+] = {
+    GEO_FILE_CONTENT_TYPES[
+        "kml"
+    ]: read_kml_features,
+    GEO_FILE_CONTENT_TYPES[
+        "gpx"
+    ]: read_gpx_features,
+}
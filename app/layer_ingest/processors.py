@@ -0,0 +1,658 @@
+import datetime
+import io
+import json
+import logging
+import zlib
+from tempfile import SpooledTemporaryFile
+from xml.etree import ElementTree
+
+import numpy as np
+from sqlalchemy import delete, update
+from sqlmodel import Session
+
+from common.initializers import Initializer
+from config.layer_ingest_config import (
+    LAYER_INGEST_BATCH_SIZE,
+    LAYER_INGEST_MAX_ATTEMPTS,
+    LAYER_INGEST_MAX_SIZE,
+    LAYER_INGEST_TIMEOUT,
+)
+from config.vector_tile_config import (
+    VECTOR_TILE_BUFFER,
+    VECTOR_TILE_EXTENT,
+    VECTOR_TILE_PYRAMID_MAX_TILES,
+    VECTOR_TILE_PYRAMID_MAX_ZOOM,
+    VECTOR_TILE_SIMPLIFY_TOLERANCE,
+)
+from layer_ingest.converters import (
+    FEATURE_READERS,
+)
+from layer_ingest.utils import (
+    LayerIngestDatabaseGetter,
+    get_retry_delay,
+)
+from layers_router.constants import (
+    DERIVED_OBJECT_SUFFIXES,
+    FILE_CHUNK_SIZE,
+    GEO_FILE_CONTENT_TYPES,
+    GZIP_CONTENT_ENCODING,
+    PMTILES_CONTENT_TYPE,
+    SIMPLIFIED_LEVEL_ZOOMS,
+    SIMPLIFIED_OBJECT_SUFFIX,
+    SPATIAL_INDEX_OBJECT_SUFFIX,
+    SPOOLED_FILE_MAX_SIZE,
+    TILE_PYRAMID_OBJECT_SUFFIX,
+    VECTOR_TILE_LAYER_NAME,
+)
+from layers_router.geometry import (
+    get_tile_bounds,
+    get_zoom_tolerance,
+    lon_lat_to_world,
+    simplify_geometry,
+)
+from layers_router.pmtiles import (
+    PMTilesWriter,
+    zxy_to_tile_id,
+)
+from layers_router.spatial_index import (
+    SpatialIndex,
+    write_spatial_index,
+)
+from layers_router.utils import (
+    compress_file,
+    decompress_chunks,
+)
+from layers_router.vector_tiles import (
+    VectorTileEncoder,
+)
+from models import (
+    Layer,
+    LayerBlob,
+    ObjectIngestion,
+)
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class IngestQueuedObjects(Initializer):
+    """
+    Ingests a batch of queued layer objects. Geojson, KML and GPX objects are converted
+    to a spatial index with feature data, which their layers are linked to, and a tile
+    pyramid (PMTiles archive). Geojson objects get geometry simplification levels too.
+    Queue rows are leased for LAYER_INGEST_TIMEOUT seconds, so no transaction is kept
+    open while an object is ingested. Failed ingests are retried with exponential backoff
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        batch_size: int = LAYER_INGEST_BATCH_SIZE,
+        **kwargs,
+    ):
+        super().__init__(
+            session=session, **kwargs
+        )
+        self._batch_size = batch_size
+        self._layer_ingest_db_getter = (
+            LayerIngestDatabaseGetter(
+                session=session
+            )
+        )
+
+    def _claim_object_ingestions(
+        self,
+    ) -> list[tuple[int, str, int]]:
+        now = datetime.datetime.utcnow()
+        object_ingestions = self._layer_ingest_db_getter.get_due_object_ingestions(
+            due_date=now, limit=self._batch_size
+        )
+        claimed_ingestions = []
+        for object_ingestion in object_ingestions:
+            claimed_ingestions.append(
+                (
+                    object_ingestion.id,
+                    object_ingestion.object_name,
+                    object_ingestion.attempts,
+                )
+            )
+            object_ingestion.next_attempt_date = (
+                now
+                + datetime.timedelta(
+                    seconds=LAYER_INGEST_TIMEOUT
+                )
+            )
+            self._session.add(object_ingestion)
+
+        self._session.commit()
+        return claimed_ingestions
+
+    def _load_object(
+        self, object_name: str
+    ) -> tuple[str, bytearray, bool] | None:
+        """
+        Content type, decoded content of the object and whether the object is
+        gzip compressed, None for objects which are not converted to features.
+        Objects decoded to more than LAYER_INGEST_MAX_SIZE bytes are not ingested,
+        their content is read while it fits the limit
+        """
+        object_stat = (
+            self._minio_client.stat_file(
+                filename=object_name
+            )
+        )
+        if not object_stat or (
+            object_stat.content_type
+            != GEO_FILE_CONTENT_TYPES["geojson"]
+            and object_stat.content_type
+            not in FEATURE_READERS
+        ):
+            return None
+
+        if (
+            object_stat.size
+            > LAYER_INGEST_MAX_SIZE
+        ):
+            logger.warning(
+                "Object %s is too large to ingest",
+                object_name,
+            )
+            return None
+
+        chunks = (
+            self._minio_client.get_file_chunks(
+                filename=object_name,
+                chunk_size=FILE_CHUNK_SIZE,
+            )
+        )
+        first_chunk = next(chunks, b"")
+        chunks = (
+            chunk
+            for content in ([first_chunk], chunks)
+            for chunk in content
+        )
+        compressed = first_chunk.startswith(
+            GZIP_MAGIC
+        )
+        if compressed:
+            chunks = decompress_chunks(chunks)
+
+        data = bytearray()
+        try:
+            for chunk in chunks:
+                data += chunk
+                if (
+                    len(data)
+                    > LAYER_INGEST_MAX_SIZE
+                ):
+                    logger.warning(
+                        "Object %s is too large to ingest",
+                        object_name,
+                    )
+                    return None
+        except zlib.error:
+            return None
+        finally:
+            chunks.close()
+        return (
+            object_stat.content_type,
+            data,
+            compressed,
+        )
+
+    @staticmethod
+    def _read_features(
+        content_type: str, data: bytes
+    ) -> tuple[dict | None, list] | None:
+        """
+        Geojson feature collection (None for other formats) and its features,
+        None if the content is not valid
+        """
+        if (
+            content_type
+            != GEO_FILE_CONTENT_TYPES["geojson"]
+        ):
+            try:
+                return None, FEATURE_READERS[
+                    content_type
+                ](data)
+            except (
+                ElementTree.ParseError,
+                ValueError,
+                TypeError,
+            ):
+                return None
+
+        try:
+            geojson = json.loads(data)
+        except ValueError:
+            return None
+        if not isinstance(
+            geojson, dict
+        ) or not isinstance(
+            geojson.get("features"), list
+        ):
+            return None
+        return geojson, geojson["features"]
+
+    @staticmethod
+    def _get_pyramid_tiles(
+        spatial_index: SpatialIndex,
+    ) -> list[tuple[int, int, int]]:
+        """
+        Tiles of all zoom levels which contain feature bounding boxes. Zoom levels
+        are added while total tiles count is below VECTOR_TILE_PYRAMID_MAX_TILES
+        """
+        boxes = np.frombuffer(
+            spatial_index.boxes,
+            dtype=np.float64,
+            count=spatial_index.items_count * 4,
+        ).reshape(-1, 4)
+        top_left = lon_lat_to_world(
+            boxes[:, [0, 3]]
+        )
+        bottom_right = lon_lat_to_world(
+            boxes[:, [2, 1]]
+        )
+
+        tiles = []
+        for z in range(
+            VECTOR_TILE_PYRAMID_MAX_ZOOM + 1
+        ):
+            tiles_count = 2**z
+            min_tiles = np.clip(
+                np.floor(top_left * tiles_count),
+                0,
+                tiles_count - 1,
+            ).astype(np.int64)
+            max_tiles = np.clip(
+                np.floor(
+                    bottom_right * tiles_count
+                ),
+                0,
+                tiles_count - 1,
+            ).astype(np.int64)
+            # upper bound, tiles of different features overlap
+            if (
+                len(tiles)
+                + np.prod(
+                    max_tiles - min_tiles + 1,
+                    axis=1,
+                ).sum()
+                > VECTOR_TILE_PYRAMID_MAX_TILES
+            ):
+                break
+
+            zoom_tiles = set()
+            for (min_x, min_y), (
+                max_x,
+                max_y,
+            ) in zip(
+                min_tiles.tolist(),
+                max_tiles.tolist(),
+            ):
+                zoom_tiles.update(
+                    (z, x, y)
+                    for x in range(
+                        min_x, max_x + 1
+                    )
+                    for y in range(
+                        min_y, max_y + 1
+                    )
+                )
+            tiles.extend(zoom_tiles)
+        return tiles
+
+    def _write_tile_pyramid(
+        self,
+        object_name: str,
+        spatial_index: SpatialIndex,
+        features: list[dict],
+    ) -> int | None:
+        """
+        Renders tiles of the pyramid in the order of PMTiles tile ids and stores
+        them as one archive. Returns max zoom of the archive
+        """
+        tiles = self._get_pyramid_tiles(
+            spatial_index
+        )
+        if not tiles:
+            return None
+
+        tiles.sort(
+            key=lambda tile: zxy_to_tile_id(*tile)
+        )
+        with (
+            SpooledTemporaryFile(
+                max_size=SPOOLED_FILE_MAX_SIZE
+            ) as tile_data,
+            SpooledTemporaryFile(
+                max_size=SPOOLED_FILE_MAX_SIZE
+            ) as archive,
+        ):
+            writer = PMTilesWriter(
+                tile_data=tile_data
+            )
+            for z, x, y in tiles:
+                encoder = VectorTileEncoder(
+                    z=z,
+                    x=x,
+                    y=y,
+                    extent=VECTOR_TILE_EXTENT,
+                    buffer=VECTOR_TILE_BUFFER,
+                    tolerance=VECTOR_TILE_SIMPLIFY_TOLERANCE,
+                )
+                tile = encoder.encode(
+                    layer_name=VECTOR_TILE_LAYER_NAME,
+                    features=(
+                        features[position]
+                        for position in spatial_index.search(
+                            *get_tile_bounds(
+                                z=z,
+                                x=x,
+                                y=y,
+                                buffer=VECTOR_TILE_BUFFER
+                                / VECTOR_TILE_EXTENT,
+                            )
+                        )
+                    ),
+                )
+                if tile:
+                    writer.add_tile(z, x, y, tile)
+
+            max_zoom = max(z for z, _, _ in tiles)
+            writer.write(
+                file=archive,
+                metadata={
+                    "name": object_name,
+                    "format": "pbf",
+                    "vector_layers": [
+                        {
+                            "id": VECTOR_TILE_LAYER_NAME,
+                            "fields": {},
+                        }
+                    ],
+                },
+                bounds=tuple(
+                    spatial_index.boxes[-4:]
+                ),
+            )
+            archive_size = archive.tell()
+            archive.seek(0)
+            self._minio_client.create_file(
+                filename=f"{object_name}{TILE_PYRAMID_OBJECT_SUFFIX}",
+                data_buf=archive,
+                length=archive_size,
+                content_type=PMTILES_CONTENT_TYPE,
+            )
+        return max_zoom
+
+    @staticmethod
+    def _simplify_feature(
+        feature, tolerance: float
+    ):
+        if not isinstance(feature, dict):
+            return feature
+        try:
+            geometry = simplify_geometry(
+                feature.get("geometry"), tolerance
+            )
+        except (
+            TypeError,
+            ValueError,
+            IndexError,
+        ):
+            # geometry which is not valid is kept as is
+            return feature
+        return {**feature, "geometry": geometry}
+
+    def _write_simplified_levels(
+        self,
+        object_name: str,
+        geojson: dict,
+        compressed: bool,
+    ) -> int:
+        """
+        Stores geojson with geometries simplified for every zoom of
+        SIMPLIFIED_LEVEL_ZOOMS, encoded the same way as the object. Levels are
+        simplified from the previous finer level, so every level is cheaper
+        than the previous one. Returns max zoom of the levels
+        """
+        features = geojson["features"]
+        for zoom in sorted(
+            SIMPLIFIED_LEVEL_ZOOMS, reverse=True
+        ):
+            tolerance = get_zoom_tolerance(zoom)
+            features = [
+                self._simplify_feature(
+                    feature, tolerance
+                )
+                for feature in features
+            ]
+            level_file = io.BytesIO(
+                json.dumps(
+                    {
+                        **geojson,
+                        "features": features,
+                    },
+                    separators=(",", ":"),
+                ).encode()
+            )
+            if compressed:
+                level_file = compress_file(
+                    level_file
+                )
+            level_size = level_file.seek(
+                0, io.SEEK_END
+            )
+            level_file.seek(0)
+            self._minio_client.create_file(
+                filename=f"{object_name}{SIMPLIFIED_OBJECT_SUFFIX}{zoom}",
+                data_buf=level_file,
+                length=level_size,
+                content_type=GEO_FILE_CONTENT_TYPES[
+                    "geojson"
+                ],
+                content_encoding=GZIP_CONTENT_ENCODING
+                if compressed
+                else None,
+            )
+        return max(SIMPLIFIED_LEVEL_ZOOMS)
+
+    def _ingest_object(
+        self, object_name: str
+    ) -> tuple[dict, str | None]:
+        """
+        Returns blob values of the stored derived objects and name of the spatial
+        index object, which layers read features from. No values and no name
+        if the object can't be converted to features
+        """
+        loaded_object = self._load_object(
+            object_name
+        )
+        if loaded_object is None:
+            return {}, None
+
+        content_type, data, compressed = (
+            loaded_object
+        )
+        read_features = self._read_features(
+            content_type=content_type, data=data
+        )
+        if read_features is None:
+            return {}, None
+
+        geojson, features = read_features
+        spatial_index, features_data = (
+            write_spatial_index(
+                minio_client=self._minio_client,
+                index_object_name=f"{object_name}{SPATIAL_INDEX_OBJECT_SUFFIX}",
+                features=features,
+            )
+        )
+        indexed_features = [
+            json.loads(feature_data)
+            for feature_data in features_data
+        ]
+        blob_values = {
+            "tiles_max_zoom": self._write_tile_pyramid(
+                object_name=object_name,
+                spatial_index=spatial_index,
+                features=indexed_features,
+            )
+        }
+        # simplification levels are served as layer content,
+        # so they are stored in the format of geojson objects only
+        if geojson is not None:
+            blob_values["simplified_max_zoom"] = (
+                self._write_simplified_levels(
+                    object_name=object_name,
+                    geojson=geojson,
+                    compressed=compressed,
+                )
+            )
+        return (
+            blob_values,
+            f"{object_name}{SPATIAL_INDEX_OBJECT_SUFFIX}",
+        )
+
+    def _finish_object_ingestion(
+        self,
+        object_ingestion_id: int,
+        object_name: str,
+        blob_values: dict,
+        features_object_name: str | None,
+    ) -> None:
+        """
+        Layers of the object are linked to its spatial index, layers created after
+        the object was ingested are linked by the ingest of their reference
+        """
+        if blob_values and not (
+            self._session.execute(
+                update(LayerBlob)
+                .where(
+                    LayerBlob.object_name
+                    == object_name
+                )
+                .values(**blob_values)
+                .execution_options(
+                    synchronize_session=False
+                )
+            ).rowcount
+        ):
+            # object was released while it was ingested
+            self._minio_client.delete_files(
+                filenames=[
+                    f"{object_name}{suffix}"
+                    for suffix in DERIVED_OBJECT_SUFFIXES
+                ]
+            )
+        elif features_object_name:
+            self._session.execute(
+                update(Layer)
+                .where(
+                    Layer.object_name
+                    == object_name,
+                    Layer.features_object_name.is_(
+                        None
+                    ),
+                )
+                .values(
+                    features_object_name=features_object_name
+                )
+                .execution_options(
+                    synchronize_session=False
+                )
+            )
+        self._session.execute(
+            delete(ObjectIngestion)
+            .where(
+                ObjectIngestion.id
+                == object_ingestion_id
+            )
+            .execution_options(
+                synchronize_session=False
+            )
+        )
+
+    def _fail_object_ingestion(
+        self,
+        object_ingestion_id: int,
+        attempts: int,
+        error: str,
+    ) -> None:
+        if (
+            attempts + 1
+            >= LAYER_INGEST_MAX_ATTEMPTS
+        ):
+            self._session.execute(
+                delete(ObjectIngestion)
+                .where(
+                    ObjectIngestion.id
+                    == object_ingestion_id
+                )
+                .execution_options(
+                    synchronize_session=False
+                )
+            )
+            return
+
+        self._session.execute(
+            update(ObjectIngestion)
+            .where(
+                ObjectIngestion.id
+                == object_ingestion_id
+            )
+            .values(
+                attempts=attempts + 1,
+                last_error=error,
+                next_attempt_date=datetime.datetime.utcnow()
+                + get_retry_delay(attempts + 1),
+            )
+            .execution_options(
+                synchronize_session=False
+            )
+        )
+
+    def execute(self) -> int:
+        object_ingestions = (
+            self._claim_object_ingestions()
+        )
+        for (
+            object_ingestion_id,
+            object_name,
+            attempts,
+        ) in object_ingestions:
+            features_object_name = self._layer_ingest_db_getter.get_features_object_name(
+                object_name=object_name
+            )
+            try:
+                blob_values = {}
+                if not features_object_name:
+                    (
+                        blob_values,
+                        features_object_name,
+                    ) = self._ingest_object(
+                        object_name
+                    )
+            except Exception as e:
+                logger.exception(
+                    "Ingest of object %s failed",
+                    object_name,
+                )
+                self._fail_object_ingestion(
+                    object_ingestion_id=object_ingestion_id,
+                    attempts=attempts,
+                    error=str(e),
+                )
+            else:
+                self._finish_object_ingestion(
+                    object_ingestion_id=object_ingestion_id,
+                    object_name=object_name,
+                    blob_values=blob_values,
+                    features_object_name=features_object_name,
+                )
+            self._session.commit()
+
+        return len(object_ingestions)
@@ -0,0 +1,37 @@
+from sqlmodel import Session
+
+import database
+from common.periodic import PeriodicTask
+from config.layer_ingest_config import (
+    LAYER_INGEST_BATCH_SIZE,
+    LAYER_INGEST_INTERVAL,
+)
+from layer_ingest.processors import (
+    IngestQueuedObjects,
+)
+
+
+def ingest_queued_objects():
+    """
+    Drains the ingest queue batch by batch until no due ingestions are left
+    """
+    while True:
+        with Session(database.engine) as session:
+            task = IngestQueuedObjects(
+                session=session,
+                batch_size=LAYER_INGEST_BATCH_SIZE,
+            )
+            processed_count = task.execute()
+
+        if (
+            processed_count
+            < LAYER_INGEST_BATCH_SIZE
+        ):
+            return
+
+
+layer_ingest_worker = PeriodicTask(
+    name="layer_ingest_worker",
+    func=ingest_queued_objects,
+    interval=LAYER_INGEST_INTERVAL,
+)
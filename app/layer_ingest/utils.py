@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import (
+    insert,
+)
+from sqlalchemy.orm import Session
+
+from config.layer_ingest_config import (
+    LAYER_INGEST_INTERVAL,
+    LAYER_INGEST_TIMEOUT,
+)
+from models import Layer, ObjectIngestion
+
+
+class LayerIngestDatabaseGetter:
+    def __init__(self, session: Session):
+        self._session = session
+
+    def get_due_object_ingestions(
+        self, due_date: datetime, limit: int
+    ) -> List[ObjectIngestion]:
+        """
+        Locks due ingestions, rows locked by another worker are skipped
+        """
+        query = (
+            select(ObjectIngestion)
+            .where(
+                ObjectIngestion.next_attempt_date
+                <= due_date
+            )
+            .order_by(ObjectIngestion.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return (
+            self._session.execute(query)
+            .scalars()
+            .all()
+        )
+
+    def get_features_object_name(
+        self, object_name: str
+    ) -> str | None:
+        """
+        Spatial index object which layers of the object are linked to,
+        None if the object was not ingested yet
+        """
+        query = (
+            select(Layer.features_object_name)
+            .where(
+                Layer.object_name == object_name,
+                Layer.features_object_name.isnot(
+                    None
+                ),
+            )
+            .limit(1)
+        )
+        return self._session.execute(
+            query
+        ).scalar()
+
+
+def enqueue_object_ingestions(
+    session: Session, object_names: Iterable[str]
+) -> None:
+    """
+    Adds objects to the ingest queue with one multi-row INSERT, objects which
+    are already queued are skipped. Changes are committed together with the layers
+    """
+    now = datetime.utcnow()
+    object_ingestions = [
+        {
+            "object_name": object_name,
+            "attempts": 0,
+            "creation_date": now,
+            "next_attempt_date": now,
+        }
+        for object_name in dict.fromkeys(
+            object_names
+        )
+    ]
+    if not object_ingestions:
+        return
+
+    session.execute(
+        insert(ObjectIngestion)
+        .values(object_ingestions)
+        .on_conflict_do_nothing(
+            index_elements=[
+                ObjectIngestion.object_name
+            ]
+        )
+    )
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    """
+    Exponential backoff starting from LAYER_INGEST_INTERVAL seconds
+    """
+    delay = LAYER_INGEST_INTERVAL * 2 ** min(
+        attempts, 16
+    )
+    return timedelta(
+        seconds=min(delay, LAYER_INGEST_TIMEOUT)
+    )
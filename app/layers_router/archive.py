@@ -0,0 +1,171 @@
+import posixpath
+import shutil
+import tarfile
+import threading
+import zipfile
+import zlib
+from dataclasses import dataclass
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, List
+
+from layers_router.constants import (
+    FILE_CHUNK_SIZE,
+    SPOOLED_FILE_MAX_SIZE,
+)
+from layers_router.exceptions import (
+    ArchiveNotValid,
+)
+
+
+@dataclass
+class ArchiveMember:
+    path: str
+    name: str
+    size: int
+
+    @property
+    def directories(self) -> tuple[str, ...]:
+        return tuple(self.name.split("/")[:-1])
+
+    @property
+    def filename(self) -> str:
+        return self.name.split("/")[-1]
+
+    def is_path_valid(self) -> bool:
+        return not (
+            self.name.startswith("/")
+            or ".." in self.name.split("/")
+        )
+
+
+def is_member_skipped(path: str) -> bool:
+    """
+    Archivers metadata, e.g. __MACOSX/ folder or .DS_Store files, is not imported
+    """
+    return any(
+        (part.startswith(".") and part != "..")
+        or part == "__MACOSX"
+        for part in path.split("/")
+    )
+
+
+class LayerArchive:
+    """
+    Zip or tar (optionally compressed) archive with layer files. Members are
+    extracted one at a time, so the archive can be read from several threads
+    """
+
+    def __init__(self, file: BinaryIO):
+        self._file = file
+        self._lock = threading.Lock()
+        self._zip_file: zipfile.ZipFile | None = (
+            None
+        )
+        self._tar_file: tarfile.TarFile | None = (
+            None
+        )
+        self._tar_members: dict[
+            str, tarfile.TarInfo
+        ] = {}
+
+    def open(self) -> List[ArchiveMember]:
+        self._file.seek(0)
+        if zipfile.is_zipfile(self._file):
+            self._file.seek(0)
+            self._zip_file = zipfile.ZipFile(
+                self._file
+            )
+            members = [
+                (info.filename, info.file_size)
+                for info in self._zip_file.infolist()
+                if not info.is_dir()
+            ]
+        else:
+            self._file.seek(0)
+            try:
+                self._tar_file = tarfile.open(
+                    fileobj=self._file, mode="r:*"
+                )
+            except tarfile.TarError:
+                raise ArchiveNotValid(
+                    status_code=422,
+                    detail="File is not a zip or tar archive",
+                )
+            self._tar_members = {
+                info.name: info
+                for info in self._tar_file.getmembers()
+                if info.isfile()
+            }
+            members = [
+                (info.name, info.size)
+                for info in self._tar_members.values()
+            ]
+
+        archive_members = []
+        for path, size in members:
+            name = posixpath.normpath(
+                path.replace("\\", "/")
+            )
+            if is_member_skipped(name):
+                continue
+
+            archive_members.append(
+                ArchiveMember(
+                    path=path,
+                    name=name,
+                    size=size,
+                )
+            )
+        return archive_members
+
+    def extract(
+        self, member: ArchiveMember
+    ) -> BinaryIO:
+        """
+        Copies member content to a spooled temporary file. Corrupted, encrypted
+        or unsupported members raise ArchiveNotValid
+        """
+        extracted_file = SpooledTemporaryFile(
+            max_size=SPOOLED_FILE_MAX_SIZE
+        )
+        try:
+            with self._lock:
+                if self._zip_file:
+                    member_file = (
+                        self._zip_file.open(
+                            member.path
+                        )
+                    )
+                else:
+                    member_file = self._tar_file.extractfile(
+                        self._tar_members[
+                            member.path
+                        ]
+                    )
+                with member_file:
+                    shutil.copyfileobj(
+                        member_file,
+                        extracted_file,
+                        FILE_CHUNK_SIZE,
+                    )
+        except (
+            zipfile.BadZipFile,
+            tarfile.TarError,
+            zlib.error,
+            EOFError,
+            NotImplementedError,
+            RuntimeError,
+        ) as e:
+            extracted_file.close()
+            raise ArchiveNotValid(
+                status_code=422,
+                detail=f"Member {member.path} can't be extracted: {e}",
+            )
+        extracted_file.seek(0)
+        return extracted_file
+
+    def close(self):
+        if self._zip_file:
+            self._zip_file.close()
+        if self._tar_file:
+            self._tar_file.close()
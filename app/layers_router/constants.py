@@ -25,3 +25,61 @@ GEO_FILE_TYPES = [
     "las",
     "zlas",
 ]
+
+COMPRESSIBLE_GEO_FILE_TYPES = [
+    "geojson",
+    "kml",
+    "gpx",
+    "osm",
+    "xyz",
+]
+GEO_FILE_CONTENT_TYPES = {
+    "geojson": "application/geo+json",
+    "kml": "application/vnd.google-earth.kml+xml",
+    "kmz": "application/vnd.google-earth.kmz",
+    "gpx": "application/gpx+xml",
+    "osm": "application/vnd.openstreetmap.data+xml",
+    "tif": "image/tiff",
+    "vrt": "application/xml",
+    "asc": "text/plain",
+    "nc": "application/x-netcdf",
+    "dwg": "image/vnd.dwg",
+    "dxf": "image/vnd.dxf",
+    "gpkg": "application/geopackage+sqlite3",
+    "qgs": "application/xml",
+    "xyz": "text/plain",
+    "las": "application/vnd.las",
+}
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+GZIP_CONTENT_ENCODING = "gzip"
+
+BLOB_OBJECT_PREFIX = "blobs"
+FILE_CHUNK_SIZE = 1024 * 1024
+SPOOLED_FILE_MAX_SIZE = 16 * 1024 * 1024
+MAX_BYTE_RANGES = 64
+MAX_BATCH_LAYERS = 100
+LAYER_FRAMES_CONTENT_TYPE = (
+    "application/vnd.layers.frames"
+)
+SPATIAL_INDEX_OBJECT_SUFFIX = ".rtree"
+TILE_PYRAMID_OBJECT_SUFFIX = ".pmtiles"
+SIMPLIFIED_OBJECT_SUFFIX = ".simplified"
+# zoom levels of geometry simplification levels stored on ingest
+SIMPLIFIED_LEVEL_ZOOMS = [0, 3, 6, 9, 12]
+# objects derived from the layer object are stored with its name and a suffix
+# and deleted together with it
+DERIVED_OBJECT_SUFFIXES = [
+    SPATIAL_INDEX_OBJECT_SUFFIX,
+    TILE_PYRAMID_OBJECT_SUFFIX,
+    *(
+        f"{SIMPLIFIED_OBJECT_SUFFIX}{zoom}"
+        for zoom in SIMPLIFIED_LEVEL_ZOOMS
+    ),
+]
+VECTOR_TILE_CONTENT_TYPE = (
+    "application/vnd.mapbox-vector-tile"
+)
+PMTILES_CONTENT_TYPE = "application/vnd.pmtiles"
+# tiles are rendered per stored object which is shared by layers,
+# so the tile layer has the same name for all layers
+VECTOR_TILE_LAYER_NAME = "features"
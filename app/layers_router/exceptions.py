@@ -35,3 +35,39 @@ class FileAndLinkUploaded(LayerException):
 
 class FileOrLinkNotUploaded(LayerException):
     pass
+
+
+class PartsCountNotValid(LayerException):
+    pass
+
+
+class LayerObjectNotValid(LayerException):
+    pass
+
+
+class LayerFileNotUploaded(LayerException):
+    pass
+
+
+class ArchiveNotValid(LayerException):
+    pass
+
+
+class LayersCountNotValid(LayerException):
+    pass
+
+
+class BboxNotValid(LayerException):
+    pass
+
+
+class LayerFeaturesNotAvailable(LayerException):
+    pass
+
+
+class TileNotValid(LayerException):
+    pass
+
+
+class SimplificationNotValid(LayerException):
+    pass
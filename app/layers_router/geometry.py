@@ -0,0 +1,411 @@
+import math
+
+import numpy as np
+
+MAX_LATITUDE = 85.0511287798066
+
+
+def lon_lat_to_world(
+    coordinates: np.ndarray,
+) -> np.ndarray:
+    """
+    Web Mercator coordinates of lon/lat points normalized to [0, 1],
+    y axis points down
+    """
+    latitudes = np.radians(
+        np.clip(
+            coordinates[:, 1],
+            -MAX_LATITUDE,
+            MAX_LATITUDE,
+        )
+    )
+    world = np.empty((len(coordinates), 2))
+    world[:, 0] = (coordinates[:, 0] + 180) / 360
+    world[:, 1] = (
+        1
+        - np.log(
+            np.tan(latitudes)
+            + 1 / np.cos(latitudes)
+        )
+        / np.pi
+    ) / 2
+    return world
+
+
+def get_tile_bounds(
+    z: int, x: int, y: int, buffer: float = 0
+) -> tuple[float, float, float, float]:
+    """
+    Lon/lat bounds (min_x, min_y, max_x, max_y) of the tile,
+    buffer is a fraction of the tile size
+    """
+    tiles_count = 2**z
+
+    def get_lon(world_x: float) -> float:
+        return world_x / tiles_count * 360 - 180
+
+    def get_lat(world_y: float) -> float:
+        return math.degrees(
+            math.atan(
+                math.sinh(
+                    math.pi
+                    * (
+                        1
+                        - 2
+                        * world_y
+                        / tiles_count
+                    )
+                )
+            )
+        )
+
+    return (
+        get_lon(x - buffer),
+        get_lat(y + 1 + buffer),
+        get_lon(x + 1 + buffer),
+        get_lat(y - buffer),
+    )
+
+
+def simplify_coordinates(
+    coordinates: np.ndarray, tolerance: float
+) -> np.ndarray:
+    """
+    Douglas-Peucker simplification, first and last points are kept.
+    Distances of all points of a segment are computed at once
+    """
+    if len(coordinates) <= 2 or tolerance <= 0:
+        return coordinates
+
+    keep = np.zeros(len(coordinates), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(coordinates) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        first = coordinates[start]
+        segment = coordinates[end] - first
+        offsets = (
+            coordinates[start + 1 : end] - first
+        )
+        length = math.hypot(*segment)
+        if length:
+            distances = (
+                np.abs(
+                    segment[0] * offsets[:, 1]
+                    - segment[1] * offsets[:, 0]
+                )
+                / length
+            )
+        else:
+            distances = np.hypot(
+                offsets[:, 0], offsets[:, 1]
+            )
+
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            index += start + 1
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+    return coordinates[keep]
+
+
+def _clip_ring_by_edge(
+    ring: np.ndarray,
+    axis: int,
+    value: float,
+    keep_greater: bool,
+) -> np.ndarray:
+    """
+    One Sutherland-Hodgman step: for every ring point its intersection with the
+    edge (if the edge is crossed) and the point itself (if it is inside) are kept
+    """
+    if not len(ring):
+        return ring
+
+    if keep_greater:
+        inside = ring[:, axis] >= value
+    else:
+        inside = ring[:, axis] <= value
+    previous = np.roll(ring, 1, axis=0)
+    previous_inside = np.roll(inside, 1)
+    crossed = inside != previous_inside
+
+    with np.errstate(
+        divide="ignore", invalid="ignore"
+    ):
+        ratios = (value - previous[:, axis]) / (
+            ring[:, axis] - previous[:, axis]
+        )
+        intersections = previous + ratios[
+            :, None
+        ] * (ring - previous)
+    intersections[:, axis] = value
+
+    candidates = np.stack(
+        (intersections, ring), axis=1
+    )
+    return candidates[
+        np.stack((crossed, inside), axis=1)
+    ]
+
+
+def clip_ring(
+    ring: np.ndarray,
+    min_value: float,
+    max_value: float,
+) -> np.ndarray:
+    """
+    Clips polygon ring (without repeated closing point) by square
+    [min_value, max_value] on both axes
+    """
+    for axis in (0, 1):
+        ring = _clip_ring_by_edge(
+            ring, axis, min_value, True
+        )
+        ring = _clip_ring_by_edge(
+            ring, axis, max_value, False
+        )
+    return ring
+
+
+def clip_line(
+    line: np.ndarray,
+    min_value: float,
+    max_value: float,
+) -> list[np.ndarray]:
+    """
+    Clips line by square [min_value, max_value] on both axes, all segments are
+    clipped at once (Liang-Barsky). Line leaving the square is split into parts
+    """
+    if len(line) < 2:
+        return []
+
+    starts = line[:-1]
+    deltas = line[1:] - starts
+    enter_ratios = np.zeros(len(starts))
+    leave_ratios = np.ones(len(starts))
+    for axis in (0, 1):
+        axis_starts = starts[:, axis]
+        axis_deltas = deltas[:, axis]
+        with np.errstate(
+            divide="ignore", invalid="ignore"
+        ):
+            min_ratios = (
+                min_value - axis_starts
+            ) / axis_deltas
+            max_ratios = (
+                max_value - axis_starts
+            ) / axis_deltas
+
+        parallel = axis_deltas == 0
+        increasing = axis_deltas > 0
+        enter_ratios = np.where(
+            parallel,
+            enter_ratios,
+            np.maximum(
+                enter_ratios,
+                np.where(
+                    increasing,
+                    min_ratios,
+                    max_ratios,
+                ),
+            ),
+        )
+        leave_ratios = np.where(
+            parallel,
+            leave_ratios,
+            np.minimum(
+                leave_ratios,
+                np.where(
+                    increasing,
+                    max_ratios,
+                    min_ratios,
+                ),
+            ),
+        )
+        leave_ratios[
+            parallel
+            & (
+                (axis_starts < min_value)
+                | (axis_starts > max_value)
+            )
+        ] = -1
+
+    kept = np.flatnonzero(
+        enter_ratios <= leave_ratios
+    )
+    if not len(kept):
+        return []
+
+    clipped_starts = (
+        starts[kept]
+        + enter_ratios[kept, None] * deltas[kept]
+    )
+    clipped_ends = (
+        starts[kept]
+        + leave_ratios[kept, None] * deltas[kept]
+    )
+    continued = np.zeros(len(kept), dtype=bool)
+    continued[1:] = (
+        (np.diff(kept) == 1)
+        & (leave_ratios[kept[:-1]] >= 1)
+        & (enter_ratios[kept[1:]] <= 0)
+    )
+    part_starts = np.flatnonzero(~continued)
+    return [
+        np.vstack(
+            (
+                clipped_starts[start : start + 1],
+                clipped_ends[start:end],
+            )
+        )
+        for start, end in zip(
+            part_starts,
+            list(part_starts[1:]) + [len(kept)],
+        )
+    ]
+
+
+def get_ring_area(ring: np.ndarray) -> float:
+    """
+    Signed area of the ring (without repeated closing point) by surveyor's formula
+    """
+    following = np.roll(ring, -1, axis=0)
+    return (
+        float(
+            np.sum(
+                ring[:, 0] * following[:, 1]
+                - following[:, 0] * ring[:, 1]
+            )
+        )
+        / 2
+    )
+
+
+def get_zoom_tolerance(z: int) -> float:
+    """
+    Simplification tolerance in degrees for the zoom level,
+    width of one pixel of a 256 pixels tile at the equator
+    """
+    return 360 / (256 * 2**z)
+
+
+def _simplify_ring(
+    ring: list, tolerance: float, exterior: bool
+) -> list | None:
+    """
+    Collapsed exterior ring is replaced by its bounding box,
+    so the polygon is kept; collapsed interior ring is dropped
+    """
+    points = np.asarray(
+        [position[:2] for position in ring],
+        dtype=float,
+    )
+    simplified_points = simplify_coordinates(
+        points, tolerance
+    )
+    if len(simplified_points) >= 4:
+        return simplified_points.tolist()
+    if not exterior:
+        return None
+
+    (min_x, min_y), (max_x, max_y) = (
+        points.min(axis=0).tolist(),
+        points.max(axis=0).tolist(),
+    )
+    return [
+        [min_x, min_y],
+        [max_x, min_y],
+        [max_x, max_y],
+        [min_x, max_y],
+        [min_x, min_y],
+    ]
+
+
+def _simplify_polygon(
+    polygon: list, tolerance: float
+) -> list:
+    rings = []
+    for index, ring in enumerate(polygon):
+        if len(ring) < 4:
+            rings.append(ring)
+            continue
+        ring = _simplify_ring(
+            ring, tolerance, exterior=index == 0
+        )
+        if ring is not None:
+            rings.append(ring)
+    return rings
+
+
+def _simplify_line(
+    line: list, tolerance: float
+) -> list:
+    if len(line) <= 2:
+        return line
+    return simplify_coordinates(
+        np.asarray(
+            [position[:2] for position in line],
+            dtype=float,
+        ),
+        tolerance,
+    ).tolist()
+
+
+def simplify_geometry(
+    geometry: dict | None, tolerance: float
+) -> dict | None:
+    """
+    Geojson geometry with lines and rings simplified with tolerance
+    in degrees, points are kept as is. Simplified positions are 2D
+    """
+    if not isinstance(geometry, dict):
+        return geometry
+
+    geometry_type = geometry.get("type")
+    if geometry_type == "GeometryCollection":
+        return {
+            **geometry,
+            "geometries": [
+                simplify_geometry(
+                    member, tolerance
+                )
+                for member in geometry.get(
+                    "geometries"
+                )
+                or []
+            ],
+        }
+
+    coordinates = geometry.get("coordinates")
+    if not coordinates:
+        return geometry
+    if geometry_type == "LineString":
+        coordinates = _simplify_line(
+            coordinates, tolerance
+        )
+    elif geometry_type == "MultiLineString":
+        coordinates = [
+            _simplify_line(line, tolerance)
+            for line in coordinates
+        ]
+    elif geometry_type == "Polygon":
+        coordinates = _simplify_polygon(
+            coordinates, tolerance
+        )
+    elif geometry_type == "MultiPolygon":
+        coordinates = [
+            _simplify_polygon(polygon, tolerance)
+            for polygon in coordinates
+        ]
+    else:
+        return geometry
+    return {
+        **geometry,
+        "coordinates": coordinates,
+    }
@@ -0,0 +1,471 @@
+import json
+import struct
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import BinaryIO, Callable
+
+from cachetools import LRUCache
+
+PMTILES_MAGIC = b"PMTiles"
+PMTILES_VERSION = 3
+PMTILES_HEADER = struct.Struct(
+    "<7sB11QBBBBBBiiiiBii"
+)
+# header and root directory are read by one request
+PMTILES_ROOT_SIZE = 16384
+PMTILES_NO_COMPRESSION = 1
+PMTILES_MVT_TILE_TYPE = 1
+PMTILES_LEAF_CACHE_SIZE = 64
+
+
+def zxy_to_tile_id(z: int, x: int, y: int) -> int:
+    """
+    Position of the tile on the Hilbert curve of its zoom level
+    after all tiles of the lower zoom levels
+    """
+    tile_id = ((1 << 2 * z) - 1) // 3
+    tiles_count = 1 << z
+    size = tiles_count >> 1
+    while size:
+        rx = 1 if x & size else 0
+        ry = 1 if y & size else 0
+        tile_id += size * size * ((3 * rx) ^ ry)
+        if not ry:
+            if rx:
+                x = tiles_count - 1 - x
+                y = tiles_count - 1 - y
+            x, y = y, x
+        size >>= 1
+    return tile_id
+
+
+def _encode_varint(value: int) -> bytes:
+    data = bytearray()
+    while value > 0x7F:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def _decode_varint(
+    data: bytes, offset: int
+) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+@dataclass
+class PMTilesDirectory:
+    """
+    Directory entries sorted by tile id. Entry with zero run length
+    points to a leaf directory
+    """
+
+    tile_ids: list[int]
+    offsets: list[int]
+    lengths: list[int]
+    run_lengths: list[int]
+
+    def to_bytes(self) -> bytes:
+        data = [
+            _encode_varint(len(self.tile_ids))
+        ]
+        last_tile_id = 0
+        for tile_id in self.tile_ids:
+            data.append(
+                _encode_varint(
+                    tile_id - last_tile_id
+                )
+            )
+            last_tile_id = tile_id
+        data.extend(
+            map(_encode_varint, self.run_lengths)
+        )
+        data.extend(
+            map(_encode_varint, self.lengths)
+        )
+        for index, offset in enumerate(
+            self.offsets
+        ):
+            # offset of the tile which follows the previous one is written as 0
+            if index and offset == (
+                self.offsets[index - 1]
+                + self.lengths[index - 1]
+            ):
+                data.append(_encode_varint(0))
+            else:
+                data.append(
+                    _encode_varint(offset + 1)
+                )
+        return b"".join(data)
+
+    @classmethod
+    def from_bytes(
+        cls, data: bytes
+    ) -> "PMTilesDirectory":
+        count, offset = _decode_varint(data, 0)
+        values = []
+        for _ in range(4 * count):
+            value, offset = _decode_varint(
+                data, offset
+            )
+            values.append(value)
+
+        tile_ids = []
+        last_tile_id = 0
+        for delta in values[:count]:
+            last_tile_id += delta
+            tile_ids.append(last_tile_id)
+        run_lengths = values[count : 2 * count]
+        lengths = values[2 * count : 3 * count]
+        offsets = []
+        for index, value in enumerate(
+            values[3 * count :]
+        ):
+            if index and not value:
+                offsets.append(
+                    offsets[-1]
+                    + lengths[index - 1]
+                )
+            else:
+                offsets.append(value - 1)
+
+        return cls(
+            tile_ids=tile_ids,
+            offsets=offsets,
+            lengths=lengths,
+            run_lengths=run_lengths,
+        )
+
+
+class PMTilesWriter:
+    """
+    Writes PMTiles v3 archive of MVT tiles. Tiles have to be added in the order
+    of tile ids, so tile data is clustered. Equal tiles are stored once and
+    consecutive equal tiles are written as one directory entry
+    """
+
+    def __init__(self, tile_data: BinaryIO):
+        self._tile_data = tile_data
+        self._tile_data_length = 0
+        self._tile_offsets: dict[
+            bytes, tuple[int, int]
+        ] = {}
+        self._entries = PMTilesDirectory(
+            tile_ids=[],
+            offsets=[],
+            lengths=[],
+            run_lengths=[],
+        )
+        self._addressed_tiles_count = 0
+        self._min_zoom: int | None = None
+        self._max_zoom = 0
+
+    def add_tile(
+        self, z: int, x: int, y: int, tile: bytes
+    ) -> None:
+        tile_id = zxy_to_tile_id(z, x, y)
+        entries = self._entries
+        if entries.tile_ids and (
+            tile_id <= entries.tile_ids[-1]
+        ):
+            raise ValueError(
+                "Tiles have to be added in the order of tile ids"
+            )
+
+        self._addressed_tiles_count += 1
+        if self._min_zoom is None:
+            self._min_zoom = z
+        self._max_zoom = max(self._max_zoom, z)
+
+        if tile not in self._tile_offsets:
+            self._tile_offsets[tile] = (
+                self._tile_data_length,
+                len(tile),
+            )
+            self._tile_data.write(tile)
+            self._tile_data_length += len(tile)
+        offset, length = self._tile_offsets[tile]
+
+        if (
+            entries.tile_ids
+            and entries.offsets[-1] == offset
+            and entries.tile_ids[-1]
+            + entries.run_lengths[-1]
+            == tile_id
+        ):
+            entries.run_lengths[-1] += 1
+            return
+
+        entries.tile_ids.append(tile_id)
+        entries.offsets.append(offset)
+        entries.lengths.append(length)
+        entries.run_lengths.append(1)
+
+    def _get_directories(
+        self,
+    ) -> tuple[bytes, bytes]:
+        """
+        Root directory and leaf directories. Entries are split into leaf directories
+        if the root directory doesn't fit into the first PMTILES_ROOT_SIZE bytes
+        """
+        entries = self._entries
+        root = entries.to_bytes()
+        leaf_size = 4096
+        while (
+            PMTILES_HEADER.size + len(root)
+            > PMTILES_ROOT_SIZE
+        ):
+            leaves = []
+            root_entries = PMTilesDirectory(
+                tile_ids=[],
+                offsets=[],
+                lengths=[],
+                run_lengths=[],
+            )
+            leaves_length = 0
+            for start in range(
+                0,
+                len(entries.tile_ids),
+                leaf_size,
+            ):
+                leaf = PMTilesDirectory(
+                    tile_ids=entries.tile_ids[
+                        start : start + leaf_size
+                    ],
+                    offsets=entries.offsets[
+                        start : start + leaf_size
+                    ],
+                    lengths=entries.lengths[
+                        start : start + leaf_size
+                    ],
+                    run_lengths=entries.run_lengths[
+                        start : start + leaf_size
+                    ],
+                ).to_bytes()
+                root_entries.tile_ids.append(
+                    entries.tile_ids[start]
+                )
+                root_entries.offsets.append(
+                    leaves_length
+                )
+                root_entries.lengths.append(
+                    len(leaf)
+                )
+                root_entries.run_lengths.append(0)
+                leaves.append(leaf)
+                leaves_length += len(leaf)
+
+            root = root_entries.to_bytes()
+            if (
+                PMTILES_HEADER.size + len(root)
+                <= PMTILES_ROOT_SIZE
+            ):
+                return root, b"".join(leaves)
+            leaf_size *= 2
+
+        return root, b""
+
+    def write(
+        self,
+        file: BinaryIO,
+        metadata: dict,
+        bounds: tuple[float, float, float, float],
+    ) -> None:
+        """
+        Writes header, directories, metadata and tile data into the file
+        """
+        root, leaves = self._get_directories()
+        metadata = json.dumps(metadata).encode()
+        root_offset = PMTILES_HEADER.size
+        metadata_offset = root_offset + len(root)
+        leaves_offset = metadata_offset + len(
+            metadata
+        )
+        tile_data_offset = leaves_offset + len(
+            leaves
+        )
+        min_lon, min_lat, max_lon, max_lat = (
+            round(value * 10**7)
+            for value in bounds
+        )
+        min_zoom = self._min_zoom or 0
+
+        file.write(
+            PMTILES_HEADER.pack(
+                PMTILES_MAGIC,
+                PMTILES_VERSION,
+                root_offset,
+                len(root),
+                metadata_offset,
+                len(metadata),
+                leaves_offset,
+                len(leaves),
+                tile_data_offset,
+                self._tile_data_length,
+                self._addressed_tiles_count,
+                len(self._entries.tile_ids),
+                len(self._tile_offsets),
+                1,
+                PMTILES_NO_COMPRESSION,
+                PMTILES_NO_COMPRESSION,
+                PMTILES_MVT_TILE_TYPE,
+                min_zoom,
+                self._max_zoom,
+                min_lon,
+                min_lat,
+                max_lon,
+                max_lat,
+                min_zoom,
+                (min_lon + max_lon) // 2,
+                (min_lat + max_lat) // 2,
+            )
+        )
+        file.write(root)
+        file.write(metadata)
+        file.write(leaves)
+        self._tile_data.seek(0)
+        while chunk := self._tile_data.read(
+            1024 * 1024
+        ):
+            file.write(chunk)
+
+
+class PMTilesReader:
+    """
+    Reads tiles of PMTiles archive by byte ranges. Header and root directory
+    are read once, leaf directories are cached, so a tile is usually one read
+    """
+
+    def __init__(
+        self,
+        read_range: Callable[[int, int], bytes],
+    ):
+        self._read_range = read_range
+        data = read_range(0, PMTILES_ROOT_SIZE)
+        header = PMTILES_HEADER.unpack(
+            data[: PMTILES_HEADER.size]
+        )
+        if (
+            header[0] != PMTILES_MAGIC
+            or header[1] != PMTILES_VERSION
+        ):
+            raise ValueError(
+                "PMTiles archive is not valid"
+            )
+
+        (
+            root_offset,
+            root_length,
+            _,
+            _,
+            self._leaves_offset,
+            _,
+            self._tile_data_offset,
+        ) = header[2:9]
+        self.max_zoom = header[18]
+        self._root = PMTilesDirectory.from_bytes(
+            data[
+                root_offset : root_offset
+                + root_length
+            ]
+        )
+        self._leaves = LRUCache(
+            maxsize=PMTILES_LEAF_CACHE_SIZE
+        )
+        self._lock = threading.Lock()
+
+    def _get_leaf(
+        self, offset: int, length: int
+    ) -> PMTilesDirectory:
+        with self._lock:
+            leaf = self._leaves.get(offset)
+        if leaf is None:
+            leaf = PMTilesDirectory.from_bytes(
+                self._read_range(
+                    self._leaves_offset + offset,
+                    length,
+                )
+            )
+            with self._lock:
+                self._leaves[offset] = leaf
+        return leaf
+
+    def get_tile(
+        self, z: int, x: int, y: int
+    ) -> bytes | None:
+        """
+        Tile content, None if archive has no such tile
+        """
+        tile_id = zxy_to_tile_id(z, x, y)
+        directory = self._root
+        # root and leaf directories
+        for _ in range(4):
+            index = (
+                bisect_right(
+                    directory.tile_ids, tile_id
+                )
+                - 1
+            )
+            if index < 0:
+                return None
+
+            offset = directory.offsets[index]
+            length = directory.lengths[index]
+            run_length = directory.run_lengths[
+                index
+            ]
+            if not run_length:
+                directory = self._get_leaf(
+                    offset, length
+                )
+                continue
+
+            if (
+                tile_id
+                - directory.tile_ids[index]
+                >= run_length
+            ):
+                return None
+            return self._read_range(
+                self._tile_data_offset + offset,
+                length,
+            )
+        return None
+
+
+_shared_pmtiles_readers: LRUCache = LRUCache(
+    maxsize=1024
+)
+_shared_pmtiles_readers_lock = threading.Lock()
+
+
+def get_pmtiles_reader(
+    object_name: str,
+    read_range: Callable[[int, int], bytes],
+) -> PMTilesReader:
+    """
+    Reader of the archive shared by the process. Archives are immutable,
+    so parsed directories are kept until the reader is evicted
+    """
+    with _shared_pmtiles_readers_lock:
+        reader = _shared_pmtiles_readers.get(
+            object_name
+        )
+    if reader is None:
+        reader = PMTilesReader(
+            read_range=read_range
+        )
+        with _shared_pmtiles_readers_lock:
+            _shared_pmtiles_readers[
+                object_name
+            ] = reader
+    return reader
@@ -1,28 +1,176 @@
+import asyncio
 import copy
-import io
+import datetime
+import functools
 import json
+import math
+import os
+import struct
+from itertools import groupby
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterator,
+    List,
+)
+from uuid import uuid4
 
-import requests
+from fastapi import UploadFile
+from minio import S3Error
+from minio.datatypes import Object, Part
+from minio.helpers import (
+    MAX_MULTIPART_COUNT,
+    ObjectWriteResult,
+)
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import (
+    insert,
+)
 from sqlmodel import Session
+from starlette.background import BackgroundTask
+from starlette.concurrency import (
+    run_in_threadpool,
+)
+from starlette.responses import (
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
+from urllib3.exceptions import HTTPError
 
+import database
+from common.http_cache import (
+    get_strong_etag,
+    get_weak_etag,
+    is_not_modified,
+    to_http_date,
+)
 from common.initializers import Initializer
-from config.minio_config import MINIO_URL
-from layers_router.constants import GEO_FILE_TYPES
+from common.single_flight import SingleFlight
+from config.minio_config import (
+    MINIO_PARALLEL_UPLOADS,
+    MINIO_PRESIGNED_URL_EXPIRES,
+    MINIO_UPLOAD_TIMEOUT,
+)
+from config.spatial_index_config import (
+    SPATIAL_INDEX_MAX_RANGE_GAP,
+)
+from config.vector_tile_config import (
+    VECTOR_TILE_BUFFER,
+    VECTOR_TILE_EXTENT,
+    VECTOR_TILE_MAX_ZOOM,
+    VECTOR_TILE_SIMPLIFY_TOLERANCE,
+)
+from content_cache.disk_cache import (
+    CachedFile,
+    get_disk_content_cache,
+)
+from content_cache.memory_cache import (
+    CachedContent,
+    get_memory_content_cache,
+)
+from layer_ingest.tasks import (
+    layer_ingest_worker,
+)
+from layers_router.archive import (
+    ArchiveMember,
+    LayerArchive,
+)
+from layers_router.constants import (
+    COMPRESSIBLE_GEO_FILE_TYPES,
+    FILE_CHUNK_SIZE,
+    GEO_FILE_CONTENT_TYPES,
+    GEO_FILE_TYPES,
+    GZIP_CONTENT_ENCODING,
+    LAYER_FRAMES_CONTENT_TYPE,
+    MAX_BATCH_LAYERS,
+    SIMPLIFIED_LEVEL_ZOOMS,
+    SIMPLIFIED_OBJECT_SUFFIX,
+    SPATIAL_INDEX_OBJECT_SUFFIX,
+    TILE_PYRAMID_OBJECT_SUFFIX,
+    VECTOR_TILE_CONTENT_TYPE,
+    VECTOR_TILE_LAYER_NAME,
+)
 from layers_router.exceptions import (
+    ArchiveNotValid,
     FolderNotExists,
     LayerAlreadyExists,
     LayerDoesNotExists,
     NotAvailableGeoFileType,
+    PartsCountNotValid,
+    LayerObjectNotValid,
+    LayerFileNotUploaded,
+    LayersCountNotValid,
+    BboxNotValid,
+    LayerFeaturesNotAvailable,
+    SimplificationNotValid,
+    TileNotValid,
+)
+from layers_router.geometry import (
+    get_tile_bounds,
+    get_zoom_tolerance,
+)
+from layers_router.pmtiles import (
+    get_pmtiles_reader,
 )
 from layers_router.schemas import (
     CreateLayerRequest,
+    LayerUploadUrlRequest,
+    LayerUploadCompleteRequest,
+    LayerImportFailure,
+    LayerImportResponse,
+    LayerContentRequest,
+    LayerContentDelivery,
+    LayersContentFormat,
+)
+from layers_router.spatial_index import (
+    SpatialIndex,
+    get_spatial_index_cache,
+    write_spatial_index,
 )
 from layers_router.utils import (
     FileAndLinkValidator,
+    LayerDatabaseGetter,
+    accepts_encoding,
+    add_layer_blob_reference,
+    add_layer_blob_references,
+    compress_file,
+    decompress_chunks,
+    generate_object_name,
+    get_blob_object_name,
+    get_file_extension,
+    get_file_content_type,
+    get_file_hash,
+    get_layer_object_name,
+    get_released_object_names,
+    get_response_media_type,
+    is_if_range_matched,
+    parse_range_header,
     save_layer_and_return,
 )
-from models import Layer
+from layers_router.vector_tiles import (
+    VectorTileEncoder,
+    get_vector_tile_cache,
+)
+from link_cache.processors import (
+    FetchLinkContent,
+)
+from link_cache.utils import (
+    release_orphaned_link_cache_entries,
+)
+from models import (
+    Folder,
+    Layer,
+    LayerBlob,
+    LinkCacheEntry,
+)
+from object_deletion.utils import (
+    enqueue_object_deletions,
+    lock_object_names,
+)
+from services.storage_service.exceptions import (
+    StorageException,
+)
 
 
 class GetLayers:
@@ -36,6 +184,16 @@ class GetLayers:
         self._offset = offset
         self._session = session
 
+    def get_etag(self) -> str:
+        layers_version = LayerDatabaseGetter(
+            session=self._session
+        ).get_layers_version()
+        return get_weak_etag(
+            self._limit,
+            self._offset,
+            *layers_version,
+        )
+
     def execute(self):
         result_objects = self._session.execute(
             select(Layer)
@@ -68,6 +226,18 @@ class GetLayersByFolderId(Initializer):
 
         return None
 
+    def get_etag(self) -> str:
+        layers_version = self._layer_db_getter.get_layers_version(
+            folder_id=self._folder_id,
+            by_folder=True,
+        )
+        return get_weak_etag(
+            self._folder_id,
+            self._limit,
+            self._offset,
+            *layers_version,
+        )
+
     def execute(self):
         return self._layer_db_getter.get_layers_instance_by_folder_id(
             parent_folder_id=self._folder_id
@@ -87,21 +257,85 @@ class CreateLayer(Initializer):
         self._layer_name = layer_name
         self._file_source = file_source
         self._folder_id = folder_id
+        self._filename = (
+            file_source.file.filename
+            if file_source.file
+            else None
+        )
+        self._object_name = None
+        self._content_encoding = None
+        self._etag = None
+
+    def _is_file_compressed(self) -> bool:
+        return (
+            self._file_source.compress
+            and get_file_extension(self._filename)
+            in COMPRESSIBLE_GEO_FILE_TYPES
+        )
 
     async def _create_file(self) -> str:
-        file_bytes = (
-            await self._file_source.file.read()
+        """
+        Files are stored by content hash, so equal files uploaded as different layers
+        are stored and uploaded only once. Text geo files are gzip compressed on request
+        """
+        file = self._file_source.file.file
+        if self._is_file_compressed():
+            file = await self._async_minio_client.run_in_executor(
+                compress_file,
+                file,
+                timeout=MINIO_UPLOAD_TIMEOUT,
+            )
+            self._content_encoding = (
+                GZIP_CONTENT_ENCODING
+            )
+
+        (
+            content_hash,
+            file_size,
+        ) = await self._async_minio_client.run_in_executor(
+            get_file_hash,
+            file,
+            timeout=MINIO_UPLOAD_TIMEOUT,
+        )
+        self._object_name = get_blob_object_name(
+            content_hash
+        )
+
+        lock_object_names(
+            session=self._session,
+            object_names=[self._object_name],
         )
-        buf = io.BytesIO(file_bytes)
+        blob_exists = self._layer_db_getter.get_layer_blob_by_object_name(
+            object_name=self._object_name
+        )
+        if not blob_exists:
+            object_write_result = await self._async_minio_client.create_file(
+                filename=self._object_name,
+                data_buf=file,
+                length=file_size,
+                content_type=get_file_content_type(
+                    self._filename
+                ),
+                content_encoding=self._content_encoding,
+            )
+            self._etag = object_write_result.etag
 
-        self._minio_client.create_file(
-            filename=self._file_source.file.filename,
-            data_buf=buf,
-            length=buf.getbuffer().nbytes,
+        if (
+            file
+            is not self._file_source.file.file
+        ):
+            file.close()
+
+        add_layer_blob_reference(
+            session=self._session,
+            object_name=self._object_name,
+            content_hash=content_hash,
+            size=file_size,
+            etag=self._etag,
         )
 
-        file_link_in_minio = self._minio_client.get_file(
-            filename=self._file_source.file.filename
+        file_link_in_minio = await self._async_minio_client.get_file(
+            filename=self._object_name
         )
 
         return file_link_in_minio
@@ -132,10 +366,10 @@ class CreateLayer(Initializer):
             )
 
     def _check_file_content_type(self):
-        if self._file_source.file:
-            file_content_type = self._file_source.file.filename.split(
-                "."
-            )[-1].lower()
+        if self._filename:
+            file_content_type = (
+                get_file_extension(self._filename)
+            )
 
             not_available_file_type = (
                 file_content_type
@@ -165,133 +399,2443 @@ class CreateLayer(Initializer):
         self._check_file_content_type()
 
     async def execute(self):
+        file_link = self._file_source.server_link
+        if self._file_source.file:
+            file_link = await self._create_file()
+
         new_layer = Layer(
             folder_id=self._folder_id,
             name=self._layer_name,
-            file_link=await self._create_file()
-            if self._file_source.file
-            else self._file_source.server_link,
+            file_link=file_link,
+            object_name=self._object_name,
+            content_encoding=self._content_encoding,
             created_by="test_client",
             modified_by="test_client",
         )
 
-        return save_layer_and_return(
+        layer = save_layer_and_return(
             session=self._session, layer=new_layer
         )
+        layer_ingest_worker.trigger()
+        return layer
 
 
-class UpdateLayer(Initializer):
+class CreateLayerFromObject(CreateLayer):
+    """
+    Creates layer for a file which is uploaded to minio not through this service
+    (upload sessions, presigned urls). Layer checks are the same as for CreateLayer
+    """
+
     def __init__(
         self,
-        layer_id: int,
+        layer_name: str,
         folder_id: int | None,
+        filename: str,
+        object_name: str | None,
         session: Session,
+        file_size: int | None = None,
+        etag: str | None = None,
     ):
-        super().__init__(session=session)
-        self._folder_id = folder_id
-        self._layer_id = layer_id
+        super().__init__(
+            layer_name=layer_name,
+            folder_id=folder_id,
+            file_source=CreateLayerRequest(),
+            session=session,
+        )
+        self._filename = filename
+        self._object_name = object_name
+        self._file_size = file_size
+        self._etag = etag
 
-    def check(self):
-        if self._folder_id:
-            folder_instance = self._folder_db_getter.get_folder_instance_by_id(
-                folder_id=self._folder_id
-            )
-            if (
-                self._folder_id
-                and folder_instance
-            ):
-                return
+    def _check_request_instances(self):
+        return
 
-            raise FolderNotExists(
-                status_code=422,
-                detail=f"Folder with id {self._folder_id} does not exists",
+    async def execute(self):
+        if self._etag is None:
+            file_stat = await self._async_minio_client.stat_file(
+                filename=self._object_name
             )
+            if file_stat:
+                self._etag = file_stat.etag
 
-    def execute(self):
-        layer_instance = self._layer_db_getter.get_layer_instance_by_id(
-            layer_id=self._layer_id
+        add_layer_blob_reference(
+            session=self._session,
+            object_name=self._object_name,
+            size=self._file_size,
+            etag=self._etag,
         )
-        layer_instance.folder_id = self._folder_id
 
-        self._session.add(layer_instance)
-        self._session.flush()
+        new_layer = Layer(
+            folder_id=self._folder_id,
+            name=self._layer_name,
+            file_link=await self._async_minio_client.get_file(
+                filename=self._object_name
+            ),
+            object_name=self._object_name,
+            created_by="test_client",
+            modified_by="test_client",
+        )
 
-        updated_layer = copy.deepcopy(
-            layer_instance
+        layer = save_layer_and_return(
+            session=self._session, layer=new_layer
         )
-        self._session.commit()
-        return updated_layer
+        layer_ingest_worker.trigger()
+        return layer
 
 
-class DeleteLayer(Initializer):
+class CreateLayerUploadUrl(CreateLayerFromObject):
+    """
+    Returns presigned url for uploading layer file directly to minio.
+    If parts_count is set, multipart upload is created and url is returned for every part
+    """
+
     def __init__(
-        self, layer_id: int, session: Session
+        self,
+        request: LayerUploadUrlRequest,
+        session: Session,
     ):
-        super().__init__(session=session)
-        self._layer_id = layer_id
-
-        self._layer_instance = self._layer_db_getter.get_layer_instance_by_id(
-            layer_id=self._layer_id
+        super().__init__(
+            layer_name=request.layer_name,
+            folder_id=request.folder_id,
+            filename=request.filename,
+            object_name=generate_object_name(
+                request.filename
+            ),
+            session=session,
         )
+        self._parts_count = request.parts_count
 
     def check(self):
-        if self._layer_instance:
-            return
+        super().check()
 
-        raise LayerDoesNotExists(
-            status_code=422,
-            detail=f"Layer with id {self._layer_id} does not exists",
+        parts_count_not_valid = (
+            self._parts_count is not None
+            and not 1
+            <= self._parts_count
+            <= MAX_MULTIPART_COUNT
         )
+        if parts_count_not_valid:
+            raise PartsCountNotValid(
+                status_code=422,
+                detail=f"Parts count must be between 1 and {MAX_MULTIPART_COUNT}",
+            )
+
+    async def execute(self):
+        response = {
+            "object_name": self._object_name,
+            "upload_url": None,
+            "upload_id": None,
+            "part_upload_urls": [],
+            "expires_in": MINIO_PRESIGNED_URL_EXPIRES,
+        }
+
+        if not self._parts_count:
+            response[
+                "upload_url"
+            ] = await self._async_minio_client.get_upload_url(
+                filename=self._object_name
+            )
+            return response
+
+        upload_id = await self._async_minio_client.create_multipart_upload(
+            filename=self._object_name,
+            content_type=get_file_content_type(
+                self._filename
+            ),
+        )
+        response["upload_id"] = upload_id
+        response["part_upload_urls"] = [
+            await self._async_minio_client.get_upload_part_url(
+                filename=self._object_name,
+                upload_id=upload_id,
+                part_number=part_number,
+            )
+            for part_number in range(
+                1, self._parts_count + 1
+            )
+        ]
+        return response
 
-    def execute(self):
-        file_link = self._layer_instance.file_link
 
-        filename = self._layer_instance.name
+class CompleteLayerUpload(CreateLayerFromObject):
+    """
+    Creates layer for a file uploaded by presigned url from CreateLayerUploadUrl.
+    Multipart upload is completed from the parts minio has received
+    """
 
-        file_link_domain = file_link.split("/")[2]
+    def __init__(
+        self,
+        request: LayerUploadCompleteRequest,
+        session: Session,
+    ):
+        super().__init__(
+            layer_name=request.layer_name,
+            folder_id=request.folder_id,
+            filename=request.filename,
+            object_name=request.object_name,
+            session=session,
+        )
+        self._upload_id = request.upload_id
 
-        if file_link_domain == MINIO_URL:
-            self._minio_client.delete_file(
-                filename=filename
+    def _check_object_name(self):
+        object_prefix, _, object_filename = (
+            self._object_name.partition("/")
+        )
+        object_name_not_valid = (
+            len(object_prefix) != 32
+            or object_filename
+            != os.path.basename(self._filename)
+        )
+        if object_name_not_valid:
+            raise LayerObjectNotValid(
+                status_code=422,
+                detail=f"Object {self._object_name} was not created for file {self._filename}",
             )
 
-        self._session.delete(
-            instance=self._layer_instance
+        layer_instance = self._layer_db_getter.get_layer_instance_by_object_name(
+            object_name=self._object_name
         )
-        self._session.commit()
+        if layer_instance:
+            raise LayerObjectNotValid(
+                status_code=422,
+                detail=f"Object {self._object_name} is already used by layer {layer_instance.name}",
+            )
 
+    def check(self):
+        super().check()
+        self._check_object_name()
+
+    async def execute(self):
+        if self._upload_id:
+            parts = await self._async_minio_client.list_parts(
+                filename=self._object_name,
+                upload_id=self._upload_id,
+            )
+            await self._async_minio_client.complete_multipart_upload(
+                filename=self._object_name,
+                upload_id=self._upload_id,
+                parts=[
+                    Part(
+                        part.part_number,
+                        part.etag,
+                    )
+                    for part in parts
+                ],
+            )
+
+        file_stat = await self._async_minio_client.stat_file(
+            filename=self._object_name
+        )
+        if not file_stat:
+            raise LayerFileNotUploaded(
+                status_code=422,
+                detail=f"File {self._object_name} was not uploaded",
+            )
+        self._file_size = file_stat.size
+        self._etag = file_stat.etag
+
+        return await super().execute()
+
+
+# archive member and storage errors are reported as failures of the member,
+# other errors abort the import
+IMPORT_MEMBER_ERRORS = (
+    ArchiveNotValid,
+    StorageException,
+    S3Error,
+    HTTPError,
+    OSError,
+)
+
+
+class ImportLayers(Initializer):
+    """
+    Imports layers from a zip or tar archive. Archive directories are mapped onto
+    folders under folder_id, members are uploaded to minio in parallel and all
+    folders and layers are inserted with multi-row INSERTs in one transaction.
+    Members which can't be imported are reported and skipped
+    """
 
-class GetLayerContent(Initializer):
     def __init__(
-        self, layer_id: int, session: Session
+        self,
+        folder_id: int | None,
+        file: UploadFile,
+        compress: bool,
+        session: Session,
     ):
         super().__init__(session=session)
-        self._layer_id = layer_id
 
-        self._layer_instance = self._layer_db_getter.get_layer_instance_by_id(
-            layer_id=self._layer_id
-        )
+        self._folder_id = folder_id
+        self._file = file
+        self._compress = compress
+        self._failures: list[
+            LayerImportFailure
+        ] = []
+        self._folder_ids: dict[
+            tuple, int | None
+        ] = {(): folder_id}
+        self._new_directories: set[tuple] = set()
+        self._object_uploads: dict[
+            str, asyncio.Future
+        ] = {}
 
     def check(self):
-        if self._layer_instance:
-            return
+        folder_instance = self._folder_db_getter.get_folder_instance_by_id(
+            folder_id=self._folder_id
+        )
+        if (
+            self._folder_id
+            and not folder_instance
+        ):
+            raise FolderNotExists(
+                status_code=422,
+                detail=f"Folder with id {self._folder_id} does not exists",
+            )
 
-        raise LayerDoesNotExists(
-            status_code=422,
-            detail=f"Layer with id {self._layer_id} does not exists",
+    def _add_failure(
+        self, member: ArchiveMember, detail: str
+    ):
+        self._failures.append(
+            LayerImportFailure(
+                member=member.path, detail=detail
+            )
         )
 
-    def execute(self) -> json:
-        file_link = self._layer_instance.file_link
-        file_link_domain = file_link.split("/")[2]
+    def _get_layer_name(
+        self, member: ArchiveMember
+    ) -> str:
+        return os.path.splitext(member.filename)[
+            0
+        ]
+
+    def _validate_members(
+        self, members: list[ArchiveMember]
+    ) -> list[ArchiveMember]:
+        existing_layer_names = self._layer_db_getter.get_existing_layer_names(
+            layer_names=[
+                self._get_layer_name(member)
+                for member in members
+            ]
+        )
+
+        valid_members = []
+        for member in members:
+            layer_name = self._get_layer_name(
+                member
+            )
+            file_content_type = (
+                get_file_extension(
+                    member.filename
+                )
+            )
+            if not member.is_path_valid():
+                self._add_failure(
+                    member,
+                    f"Member path {member.path} is not valid",
+                )
+            elif (
+                file_content_type
+                not in GEO_FILE_TYPES
+            ):
+                self._add_failure(
+                    member,
+                    f"File content type .{file_content_type} is not available as geo file",
+                )
+            elif (
+                layer_name in existing_layer_names
+            ):
+                self._add_failure(
+                    member,
+                    f"Layer with name {layer_name} is already exists",
+                )
+            else:
+                existing_layer_names.add(
+                    layer_name
+                )
+                valid_members.append(member)
+
+        return valid_members
+
+    def _resolve_folders(
+        self, members: list[ArchiveMember]
+    ) -> list[ArchiveMember]:
+        """
+        Maps archive directories onto folders. Existing folder is reused if it has
+        the same parent, folder names are unique, so directories which names
+        are taken by other folders can't be imported
+        """
+        directories = sorted(
+            {
+                member.directories[:depth]
+                for member in members
+                for depth in range(
+                    1, len(member.directories) + 1
+                )
+            },
+            key=len,
+        )
+        existing_folders = self._folder_db_getter.get_folder_instances_by_names(
+            folder_names=[
+                directory[-1]
+                for directory in directories
+            ]
+        )
+
+        folder_names: set[str] = set()
+        invalid_directories: dict[tuple, str] = {}
+        for directory in directories:
+            parent = directory[:-1]
+            name = directory[-1]
+            if parent in invalid_directories:
+                invalid_directories[directory] = (
+                    invalid_directories[parent]
+                )
+                continue
+
+            existing_folder = (
+                existing_folders.get(name)
+            )
+            is_existing_folder_reused = (
+                existing_folder
+                and parent
+                not in self._new_directories
+                and existing_folder.parent_id
+                == self._folder_ids[parent]
+            )
+            if is_existing_folder_reused:
+                self._folder_ids[directory] = (
+                    existing_folder.id
+                )
+            elif existing_folder or (
+                name in folder_names
+            ):
+                invalid_directories[directory] = (
+                    f"Folder with name {name} is already exists"
+                )
+            else:
+                self._new_directories.add(
+                    directory
+                )
+            folder_names.add(name)
+
+        valid_members = []
+        for member in members:
+            detail = invalid_directories.get(
+                member.directories
+            )
+            if detail:
+                self._add_failure(member, detail)
+            else:
+                valid_members.append(member)
+
+        return valid_members
+
+    async def _prepare_member_file(
+        self,
+        archive: LayerArchive,
+        member: ArchiveMember,
+    ) -> tuple[BinaryIO, str | None]:
+        file = await self._async_minio_client.run_in_executor(
+            archive.extract,
+            member,
+            timeout=MINIO_UPLOAD_TIMEOUT,
+        )
+        is_file_compressed = (
+            self._compress
+            and get_file_extension(
+                member.filename
+            )
+            in COMPRESSIBLE_GEO_FILE_TYPES
+        )
+        if not is_file_compressed:
+            return file, None
+
+        try:
+            compressed_file = await self._async_minio_client.run_in_executor(
+                compress_file,
+                file,
+                timeout=MINIO_UPLOAD_TIMEOUT,
+            )
+        finally:
+            file.close()
+        return (
+            compressed_file,
+            GZIP_CONTENT_ENCODING,
+        )
+
+    async def _hash_member(
+        self,
+        archive: LayerArchive,
+        member: ArchiveMember,
+        semaphore: asyncio.Semaphore,
+    ) -> dict | None:
+        """
+        Content hash and size of the member file in the form it is stored
+        """
+        try:
+            async with semaphore:
+                (
+                    file,
+                    content_encoding,
+                ) = await self._prepare_member_file(
+                    archive, member
+                )
+                with file:
+                    (
+                        content_hash,
+                        file_size,
+                    ) = await self._async_minio_client.run_in_executor(
+                        get_file_hash,
+                        file,
+                        timeout=MINIO_UPLOAD_TIMEOUT,
+                    )
+        except IMPORT_MEMBER_ERRORS as e:
+            self._add_failure(
+                member,
+                getattr(e, "detail", None)
+                or str(e),
+            )
+            return None
+
+        return {
+            "member": member,
+            "object_name": get_blob_object_name(
+                content_hash
+            ),
+            "content_hash": content_hash,
+            "size": file_size,
+            "content_encoding": content_encoding,
+        }
+
+    def _get_existing_object_names(
+        self, hashed_members: list[dict]
+    ) -> set[str]:
+        """
+        Locks objects of all members at once and returns the ones which are
+        already stored as blobs, locks are held until the import is committed
+        """
+        object_names = {
+            hashed_member["object_name"]
+            for hashed_member in hashed_members
+        }
+        lock_object_names(
+            session=self._session,
+            object_names=object_names,
+        )
+        return self._layer_db_getter.get_existing_blob_object_names(
+            object_names=object_names
+        )
+
+    async def _upload_object(
+        self,
+        archive: LayerArchive,
+        hashed_member: dict,
+        semaphore: asyncio.Semaphore,
+    ) -> ObjectWriteResult:
+        member = hashed_member["member"]
+        async with semaphore:
+            (
+                file,
+                content_encoding,
+            ) = await self._prepare_member_file(
+                archive, member
+            )
+            with file:
+                return await self._async_minio_client.create_file(
+                    filename=hashed_member[
+                        "object_name"
+                    ],
+                    data_buf=file,
+                    length=hashed_member["size"],
+                    content_type=get_file_content_type(
+                        member.filename
+                    ),
+                    content_encoding=content_encoding,
+                )
+
+    async def _upload_member(
+        self,
+        archive: LayerArchive,
+        hashed_member: dict,
+        existing_object_names: set[str],
+        semaphore: asyncio.Semaphore,
+    ) -> dict | None:
+        """
+        Members with equal content are uploaded once, the other members
+        wait for the same upload. Member file is extracted again for the upload,
+        so only files of running uploads are kept
+        """
+        object_name = hashed_member["object_name"]
+        try:
+            object_upload = (
+                self._object_uploads.get(
+                    object_name
+                )
+            )
+            if (
+                not object_upload
+                and object_name
+                not in existing_object_names
+            ):
+                object_upload = (
+                    asyncio.ensure_future(
+                        self._upload_object(
+                            archive,
+                            hashed_member,
+                            semaphore,
+                        )
+                    )
+                )
+                self._object_uploads[
+                    object_name
+                ] = object_upload
+            etag = None
+            if object_upload:
+                object_write_result = (
+                    await asyncio.shield(
+                        object_upload
+                    )
+                )
+                etag = object_write_result.etag
+
+            file_link = await self._async_minio_client.get_file(
+                filename=object_name
+            )
+        except IMPORT_MEMBER_ERRORS as e:
+            self._add_failure(
+                hashed_member["member"],
+                getattr(e, "detail", None)
+                or str(e),
+            )
+            return None
 
-        if file_link_domain == MINIO_URL:
-            response = requests.get(
-                url=file_link, timeout=30
+        return {
+            **hashed_member,
+            "etag": etag,
+            "file_link": file_link,
+        }
+
+    async def _upload_members(
+        self,
+        archive: LayerArchive,
+        members: list[ArchiveMember],
+    ) -> list[dict]:
+        semaphore = asyncio.Semaphore(
+            MINIO_PARALLEL_UPLOADS
+        )
+        hashed_members = await asyncio.gather(
+            *(
+                self._hash_member(
+                    archive, member, semaphore
+                )
+                for member in members
+            )
+        )
+        hashed_members = [
+            hashed_member
+            for hashed_member in hashed_members
+            if hashed_member
+        ]
+        existing_object_names = (
+            self._get_existing_object_names(
+                hashed_members
+            )
+        )
+        uploaded_members = await asyncio.gather(
+            *(
+                self._upload_member(
+                    archive,
+                    hashed_member,
+                    existing_object_names,
+                    semaphore,
+                )
+                for hashed_member in hashed_members
             )
+        )
+        return [
+            uploaded_member
+            for uploaded_member in uploaded_members
+            if uploaded_member
+        ]
 
-            if response.status_code == 200:
-                file_content = response.text
-                return file_content
+    def _create_folders(
+        self, uploaded_members: list[dict]
+    ) -> list[dict]:
+        """
+        Inserts missing folders level by level, one multi-row INSERT per depth
+        """
+        directories = {
+            uploaded_member["member"].directories[
+                :depth
+            ]
+            for uploaded_member in uploaded_members
+            for depth in range(
+                1,
+                len(
+                    uploaded_member[
+                        "member"
+                    ].directories
+                )
+                + 1,
+            )
+        }
+        new_directories = sorted(
+            (
+                directory
+                for directory in directories
+                if directory
+                in self._new_directories
+            ),
+            key=len,
+        )
 
-        return file_link
+        created_folders = []
+        for depth, level_directories in groupby(
+            new_directories, key=len
+        ):
+            level_directories = list(
+                level_directories
+            )
+            query = (
+                insert(Folder)
+                .values(
+                    [
+                        {
+                            "name": directory[-1],
+                            "parent_id": self._folder_ids[
+                                directory[:-1]
+                            ],
+                            "created_by": "test_client",
+                            "modified_by": "test_client",
+                        }
+                        for directory in level_directories
+                    ]
+                )
+                .returning(
+                    Folder.id,
+                    Folder.name,
+                    Folder.parent_id,
+                )
+            )
+            folders = self._session.execute(
+                query
+            ).all()
+            created_folder_ids = {
+                folder.name: folder.id
+                for folder in folders
+            }
+            for directory in level_directories:
+                self._folder_ids[directory] = (
+                    created_folder_ids[
+                        directory[-1]
+                    ]
+                )
+            created_folders.extend(
+                dict(folder._mapping)
+                for folder in folders
+            )
+
+        return created_folders
+
+    def _create_layers(
+        self, uploaded_members: list[dict]
+    ) -> list[dict]:
+        if not uploaded_members:
+            return []
+
+        query = (
+            insert(Layer)
+            .values(
+                [
+                    {
+                        "folder_id": self._folder_ids[
+                            uploaded_member[
+                                "member"
+                            ].directories
+                        ],
+                        "name": self._get_layer_name(
+                            uploaded_member[
+                                "member"
+                            ]
+                        ),
+                        "file_link": uploaded_member[
+                            "file_link"
+                        ],
+                        "object_name": uploaded_member[
+                            "object_name"
+                        ],
+                        "content_encoding": uploaded_member[
+                            "content_encoding"
+                        ],
+                        "created_by": "test_client",
+                        "modified_by": "test_client",
+                    }
+                    for uploaded_member in uploaded_members
+                ]
+            )
+            .on_conflict_do_nothing(
+                index_elements=[Layer.name]
+            )
+            .returning(*Layer.__table__.columns)
+        )
+        layers = [
+            dict(layer._mapping)
+            for layer in self._session.execute(
+                query
+            )
+        ]
+
+        created_layer_names = {
+            layer["name"] for layer in layers
+        }
+        referenced_members = []
+        for uploaded_member in uploaded_members:
+            member = uploaded_member["member"]
+            layer_name = self._get_layer_name(
+                member
+            )
+            if layer_name in created_layer_names:
+                referenced_members.append(
+                    uploaded_member
+                )
+            else:
+                self._add_failure(
+                    member,
+                    f"Layer with name {layer_name} is already exists",
+                )
+
+        add_layer_blob_references(
+            session=self._session,
+            blobs=referenced_members,
+        )
+
+        referenced_object_names = {
+            uploaded_member["object_name"]
+            for uploaded_member in referenced_members
+        }
+        enqueue_object_deletions(
+            session=self._session,
+            object_names=[
+                object_name
+                for object_name in self._object_uploads
+                if object_name
+                not in referenced_object_names
+            ],
+        )
+
+        return layers
+
+    async def execute(
+        self,
+    ) -> LayerImportResponse:
+        archive = LayerArchive(
+            file=self._file.file
+        )
+        try:
+            members = await self._async_minio_client.run_in_executor(
+                archive.open,
+                timeout=MINIO_UPLOAD_TIMEOUT,
+            )
+            members = self._validate_members(
+                members
+            )
+            members = self._resolve_folders(
+                members
+            )
+            uploaded_members = (
+                await self._upload_members(
+                    archive, members
+                )
+            )
+        finally:
+            archive.close()
+
+        folders = self._create_folders(
+            uploaded_members
+        )
+        layers = self._create_layers(
+            uploaded_members
+        )
+        self._session.commit()
+        layer_ingest_worker.trigger()
+
+        return LayerImportResponse(
+            folders=folders,
+            layers=layers,
+            failures=self._failures,
+        )
+
+
+class UpdateLayer(Initializer):
+    def __init__(
+        self,
+        layer_id: int,
+        folder_id: int | None,
+        session: Session,
+    ):
+        super().__init__(session=session)
+        self._folder_id = folder_id
+        self._layer_id = layer_id
+
+    def check(self):
+        if self._folder_id:
+            folder_instance = self._folder_db_getter.get_folder_instance_by_id(
+                folder_id=self._folder_id
+            )
+            if (
+                self._folder_id
+                and folder_instance
+            ):
+                return
+
+            raise FolderNotExists(
+                status_code=422,
+                detail=f"Folder with id {self._folder_id} does not exists",
+            )
+
+    def execute(self):
+        layer_instance = self._layer_db_getter.get_layer_instance_by_id(
+            layer_id=self._layer_id
+        )
+        layer_instance.folder_id = self._folder_id
+        layer_instance.modification_date = (
+            datetime.datetime.utcnow()
+        )
+
+        self._session.add(layer_instance)
+        self._session.flush()
+
+        updated_layer = copy.deepcopy(
+            layer_instance
+        )
+        self._session.commit()
+        return updated_layer
+
+
+class DeleteLayer(Initializer):
+    def __init__(
+        self, layer_id: int, session: Session
+    ):
+        super().__init__(session=session)
+        self._layer_id = layer_id
+
+        self._layer_instance = self._layer_db_getter.get_layer_instance_by_id(
+            layer_id=self._layer_id
+        )
+
+    def check(self):
+        if self._layer_instance:
+            return
+
+        raise LayerDoesNotExists(
+            status_code=422,
+            detail=f"Layer with id {self._layer_id} does not exists",
+        )
+
+    def execute(self):
+        """
+        Minio objects are not deleted inline, they are queued in the same
+        transaction and deleted by the object deletion worker
+        """
+        enqueue_object_deletions(
+            session=self._session,
+            object_names=get_released_object_names(
+                session=self._session,
+                layers=[self._layer_instance],
+            ),
+        )
+
+        self._session.delete(
+            instance=self._layer_instance
+        )
+        self._session.flush()
+        enqueue_object_deletions(
+            session=self._session,
+            object_names=release_orphaned_link_cache_entries(
+                session=self._session
+            ),
+        )
+        self._session.commit()
+
+        get_memory_content_cache().invalidate_layer(
+            layer_id=self._layer_id
+        )
+
+
+layer_content_single_flight = SingleFlight()
+
+
+# lookups shared by concurrent requests run in their own sessions, the session
+# of the request which started the lookup is closed if the request is cancelled
+def get_shared_layer_with_blob_etag(
+    layer_id: int,
+) -> tuple[Layer | None, str | None]:
+    with Session(database.engine) as session:
+        return LayerDatabaseGetter(
+            session=session
+        ).get_layer_instance_with_blob_etag(
+            layer_id=layer_id
+        )
+
+
+def get_shared_layer_with_blob(
+    layer_id: int,
+) -> tuple[Layer | None, LayerBlob | None]:
+    with Session(database.engine) as session:
+        return LayerDatabaseGetter(
+            session=session
+        ).get_layer_instance_with_blob(
+            layer_id=layer_id
+        )
+
+
+class GetLayerContent(Initializer):
+    def __init__(
+        self,
+        layer_id: int,
+        session: Session,
+        layer_instance: Layer | None = None,
+        object_etag: str | None = None,
+    ):
+        """
+        Layer instance and etag of its object can be passed if they are already loaded,
+        e.g. by a batch request
+        """
+        super().__init__(session=session)
+        self._layer_id = layer_id
+        self._content_cache = (
+            get_memory_content_cache()
+        )
+        self._disk_content_cache = (
+            get_disk_content_cache()
+        )
+
+        self._layer_instance = layer_instance
+        self._object_etag = object_etag
+        self._last_modified: (
+            datetime.datetime | None
+        ) = None
+
+    async def check(self):
+        """
+        Concurrent requests of the same layer share one database lookup
+        """
+        (
+            self._layer_instance,
+            self._object_etag,
+        ) = await layer_content_single_flight.run(
+            key=("layer", self._layer_id),
+            func=lambda: run_in_threadpool(
+                get_shared_layer_with_blob_etag,
+                layer_id=self._layer_id,
+            ),
+        )
+        if self._layer_instance:
+            return
+
+        raise LayerDoesNotExists(
+            status_code=422,
+            detail=f"Layer with id {self._layer_id} does not exists",
+        )
+
+    def _get_byte_ranges_content(
+        self,
+        content: CachedContent | Object,
+        get_chunks: Callable[
+            ..., Iterator[bytes]
+        ],
+        byte_ranges: list[tuple[int, int]],
+        headers: dict,
+    ) -> StreamingResponse:
+        """
+        Single range is sent as is, several ranges are sent as multipart/byteranges,
+        every range is read with a separate ranged request
+        """
+        media_type = get_response_media_type(
+            content.content_type
+        )
+        if len(byte_ranges) == 1:
+            start, end = byte_ranges[0]
+            headers["Content-Range"] = (
+                f"bytes {start}-{end}/{content.size}"
+            )
+            headers["Content-Length"] = str(
+                end - start + 1
+            )
+            return StreamingResponse(
+                content=get_chunks(
+                    offset=start,
+                    length=end - start + 1,
+                ),
+                status_code=206,
+                media_type=media_type,
+                headers=headers,
+            )
+
+        boundary = uuid4().hex
+        part_headers = [
+            (
+                f"--{boundary}\r\n"
+                f"Content-Type: {media_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{content.size}\r\n\r\n"
+            ).encode()
+            for start, end in byte_ranges
+        ]
+        closing_boundary = (
+            f"--{boundary}--\r\n".encode()
+        )
+        headers["Content-Length"] = str(
+            sum(
+                len(part_header) + end - start + 3
+                for part_header, (
+                    start,
+                    end,
+                ) in zip(
+                    part_headers, byte_ranges
+                )
+            )
+            + len(closing_boundary)
+        )
+
+        def get_parts_chunks():
+            for part_header, (start, end) in zip(
+                part_headers, byte_ranges
+            ):
+                yield part_header
+                yield from get_chunks(
+                    offset=start,
+                    length=end - start + 1,
+                )
+                yield b"\r\n"
+            yield closing_boundary
+
+        return StreamingResponse(
+            content=get_parts_chunks(),
+            status_code=206,
+            media_type=f"multipart/byteranges; boundary={boundary}",
+            headers=headers,
+        )
+
+    def _is_content_decompressed(
+        self, request: LayerContentRequest
+    ) -> bool:
+        content_encoding = (
+            self._layer_instance.content_encoding
+        )
+        return bool(
+            content_encoding
+        ) and not accepts_encoding(
+            request.accept_encoding,
+            content_encoding,
+        )
+
+    def _get_validator_headers(
+        self,
+        object_etag: str,
+        request: LayerContentRequest,
+    ) -> dict:
+        """
+        Layer content never changes, so Last-Modified is the layer creation date,
+        for server link content it is the date the cached content was changed.
+        Decompressed content is another representation and has its own etag
+        """
+        if self._is_content_decompressed(request):
+            object_etag = f"{object_etag}-decoded"
+
+        headers = {
+            "ETag": get_strong_etag(object_etag),
+            "Last-Modified": to_http_date(
+                self._last_modified
+            ),
+        }
+        if self._layer_instance.content_encoding:
+            headers["Vary"] = "Accept-Encoding"
+        return headers
+
+    def _get_not_modified_response(
+        self,
+        headers: dict,
+        request: LayerContentRequest,
+    ) -> Response | None:
+        if is_not_modified(
+            if_none_match=request.if_none_match,
+            if_modified_since=request.if_modified_since,
+            etag=headers["ETag"],
+            last_modified=self._last_modified,
+        ):
+            return Response(
+                status_code=304, headers=headers
+            )
+        return None
+
+    def _get_content(
+        self,
+        content: CachedContent
+        | CachedFile
+        | Object,
+        get_chunks: Callable[
+            ..., Iterator[bytes]
+        ],
+        request: LayerContentRequest,
+        headers: dict,
+    ) -> Response:
+        """
+        Content (minio object, cached content or cached file) is streamed by chunks.
+        Compressed content is sent as is if client accepts its encoding, otherwise it is
+        decompressed while streaming. Byte ranges are served for stored representation only
+        """
+        if self._is_content_decompressed(request):
+            return StreamingResponse(
+                content=decompress_chunks(
+                    get_chunks()
+                ),
+                media_type=get_response_media_type(
+                    content.content_type
+                ),
+                headers=headers,
+            )
+
+        if self._layer_instance.content_encoding:
+            headers["Content-Encoding"] = (
+                self._layer_instance.content_encoding
+            )
+        headers["Accept-Ranges"] = "bytes"
+
+        byte_ranges = None
+        if is_if_range_matched(
+            if_range=request.if_range,
+            etag=headers["ETag"],
+            last_modified=self._last_modified,
+        ):
+            byte_ranges = parse_range_header(
+                range_header=request.range,
+                size=content.size,
+            )
+
+        if byte_ranges == []:
+            return Response(
+                status_code=416,
+                headers={
+                    "Content-Range": f"bytes */{content.size}"
+                },
+            )
+        if byte_ranges:
+            return self._get_byte_ranges_content(
+                content=content,
+                get_chunks=get_chunks,
+                byte_ranges=byte_ranges,
+                headers=headers,
+            )
+
+        headers["Content-Length"] = str(
+            content.size
+        )
+        return StreamingResponse(
+            content=get_chunks(),
+            media_type=get_response_media_type(
+                content.content_type
+            ),
+            headers=headers,
+        )
+
+    def _find_cached_content(
+        self, object_name: str, object_etag: str
+    ) -> CachedContent | CachedFile | None:
+        """
+        Memory cache is checked first, then disk cache
+        """
+        return self._content_cache.get(
+            layer_id=self._layer_id,
+            etag=object_etag,
+        ) or self._disk_content_cache.get(
+            object_name=object_name,
+            etag=object_etag,
+        )
+
+    def _get_cached_content(
+        self,
+        object_name: str,
+        object_etag: str,
+        request: LayerContentRequest,
+        headers: dict,
+    ) -> Response | None:
+        cached_content = (
+            self._find_cached_content(
+                object_name=object_name,
+                object_etag=object_etag,
+            )
+        )
+        if not cached_content:
+            return None
+
+        response = self._get_content(
+            content=cached_content,
+            get_chunks=functools.partial(
+                cached_content.get_chunks,
+                chunk_size=FILE_CHUNK_SIZE,
+            ),
+            request=request,
+            headers=headers,
+        )
+        if isinstance(cached_content, CachedFile):
+            response.background = BackgroundTask(
+                cached_content.close
+            )
+        return response
+
+    async def _fetch_object_content(
+        self,
+        object_name: str,
+        object_stat: Object,
+    ) -> CachedContent:
+        """
+        Small objects are read whole and put to the memory content cache
+        """
+        object_content = await self._async_minio_client.run_in_executor(
+            lambda: b"".join(
+                self._minio_client.get_file_chunks(
+                    filename=object_name,
+                    chunk_size=FILE_CHUNK_SIZE,
+                )
+            )
+        )
+        cached_content = CachedContent(
+            content=object_content,
+            content_type=object_stat.content_type,
+        )
+        self._content_cache.put(
+            layer_id=self._layer_id,
+            etag=object_stat.etag,
+            cached_content=cached_content,
+        )
+        return cached_content
+
+    def _get_object_chunks(
+        self,
+        object_name: str,
+        object_stat: Object,
+        offset: int = 0,
+        length: int = 0,
+        chunk_size: int = FILE_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        """
+        Object is streamed from minio, byte ranges with a ranged request.
+        Whole object fitting the disk cache is cached while it is streamed
+        """
+        chunks = (
+            self._minio_client.get_file_chunks(
+                filename=object_name,
+                offset=offset,
+                length=length,
+                chunk_size=chunk_size,
+            )
+        )
+        if (
+            offset
+            or length
+            or not self._disk_content_cache.is_cacheable(
+                object_stat.size
+            )
+        ):
+            return chunks
+
+        return self._disk_content_cache.get_caching_chunks(
+            object_name=object_name,
+            etag=object_stat.etag,
+            content_type=object_stat.content_type,
+            chunks=chunks,
+        )
+
+    async def _load_object_content(
+        self,
+        object_name: str,
+        object_stat: Object,
+    ) -> tuple[
+        CachedContent | Object,
+        Callable[..., Iterator[bytes]],
+    ]:
+        """
+        Concurrent requests of small layer content share one fetch from minio to the
+        memory cache. Larger objects are streamed from minio by every request without
+        waiting for a download, the disk cache is filled while streaming.
+        Returns content and function which reads its chunks
+        """
+        if not self._content_cache.is_cacheable(
+            object_stat.size
+        ):
+            return object_stat, functools.partial(
+                self._get_object_chunks,
+                object_name=object_name,
+                object_stat=object_stat,
+            )
+
+        content = await layer_content_single_flight.run(
+            key=(
+                "content",
+                self._layer_id,
+                object_stat.etag,
+            ),
+            func=lambda: self._fetch_object_content(
+                object_name=object_name,
+                object_stat=object_stat,
+            ),
+        )
+        return content, functools.partial(
+            content.get_chunks,
+            chunk_size=FILE_CHUNK_SIZE,
+        )
+
+    async def _get_object_content(
+        self,
+        object_name: str,
+        object_stat: Object,
+        request: LayerContentRequest,
+        headers: dict,
+    ) -> Response:
+        (
+            content,
+            get_chunks,
+        ) = await self._load_object_content(
+            object_name=object_name,
+            object_stat=object_stat,
+        )
+        return self._get_content(
+            content=content,
+            get_chunks=get_chunks,
+            request=request,
+            headers=headers,
+        )
+
+    async def get_content_source(
+        self,
+    ) -> (
+        tuple[
+            CachedContent | CachedFile | Object,
+            Callable[..., Iterator[bytes]],
+        ]
+        | None
+    ):
+        """
+        Stored content of the layer and function which reads its chunks (not decoded),
+        None if the layer has no stored object
+        """
+        object_name = get_layer_object_name(
+            self._layer_instance
+        )
+        if not object_name:
+            return None
+
+        if self._object_etag:
+            cached_content = (
+                self._find_cached_content(
+                    object_name=object_name,
+                    object_etag=self._object_etag,
+                )
+            )
+            if cached_content:
+                return (
+                    cached_content,
+                    functools.partial(
+                        cached_content.get_chunks,
+                        chunk_size=FILE_CHUNK_SIZE,
+                    ),
+                )
+
+        object_stat = await layer_content_single_flight.run(
+            key=("stat", object_name),
+            func=lambda: self._async_minio_client.stat_file(
+                filename=object_name
+            ),
+        )
+        if not object_stat:
+            return None
+
+        if not self._object_etag:
+            cached_content = (
+                self._find_cached_content(
+                    object_name=object_name,
+                    object_etag=object_stat.etag,
+                )
+            )
+            if cached_content:
+                return (
+                    cached_content,
+                    functools.partial(
+                        cached_content.get_chunks,
+                        chunk_size=FILE_CHUNK_SIZE,
+                    ),
+                )
+
+        return await self._load_object_content(
+            object_name=object_name,
+            object_stat=object_stat,
+        )
+
+    async def _get_redirect_response(
+        self,
+        object_name: str | None,
+        request: LayerContentRequest,
+    ) -> RedirectResponse | None:
+        """
+        Server link layers are redirected to the link. Compressed content which
+        client doesn't accept has to be decompressed, so it is proxied
+        """
+        if not object_name:
+            return RedirectResponse(
+                url=self._layer_instance.file_link,
+                status_code=307,
+            )
+
+        if self._is_content_decompressed(request):
+            return None
+
+        redirect_url = await self._async_minio_client.get_file_redirect_url(
+            filename=object_name
+        )
+        return RedirectResponse(
+            url=redirect_url,
+            status_code=307,
+            headers={"Cache-Control": "no-store"},
+        )
+
+    async def _get_stored_content(
+        self,
+        object_name: str,
+        object_etag: str | None,
+        request: LayerContentRequest,
+    ) -> Response | None:
+        """
+        Conditional requests are answered with the etag stored with the object
+        without requests to minio. Older objects have no stored etag, they are checked after stat.
+        Content cached in memory or on disk is served without requests to minio as well.
+        None is returned if the object doesn't exist
+        """
+        if object_etag:
+            headers = self._get_validator_headers(
+                object_etag=object_etag,
+                request=request,
+            )
+            not_modified_response = (
+                self._get_not_modified_response(
+                    headers=headers,
+                    request=request,
+                )
+            )
+            if not_modified_response:
+                return not_modified_response
+
+            cached_content_response = (
+                self._get_cached_content(
+                    object_name=object_name,
+                    object_etag=object_etag,
+                    request=request,
+                    headers=headers,
+                )
+            )
+            if cached_content_response:
+                return cached_content_response
+
+        object_stat = await layer_content_single_flight.run(
+            key=("stat", object_name),
+            func=lambda: self._async_minio_client.stat_file(
+                filename=object_name
+            ),
+        )
+        if not object_stat:
+            return None
+
+        if not object_etag:
+            headers = self._get_validator_headers(
+                object_etag=object_stat.etag,
+                request=request,
+            )
+            not_modified_response = (
+                self._get_not_modified_response(
+                    headers=headers,
+                    request=request,
+                )
+            )
+            if not_modified_response:
+                return not_modified_response
+
+            cached_content_response = (
+                self._get_cached_content(
+                    object_name=object_name,
+                    object_etag=object_stat.etag,
+                    request=request,
+                    headers=headers,
+                )
+            )
+            if cached_content_response:
+                return cached_content_response
+
+        return await self._get_object_content(
+            object_name=object_name,
+            object_stat=object_stat,
+            request=request,
+            headers=headers,
+        )
+
+    def _check_simplification(
+        self, request: LayerContentRequest
+    ):
+        if (
+            request.zoom is not None
+            and request.tolerance is not None
+        ):
+            raise SimplificationNotValid(
+                status_code=422,
+                detail="Only one of zoom and tolerance can be set",
+            )
+        if request.zoom is not None and not (
+            0
+            <= request.zoom
+            <= VECTOR_TILE_MAX_ZOOM
+        ):
+            raise SimplificationNotValid(
+                status_code=422,
+                detail=f"zoom has to be between 0 and {VECTOR_TILE_MAX_ZOOM}",
+            )
+        if (
+            request.tolerance is not None
+            and not request.tolerance > 0
+        ):
+            raise SimplificationNotValid(
+                status_code=422,
+                detail="tolerance has to be positive",
+            )
+
+    async def _get_simplified_object_name(
+        self,
+        object_name: str | None,
+        request: LayerContentRequest,
+    ) -> str | None:
+        """
+        Coarsest simplification level stored on ingest which tolerance is not greater
+        than the requested one (zoom is converted to its tolerance).
+        Object itself is returned if there is no such level
+        """
+        if (
+            request.zoom is None
+            and request.tolerance is None
+        ) or not self._layer_instance.object_name:
+            return object_name
+
+        (
+            _,
+            layer_blob,
+        ) = await layer_content_single_flight.run(
+            key=("layer_blob", self._layer_id),
+            func=lambda: run_in_threadpool(
+                get_shared_layer_with_blob,
+                layer_id=self._layer_id,
+            ),
+        )
+        if (
+            not layer_blob
+            or layer_blob.simplified_max_zoom
+            is None
+        ):
+            return object_name
+
+        tolerance = (
+            request.tolerance
+            if request.tolerance is not None
+            else get_zoom_tolerance(request.zoom)
+        )
+        for zoom in sorted(
+            SIMPLIFIED_LEVEL_ZOOMS
+        ):
+            if (
+                zoom
+                <= layer_blob.simplified_max_zoom
+                and get_zoom_tolerance(zoom)
+                <= tolerance
+            ):
+                return f"{object_name}{SIMPLIFIED_OBJECT_SUFFIX}{zoom}"
+        return object_name
+
+    async def _fetch_link(
+        self, force_refresh: bool
+    ) -> LinkCacheEntry | None:
+        with Session(
+            database.engine,
+            expire_on_commit=False,
+        ) as session:
+            task = FetchLinkContent(
+                url=self._layer_instance.file_link,
+                session=session,
+                force_refresh=force_refresh,
+            )
+            return await task.execute()
+
+    async def _get_link_content(
+        self, request: LayerContentRequest
+    ) -> Response:
+        """
+        Server link content is fetched through the link cache and served as a stored object.
+        If the cached object is missing, the link is fetched again without validators.
+        Content which can't be cached is left to the client, it is redirected to the link
+        """
+        file_link = self._layer_instance.file_link
+        for force_refresh in (False, True):
+            link_cache_entry = await layer_content_single_flight.run(
+                key=(
+                    "link",
+                    file_link,
+                    force_refresh,
+                ),
+                func=functools.partial(
+                    self._fetch_link,
+                    force_refresh=force_refresh,
+                ),
+            )
+            if not link_cache_entry:
+                break
+
+            self._last_modified = (
+                link_cache_entry.modification_date
+            )
+            link_content = await self._get_stored_content(
+                object_name=link_cache_entry.object_name,
+                object_etag=link_cache_entry.object_etag,
+                request=request,
+            )
+            if link_content:
+                return link_content
+
+        return RedirectResponse(
+            url=file_link, status_code=307
+        )
+
+    async def execute(
+        self, request: LayerContentRequest
+    ) -> json:
+        """
+        Stored layer content is served from caches or minio. Server link is returned as is,
+        with delivery=fetch its content is fetched and served through the link cache.
+        With zoom or tolerance the matching simplification level of the content is served
+        """
+        self._check_simplification(request)
+        file_link = self._layer_instance.file_link
+        object_name = get_layer_object_name(
+            self._layer_instance
+        )
+        object_etag = self._object_etag
+        simplified_object_name = await self._get_simplified_object_name(
+            object_name=object_name,
+            request=request,
+        )
+        if simplified_object_name != object_name:
+            object_name = simplified_object_name
+            object_etag = None
+        self._last_modified = (
+            self._layer_instance.creation_date
+        )
+        if (
+            request.delivery
+            == LayerContentDelivery.redirect
+        ):
+            redirect_response = (
+                await self._get_redirect_response(
+                    object_name=object_name,
+                    request=request,
+                )
+            )
+            if redirect_response:
+                return redirect_response
+
+        if not object_name:
+            if (
+                request.delivery
+                == LayerContentDelivery.fetch
+            ):
+                return (
+                    await self._get_link_content(
+                        request=request
+                    )
+                )
+            return file_link
+
+        stored_content = (
+            await self._get_stored_content(
+                object_name=object_name,
+                object_etag=object_etag,
+                request=request,
+            )
+        )
+        return stored_content or file_link
+
+
+class GetLayersContent(Initializer):
+    def __init__(
+        self,
+        layer_ids: List[int],
+        session: Session,
+    ):
+        super().__init__(session=session)
+        self._layer_ids = list(
+            dict.fromkeys(layer_ids)
+        )
+        self._layers: list[
+            tuple[Layer, str | None]
+        ] = []
+
+    def check(self):
+        if (
+            not self._layer_ids
+            or len(self._layer_ids)
+            > MAX_BATCH_LAYERS
+        ):
+            raise LayersCountNotValid(
+                status_code=422,
+                detail=f"From 1 to {MAX_BATCH_LAYERS} layers can be requested at once",
+            )
+
+        layers = {
+            layer.id: (layer, object_etag)
+            for layer, object_etag in self._layer_db_getter.get_layers_instances_with_blob_etags(
+                layer_ids=self._layer_ids
+            )
+        }
+        not_exists_layer_ids = [
+            layer_id
+            for layer_id in self._layer_ids
+            if layer_id not in layers
+        ]
+        if not_exists_layer_ids:
+            raise LayerDoesNotExists(
+                status_code=422,
+                detail=f"Layers with ids {not_exists_layer_ids} do not exist",
+            )
+
+        self._layers = [
+            layers[layer_id]
+            for layer_id in self._layer_ids
+        ]
+
+    @staticmethod
+    def _get_part(
+        layer: Layer,
+        content_source: tuple[
+            CachedContent | CachedFile | Object,
+            Callable[..., Iterator[bytes]],
+        ]
+        | None,
+    ) -> tuple[str, int | None, Iterator[bytes]]:
+        """
+        Media type, length (None if unknown) and chunks of the layer part.
+        Compressed content is decoded, layers without stored content are sent as their link
+        """
+        if not content_source:
+            file_link = layer.file_link.encode()
+            return (
+                "text/plain",
+                len(file_link),
+                iter([file_link]),
+            )
+
+        content, get_chunks = content_source
+        media_type = get_response_media_type(
+            content.content_type
+        )
+        if layer.content_encoding:
+            return (
+                media_type,
+                None,
+                decompress_chunks(get_chunks()),
+            )
+        return (
+            media_type,
+            content.size,
+            get_chunks(),
+        )
+
+    @staticmethod
+    def _get_multipart_chunks(
+        layer_ids: list[int],
+        parts: list[
+            tuple[
+                str, int | None, Iterator[bytes]
+            ]
+        ],
+        boundary: str,
+    ) -> Iterator[bytes]:
+        for layer_id, (
+            media_type,
+            length,
+            chunks,
+        ) in zip(layer_ids, parts):
+            part_header = (
+                f"--{boundary}\r\n"
+                f"Content-Type: {media_type}\r\n"
+                f"Content-ID: <layer-{layer_id}>\r\n"
+            )
+            if length is not None:
+                part_header += f"Content-Length: {length}\r\n"
+            yield f"{part_header}\r\n".encode()
+            yield from chunks
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode()
+
+    @staticmethod
+    def _get_frames_chunks(
+        layer_ids: list[int],
+        parts: list[
+            tuple[
+                str, int | None, Iterator[bytes]
+            ]
+        ],
+    ) -> Iterator[bytes]:
+        for layer_id, (_, _, chunks) in zip(
+            layer_ids, parts
+        ):
+            for chunk in chunks:
+                if chunk:
+                    yield struct.pack(
+                        ">II",
+                        layer_id,
+                        len(chunk),
+                    )
+                    yield chunk
+            yield struct.pack(">II", layer_id, 0)
+
+    async def execute(
+        self, content_format: LayersContentFormat
+    ) -> StreamingResponse:
+        """
+        Contents of all layers are loaded concurrently (shared with single layer requests
+        through content caches), so the response starts after the slowest layer is loaded,
+        not after all of them one by one. Parts are sent in the order of requested ids
+        """
+        tasks = [
+            GetLayerContent(
+                layer_id=layer.id,
+                session=self._session,
+                layer_instance=layer,
+                object_etag=object_etag,
+            )
+            for layer, object_etag in self._layers
+        ]
+        content_sources = await asyncio.gather(
+            *(
+                task.get_content_source()
+                for task in tasks
+            )
+        )
+        layer_ids = [
+            layer.id for layer, _ in self._layers
+        ]
+        parts = [
+            self._get_part(
+                layer=layer,
+                content_source=content_source,
+            )
+            for (layer, _), content_source in zip(
+                self._layers, content_sources
+            )
+        ]
+
+        if (
+            content_format
+            == LayersContentFormat.frames
+        ):
+            return StreamingResponse(
+                content=self._get_frames_chunks(
+                    layer_ids=layer_ids,
+                    parts=parts,
+                ),
+                media_type=LAYER_FRAMES_CONTENT_TYPE,
+            )
+
+        boundary = uuid4().hex
+        return StreamingResponse(
+            content=self._get_multipart_chunks(
+                layer_ids=layer_ids,
+                parts=parts,
+                boundary=boundary,
+            ),
+            media_type=f"multipart/mixed; boundary={boundary}",
+        )
+
+
+class GetIndexedLayerFeatures(Initializer):
+    """
+    Base of requests which read features of a vector layer inside bounds
+    through the spatial index of the layer
+    """
+
+    def __init__(
+        self,
+        layer_id: int,
+        session: Session,
+    ):
+        super().__init__(session=session)
+        self._layer_id = layer_id
+        self._spatial_index_cache = (
+            get_spatial_index_cache()
+        )
+
+        self._bounds: tuple[
+            float, float, float, float
+        ] = ()
+        self._layer_instance: Layer | None = None
+        self._object_etag: str | None = None
+
+    async def _load_layer(self):
+        (
+            self._layer_instance,
+            self._object_etag,
+        ) = await layer_content_single_flight.run(
+            key=("layer", self._layer_id),
+            func=lambda: run_in_threadpool(
+                get_shared_layer_with_blob_etag,
+                layer_id=self._layer_id,
+            ),
+        )
+
+    async def check(self):
+        await self._load_layer()
+        if not self._layer_instance:
+            raise LayerDoesNotExists(
+                status_code=422,
+                detail=f"Layer with id {self._layer_id} does not exists",
+            )
+
+    def _read_object_range(
+        self,
+        object_name: str,
+        offset: int,
+        length: int,
+    ) -> bytes:
+        return b"".join(
+            self._minio_client.get_file_chunks(
+                filename=object_name,
+                offset=offset,
+                length=length,
+                chunk_size=FILE_CHUNK_SIZE,
+            )
+        )
+
+    def _load_spatial_index(
+        self, index_object_name: str
+    ) -> SpatialIndex | None:
+        if not self._minio_client.stat_file(
+            filename=index_object_name
+        ):
+            return None
+
+        return SpatialIndex.from_stored(
+            read_range=functools.partial(
+                self._read_object_range,
+                index_object_name,
+            )
+        )
+
+    def _build_spatial_index(
+        self,
+        index_object_name: str,
+        get_chunks: Callable[
+            ..., Iterator[bytes]
+        ],
+    ) -> SpatialIndex:
+        """
+        Parses geojson of the layer, writes spatial index object and returns its tree
+        """
+        chunks = get_chunks()
+        if self._layer_instance.content_encoding:
+            chunks = decompress_chunks(chunks)
+        try:
+            geojson = json.loads(b"".join(chunks))
+        except ValueError:
+            geojson = None
+        if not isinstance(
+            geojson, dict
+        ) or not isinstance(
+            geojson.get("features"), list
+        ):
+            raise LayerFeaturesNotAvailable(
+                status_code=422,
+                detail=f"Layer with id {self._layer_id} is not a geojson feature collection",
+            )
+
+        spatial_index, _ = write_spatial_index(
+            minio_client=self._minio_client,
+            index_object_name=index_object_name,
+            features=geojson["features"],
+        )
+        return spatial_index
+
+    async def _get_spatial_index(
+        self, index_object_name: str
+    ) -> SpatialIndex:
+        """
+        Spatial index is built on the first request of the layer features and
+        stored next to the layer object, later requests read only its tree
+        """
+        spatial_index = (
+            self._spatial_index_cache.get(
+                index_object_name
+            )
+        )
+        if spatial_index:
+            return spatial_index
+
+        spatial_index = await self._async_minio_client.run_in_executor(
+            self._load_spatial_index,
+            index_object_name=index_object_name,
+        )
+        if not spatial_index:
+            content_source = await GetLayerContent(
+                layer_id=self._layer_id,
+                session=self._session,
+                layer_instance=self._layer_instance,
+                object_etag=self._object_etag,
+            ).get_content_source()
+            if not content_source:
+                raise LayerFeaturesNotAvailable(
+                    status_code=422,
+                    detail=f"Layer with id {self._layer_id} has no stored file",
+                )
+
+            content, get_chunks = content_source
+            if (
+                content.content_type
+                != GEO_FILE_CONTENT_TYPES[
+                    "geojson"
+                ]
+            ):
+                raise LayerFeaturesNotAvailable(
+                    status_code=422,
+                    detail=f"Layer with id {self._layer_id} is not a geojson layer",
+                )
+
+            spatial_index = await self._async_minio_client.run_in_executor(
+                self._build_spatial_index,
+                index_object_name=index_object_name,
+                get_chunks=get_chunks,
+                timeout=MINIO_UPLOAD_TIMEOUT,
+            )
+
+        self._spatial_index_cache.put(
+            object_name=index_object_name,
+            index=spatial_index,
+        )
+        return spatial_index
+
+    def _get_object_name(self) -> str:
+        object_name = get_layer_object_name(
+            self._layer_instance
+        )
+        if not object_name:
+            raise LayerFeaturesNotAvailable(
+                status_code=422,
+                detail=f"Layer with id {self._layer_id} has no stored file",
+            )
+        return object_name
+
+    async def _get_layer_spatial_index(
+        self, object_name: str
+    ) -> tuple[str, SpatialIndex]:
+        """
+        Name of the spatial index object and its tree. Layers are linked to the
+        index converted from their object on ingest, index of geojson layers which
+        are not ingested yet is built from the object on the first request
+        """
+        index_object_name = (
+            self._layer_instance.features_object_name
+            or f"{object_name}{SPATIAL_INDEX_OBJECT_SUFFIX}"
+        )
+        spatial_index = await layer_content_single_flight.run(
+            key=(
+                "spatial_index",
+                index_object_name,
+            ),
+            func=lambda: self._get_spatial_index(
+                index_object_name=index_object_name
+            ),
+        )
+        return index_object_name, spatial_index
+
+    def _read_features(
+        self,
+        index_object_name: str,
+        spatial_index: SpatialIndex,
+    ) -> Iterator[bytes]:
+        """
+        Yields serialized features inside the bounds. Only byte ranges
+        of the matching features are read
+        """
+        for (
+            start,
+            end,
+            range_positions,
+        ) in spatial_index.get_feature_ranges(
+            positions=spatial_index.search(
+                *self._bounds
+            ),
+            max_gap=SPATIAL_INDEX_MAX_RANGE_GAP,
+        ):
+            data = self._read_object_range(
+                object_name=index_object_name,
+                offset=start,
+                length=end - start,
+            )
+            for position in range_positions:
+                yield spatial_index.get_feature(
+                    data=data,
+                    data_offset=start,
+                    position=position,
+                )
+
+
+class GetLayerFeatures(GetIndexedLayerFeatures):
+    def __init__(
+        self,
+        layer_id: int,
+        bbox: str,
+        session: Session,
+    ):
+        super().__init__(
+            layer_id=layer_id, session=session
+        )
+        self._bbox = bbox
+
+    def _check_bbox(self):
+        try:
+            bounds = tuple(
+                float(value)
+                for value in self._bbox.split(",")
+            )
+        except ValueError:
+            bounds = ()
+
+        if (
+            len(bounds) != 4
+            or not all(map(math.isfinite, bounds))
+            or bounds[0] > bounds[2]
+            or bounds[1] > bounds[3]
+        ):
+            raise BboxNotValid(
+                status_code=422,
+                detail="bbox has to be min_x,min_y,max_x,max_y",
+            )
+        self._bounds = bounds
+
+    async def check(self):
+        self._check_bbox()
+        await super().check()
+
+    def _get_features_chunks(
+        self,
+        index_object_name: str,
+        spatial_index: SpatialIndex,
+    ) -> Iterator[bytes]:
+        yield b'{"type":"FeatureCollection","features":['
+        separator = b""
+        for feature in self._read_features(
+            index_object_name=index_object_name,
+            spatial_index=spatial_index,
+        ):
+            yield separator
+            yield feature
+            separator = b","
+        yield b"]}"
+
+    async def execute(self) -> StreamingResponse:
+        """
+        Only the tree of the spatial index and byte ranges of the matching features
+        are read, so response time depends on the number of matching features
+        """
+        (
+            index_object_name,
+            spatial_index,
+        ) = await self._get_layer_spatial_index(
+            object_name=self._get_object_name()
+        )
+        return StreamingResponse(
+            content=self._get_features_chunks(
+                index_object_name=index_object_name,
+                spatial_index=spatial_index,
+            ),
+            media_type=GEO_FILE_CONTENT_TYPES[
+                "geojson"
+            ],
+        )
+
+
+class GetLayerTile(GetIndexedLayerFeatures):
+    def __init__(
+        self,
+        layer_id: int,
+        z: int,
+        x: int,
+        y: int,
+        session: Session,
+    ):
+        super().__init__(
+            layer_id=layer_id, session=session
+        )
+        self._z = z
+        self._x = x
+        self._y = y
+        self._tile_cache = get_vector_tile_cache()
+        self._tiles_max_zoom: int | None = None
+
+    def _check_tile(self):
+        if not (
+            0 <= self._z <= VECTOR_TILE_MAX_ZOOM
+            and 0 <= self._x < 2**self._z
+            and 0 <= self._y < 2**self._z
+        ):
+            raise TileNotValid(
+                status_code=422,
+                detail=f"Tile {self._z}/{self._x}/{self._y} does not exist",
+            )
+        self._bounds = get_tile_bounds(
+            z=self._z,
+            x=self._x,
+            y=self._y,
+            buffer=VECTOR_TILE_BUFFER
+            / VECTOR_TILE_EXTENT,
+        )
+
+    async def _load_layer(self):
+        (
+            self._layer_instance,
+            layer_blob,
+        ) = await layer_content_single_flight.run(
+            key=("layer_blob", self._layer_id),
+            func=lambda: run_in_threadpool(
+                get_shared_layer_with_blob,
+                layer_id=self._layer_id,
+            ),
+        )
+        if layer_blob:
+            self._object_etag = layer_blob.etag
+            self._tiles_max_zoom = (
+                layer_blob.tiles_max_zoom
+            )
+
+    async def check(self):
+        self._check_tile()
+        await super().check()
+
+    async def _get_object_etag(
+        self, object_name: str
+    ) -> str:
+        if self._object_etag:
+            return self._object_etag
+
+        object_stat = await layer_content_single_flight.run(
+            key=("stat", object_name),
+            func=lambda: self._async_minio_client.stat_file(
+                filename=object_name
+            ),
+        )
+        if not object_stat:
+            raise LayerFeaturesNotAvailable(
+                status_code=422,
+                detail=f"Layer with id {self._layer_id} has no stored file",
+            )
+        return object_stat.etag
+
+    def _encode_tile(
+        self,
+        index_object_name: str,
+        spatial_index: SpatialIndex,
+    ) -> bytes:
+        encoder = VectorTileEncoder(
+            z=self._z,
+            x=self._x,
+            y=self._y,
+            extent=VECTOR_TILE_EXTENT,
+            buffer=VECTOR_TILE_BUFFER,
+            tolerance=VECTOR_TILE_SIMPLIFY_TOLERANCE,
+        )
+        return encoder.encode(
+            layer_name=VECTOR_TILE_LAYER_NAME,
+            features=map(
+                json.loads,
+                self._read_features(
+                    index_object_name=index_object_name,
+                    spatial_index=spatial_index,
+                ),
+            ),
+        )
+
+    def _read_pyramid_tile(
+        self, object_name: str
+    ) -> bytes:
+        pyramid_object_name = f"{object_name}{TILE_PYRAMID_OBJECT_SUFFIX}"
+        reader = get_pmtiles_reader(
+            object_name=pyramid_object_name,
+            read_range=functools.partial(
+                self._read_object_range,
+                pyramid_object_name,
+            ),
+        )
+        return (
+            reader.get_tile(
+                self._z, self._x, self._y
+            )
+            or b""
+        )
+
+    async def _get_tile(self) -> bytes:
+        """
+        Tiles up to the max zoom of the pyramid rendered on ingest are one
+        ranged read of its archive, deeper tiles are encoded on the fly
+        """
+        object_name = self._get_object_name()
+        if (
+            self._tiles_max_zoom is not None
+            and self._z <= self._tiles_max_zoom
+        ):
+            return await self._async_minio_client.run_in_executor(
+                self._read_pyramid_tile,
+                object_name=object_name,
+            )
+
+        (
+            index_object_name,
+            spatial_index,
+        ) = await self._get_layer_spatial_index(
+            object_name=object_name
+        )
+        return await self._async_minio_client.run_in_executor(
+            self._encode_tile,
+            index_object_name=index_object_name,
+            spatial_index=spatial_index,
+        )
+
+    async def execute(self) -> Response:
+        """
+        Tile is read from the pyramid of the layer object or encoded from the features
+        read through the spatial index. Tiles are cached by etag of the layer object,
+        concurrent requests of the tile get it once
+        """
+        object_name = self._get_object_name()
+        cache_key = (
+            object_name,
+            await self._get_object_etag(
+                object_name=object_name
+            ),
+            self._z,
+            self._x,
+            self._y,
+        )
+        tile = self._tile_cache.get(cache_key)
+        if tile is None:
+            tile = await layer_content_single_flight.run(
+                key=("tile", *cache_key),
+                func=self._get_tile,
+            )
+            self._tile_cache.put(
+                key=cache_key, tile=tile
+            )
+
+        return Response(
+            content=tile,
+            media_type=VECTOR_TILE_CONTENT_TYPE,
+        )
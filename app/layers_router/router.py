@@ -7,11 +7,24 @@ from fastapi import (
     File,
     HTTPException,
     Form,
+    Header,
+    Query,
+    Response,
 )
 from pydantic import ValidationError
 from sqlmodel import Session
-from starlette.responses import PlainTextResponse
+from starlette.responses import (
+    PlainTextResponse,
+    StreamingResponse,
+)
 
+from common.http_cache import is_etag_matched
+from content_cache.disk_cache import (
+    get_disk_content_cache,
+)
+from content_cache.memory_cache import (
+    get_memory_content_cache,
+)
 from database import get_session
 from layers_router.exceptions import (
     LayerException,
@@ -23,6 +36,12 @@ from layers_router.processors import (
     GetLayers,
     GetLayersByFolderId,
     GetLayerContent,
+    GetLayersContent,
+    GetLayerFeatures,
+    GetLayerTile,
+    CreateLayerUploadUrl,
+    CompleteLayerUpload,
+    ImportLayers,
 )
 from layers_router.schemas import (
     LayerUpdateRequest,
@@ -30,6 +49,14 @@ from layers_router.schemas import (
     LayerCreateResponse,
     LayerUpdateResponse,
     CreateLayerRequest,
+    LayerUploadUrlRequest,
+    LayerUploadUrlResponse,
+    LayerUploadCompleteRequest,
+    LayerImportResponse,
+    LayerContentRequest,
+    LayerContentDelivery,
+    LayersContentFormat,
+    LayerContentCachesStats,
 )
 
 router = APIRouter()
@@ -41,8 +68,12 @@ router = APIRouter()
     response_model=List[LayerResponse],
 )
 def get_layers(
+    response: Response,
     limit: int = None,
     offset: int = None,
+    if_none_match: str | None = Header(
+        default=None
+    ),
     session: Session = Depends(get_session),
 ):
     task = GetLayers(
@@ -50,6 +81,14 @@ def get_layers(
         offset=offset,
         session=session,
     )
+    etag = task.get_etag()
+    if is_etag_matched(if_none_match, etag):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag},
+        )
+
+    response.headers["ETag"] = etag
     layers = task.execute()
     return layers
 
@@ -60,9 +99,13 @@ def get_layers(
     response_model=List[LayerResponse],
 )
 def get_layers_by_folder_id(
+    response: Response,
     folder_id: int = None,
     limit: int = None,
     offset: int = None,
+    if_none_match: str | None = Header(
+        default=None
+    ),
     session: Session = Depends(get_session),
 ):
     task = GetLayersByFolderId(
@@ -73,6 +116,14 @@ def get_layers_by_folder_id(
     )
     try:
         task.check()
+        etag = task.get_etag()
+        if is_etag_matched(if_none_match, etag):
+            return Response(
+                status_code=304,
+                headers={"ETag": etag},
+            )
+
+        response.headers["ETag"] = etag
         layers = task.execute()
         return layers
 
@@ -93,15 +144,21 @@ async def create_layer(
     server_link: str = Form(default=None),
     folder_id: int = Form(default=None),
     file: UploadFile | None = File(default=None),
+    compress: bool = Form(default=False),
     session: Session = Depends(get_session),
 ):
+    """
+    If compress is set, text geo files (geojson, kml, gpx, osm, xyz) are stored gzip compressed
+    """
     try:
         task = CreateLayer(
             session=session,
             layer_name=layer_name,
             folder_id=folder_id,
             file_source=CreateLayerRequest(
-                file=file, server_link=server_link
+                file=file,
+                server_link=server_link,
+                compress=compress,
             ),
         )
         task.check()
@@ -120,6 +177,92 @@ async def create_layer(
         )
 
 
+@router.post(
+    path="/layers/create_layer_upload_url",
+    tags=["Layers"],
+    response_model=LayerUploadUrlResponse,
+)
+async def create_layer_upload_url(
+    upload_url_request: LayerUploadUrlRequest,
+    session: Session = Depends(get_session),
+):
+    """
+    Returns presigned url(s) for uploading layer file directly to the storage.
+    After the upload layer is created by /layers/complete_layer_upload
+    """
+    try:
+        task = CreateLayerUploadUrl(
+            request=upload_url_request,
+            session=session,
+        )
+        task.check()
+        upload_url = await task.execute()
+        return upload_url
+
+    except LayerException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
+
+
+@router.post(
+    path="/layers/complete_layer_upload",
+    tags=["Layers"],
+    response_model=LayerCreateResponse,
+)
+async def complete_layer_upload(
+    upload_complete_request: LayerUploadCompleteRequest,
+    session: Session = Depends(get_session),
+):
+    try:
+        task = CompleteLayerUpload(
+            request=upload_complete_request,
+            session=session,
+        )
+        task.check()
+        new_layer = await task.execute()
+        return new_layer
+
+    except LayerException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
+
+
+@router.post(
+    path="/layers/import_layers",
+    tags=["Layers"],
+    response_model=LayerImportResponse,
+)
+async def import_layers(
+    file: UploadFile = File(),
+    folder_id: int = Form(default=None),
+    compress: bool = Form(default=False),
+    session: Session = Depends(get_session),
+):
+    """
+    Imports all geo files of a zip or tar archive, archive directories are created
+    as folders under folder_id. Members which can't be imported are returned in failures
+    """
+    try:
+        task = ImportLayers(
+            folder_id=folder_id,
+            file=file,
+            compress=compress,
+            session=session,
+        )
+        task.check()
+        return await task.execute()
+
+    except LayerException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
+
+
 @router.patch(
     path="/layers/update_layer/{layer_id}",
     tags=["Layers"],
@@ -180,15 +323,54 @@ async def delete_layer(
 )
 async def get_layer_content(
     layer_id: int,
+    delivery: LayerContentDelivery = LayerContentDelivery.proxy,
+    accept_encoding: str | None = Header(
+        default=None
+    ),
+    range_header: str | None = Header(
+        default=None, alias="Range"
+    ),
+    if_range: str | None = Header(default=None),
+    if_none_match: str | None = Header(
+        default=None
+    ),
+    if_modified_since: str | None = Header(
+        default=None
+    ),
+    zoom: int | None = None,
+    tolerance: float | None = None,
     session: Session = Depends(get_session),
 ):
+    """
+    Stored files support Range requests (single and multiple ranges), If-Range
+    is checked against ETag or Last-Modified of the file.
+    If-None-Match and If-Modified-Since are answered with 304 Not Modified.
+    With delivery=redirect client is redirected (307) to a short-lived presigned url
+    of the file, so content is downloaded from the storage directly.
+    With delivery=fetch server link content is fetched and cached according to its
+    Cache-Control, responses which can't be cached are redirected (307) to the link.
+    With zoom or tolerance (in degrees) geojson layers are served with geometries
+    simplified on ingest for the zoom level, full content is served until the layer
+    is ingested
+    """
     task = GetLayerContent(
         session=session, layer_id=layer_id
     )
 
     try:
-        task.check()
-        file_content = task.execute()
+        await task.check()
+        file_content = await task.execute(
+            request=LayerContentRequest(
+                delivery=delivery,
+                accept_encoding=accept_encoding,
+                range=range_header,
+                if_range=if_range,
+                if_none_match=if_none_match,
+                if_modified_since=if_modified_since,
+                zoom=zoom,
+                tolerance=tolerance,
+            )
+        )
         return file_content
 
     except LayerException as e:
@@ -196,3 +378,125 @@ async def get_layer_content(
             status_code=e.status_code,
             detail=e.detail,
         )
+
+
+@router.get(
+    path="/layers/get_layers_content",
+    tags=["Layers"],
+    response_class=StreamingResponse,
+)
+async def get_layers_content(
+    layer_ids: List[int] = Query(),
+    content_format: LayersContentFormat = Query(
+        default=LayersContentFormat.multipart,
+        alias="format",
+    ),
+    session: Session = Depends(get_session),
+):
+    """
+    Contents of several layers in one response, in the order of layer_ids.
+    Compressed contents are decoded, server link layers are sent as their links.
+
+    - multipart: multipart/mixed, every part has Content-Type and Content-ID <layer-{id}>
+    - frames: sequence of frames, every frame is layer id (uint32), payload length
+      (uint32, both big-endian) and payload. Content of a layer is one or more
+      frames followed by a frame with empty payload
+    """
+    task = GetLayersContent(
+        layer_ids=layer_ids, session=session
+    )
+
+    try:
+        task.check()
+        return await task.execute(
+            content_format=content_format
+        )
+
+    except LayerException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
+
+
+@router.get(
+    path="/layers/{layer_id}/features",
+    tags=["Layers"],
+    response_class=StreamingResponse,
+)
+async def get_layer_features(
+    layer_id: int,
+    bbox: str,
+    session: Session = Depends(get_session),
+):
+    """
+    GeoJSON FeatureCollection of the features of a geojson layer which bounding boxes
+    intersect bbox (min_x,min_y,max_x,max_y). Spatial index of the layer is built
+    on the first request
+    """
+    task = GetLayerFeatures(
+        layer_id=layer_id,
+        bbox=bbox,
+        session=session,
+    )
+
+    try:
+        await task.check()
+        return await task.execute()
+
+    except LayerException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
+
+
+@router.get(
+    path="/layers/{layer_id}/tiles/{z}/{x}/{y}.mvt",
+    tags=["Layers"],
+    response_class=Response,
+)
+async def get_layer_tile(
+    layer_id: int,
+    z: int,
+    x: int,
+    y: int,
+    session: Session = Depends(get_session),
+):
+    """
+    Mapbox Vector Tile of a geojson layer, tile has one layer named features.
+    Features are clipped by the tile with a buffer and simplified to the tile resolution
+    """
+    task = GetLayerTile(
+        layer_id=layer_id,
+        z=z,
+        x=x,
+        y=y,
+        session=session,
+    )
+
+    try:
+        await task.check()
+        return await task.execute()
+
+    except LayerException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
+
+
+@router.get(
+    path="/layers/get_content_cache_stats",
+    tags=["Layers"],
+    response_model=LayerContentCachesStats,
+)
+def get_content_cache_stats():
+    """
+    Counters of the layer content memory and disk caches of the worker process
+    which handled the request
+    """
+    return {
+        "memory": get_memory_content_cache().get_stats(),
+        "disk": get_disk_content_cache().get_stats(),
+    }
@@ -1,4 +1,6 @@
 from datetime import datetime
+from enum import Enum
+from typing import List
 
 from fastapi import UploadFile
 from pydantic import BaseModel, HttpUrl
@@ -38,6 +40,44 @@ class LayerResponse(BaseModel):
     creation_date: datetime
 
 
+class LayerContentDelivery(str, Enum):
+    proxy = "proxy"
+    redirect = "redirect"
+    fetch = "fetch"
+
+
+class LayersContentFormat(str, Enum):
+    multipart = "multipart"
+    frames = "frames"
+
+
+class LayerContentRequest(BaseModel):
+    delivery: LayerContentDelivery = (
+        LayerContentDelivery.proxy
+    )
+    accept_encoding: str | None = None
+    range: str | None = None
+    if_range: str | None = None
+    if_none_match: str | None = None
+    if_modified_since: str | None = None
+    zoom: int | None = None
+    tolerance: float | None = None
+
+
+class LayerContentCacheStats(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    items: int
+    size: int
+    max_size: int
+
+
+class LayerContentCachesStats(BaseModel):
+    memory: LayerContentCacheStats
+    disk: LayerContentCacheStats
+
+
 class LinkModel(BaseModel):
     server_link: HttpUrl | None = None
 
@@ -45,3 +85,44 @@ class LinkModel(BaseModel):
 class CreateLayerRequest(BaseModel):
     server_link: HttpUrl | None = None
     file: UploadFile | None = None
+    compress: bool = False
+
+
+class LayerUploadUrlRequest(BaseModel):
+    layer_name: str
+    folder_id: int | None
+    filename: str
+    parts_count: int | None
+
+
+class LayerUploadUrlResponse(BaseModel):
+    object_name: str
+    upload_url: str | None
+    upload_id: str | None
+    part_upload_urls: List[str]
+    expires_in: int
+
+
+class LayerUploadCompleteRequest(BaseModel):
+    layer_name: str
+    folder_id: int | None
+    filename: str
+    object_name: str
+    upload_id: str | None
+
+
+class LayerImportFolder(BaseModel):
+    id: int
+    name: str
+    parent_id: int | None
+
+
+class LayerImportFailure(BaseModel):
+    member: str
+    detail: str
+
+
+class LayerImportResponse(BaseModel):
+    folders: List[LayerImportFolder]
+    layers: List[LayerCreateResponse]
+    failures: List[LayerImportFailure]
@@ -0,0 +1,530 @@
+import json
+import math
+import struct
+import sys
+import threading
+from array import array
+from dataclasses import dataclass
+from tempfile import SpooledTemporaryFile
+from typing import Callable, Iterator
+
+from cachetools import LRUCache
+
+from config.spatial_index_config import (
+    SPATIAL_INDEX_CACHE_SIZE,
+    SPATIAL_INDEX_NODE_SIZE,
+)
+from layers_router.constants import (
+    SPOOLED_FILE_MAX_SIZE,
+)
+from services.storage_service.utils import (
+    MinioInitializer,
+)
+
+SPATIAL_INDEX_MAGIC = b"LRTREE01"
+# magic, items count, nodes count, levels count, node size
+SPATIAL_INDEX_HEADER = struct.Struct("<8sIIIH2x")
+
+
+def _to_little_endian(values: array) -> bytes:
+    if sys.byteorder == "little":
+        return values.tobytes()
+    values = array(values.typecode, values)
+    values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(
+    typecode: str, data: bytes
+) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def get_geometry_bbox(
+    geometry: dict | None,
+) -> tuple[float, float, float, float] | None:
+    """
+    Bounding box (min_x, min_y, max_x, max_y) of geojson geometry,
+    None for null and empty geometries
+    """
+    if not isinstance(geometry, dict):
+        return None
+
+    if (
+        geometry.get("type")
+        == "GeometryCollection"
+    ):
+        boxes = [
+            bbox
+            for bbox in map(
+                get_geometry_bbox,
+                geometry.get("geometries") or [],
+            )
+            if bbox
+        ]
+        if not boxes:
+            return None
+        return (
+            min(bbox[0] for bbox in boxes),
+            min(bbox[1] for bbox in boxes),
+            max(bbox[2] for bbox in boxes),
+            max(bbox[3] for bbox in boxes),
+        )
+
+    min_x = min_y = math.inf
+    max_x = max_y = -math.inf
+    stack = [geometry.get("coordinates")]
+    while stack:
+        coordinates = stack.pop()
+        if (
+            not isinstance(coordinates, list)
+            or not coordinates
+        ):
+            continue
+        if isinstance(
+            coordinates[0], (int, float)
+        ):
+            if len(coordinates) < 2:
+                continue
+            x, y = coordinates[0], coordinates[1]
+            min_x = min(min_x, x)
+            min_y = min(min_y, y)
+            max_x = max(max_x, x)
+            max_y = max(max_y, y)
+        else:
+            stack.extend(coordinates)
+
+    if min_x > max_x:
+        return None
+    return min_x, min_y, max_x, max_y
+
+
+def _sort_tile_recursive(
+    boxes: list[
+        tuple[float, float, float, float]
+    ],
+    node_size: int,
+) -> list[int]:
+    """
+    Orders boxes by Sort-Tile-Recursive: boxes are sorted by x into vertical
+    slices of whole nodes, every slice is sorted by y
+    """
+    if not boxes:
+        return []
+
+    leaves_count = math.ceil(
+        len(boxes) / node_size
+    )
+    slice_size = (
+        math.ceil(math.sqrt(leaves_count))
+        * node_size
+    )
+    by_x = sorted(
+        range(len(boxes)),
+        key=lambda i: boxes[i][0] + boxes[i][2],
+    )
+    order = []
+    for start in range(0, len(by_x), slice_size):
+        order.extend(
+            sorted(
+                by_x[start : start + slice_size],
+                key=lambda i: boxes[i][1]
+                + boxes[i][3],
+            )
+        )
+    return order
+
+
+@dataclass
+class SpatialIndex:
+    """
+    Packed R-tree over feature bounding boxes. Nodes of all levels are stored
+    in flat arrays, leaves first, root last. Leaf index is the position of the feature
+    in the feature data, index of other nodes is the position of their first child.
+    Feature data follows the tree in the stored object, features are written in
+    the order of leaves, so features close to each other are read by one range
+    """
+
+    node_size: int
+    level_bounds: array
+    boxes: array
+    indices: array
+    feature_offsets: array
+
+    @property
+    def items_count(self) -> int:
+        return len(self.feature_offsets) - 1
+
+    @property
+    def features_offset(self) -> int:
+        """
+        Position of the feature data in the stored object
+        """
+        return (
+            SPATIAL_INDEX_HEADER.size
+            + len(self.level_bounds) * 4
+            + len(self.boxes) * 8
+            + len(self.indices) * 4
+            + len(self.feature_offsets) * 8
+        )
+
+    @property
+    def size(self) -> int:
+        return self.features_offset
+
+    @classmethod
+    def build(
+        cls, features: list, node_size: int
+    ) -> tuple["SpatialIndex", list[bytes]]:
+        """
+        Returns index and serialized features in the order of the feature data.
+        Features without geometry can't match any bbox and are not indexed
+        """
+        feature_boxes = []
+        indexed_features = []
+        for feature in features:
+            if not isinstance(feature, dict):
+                continue
+            bbox = get_geometry_bbox(
+                feature.get("geometry")
+            )
+            if bbox:
+                feature_boxes.append(bbox)
+                indexed_features.append(feature)
+
+        order = _sort_tile_recursive(
+            boxes=feature_boxes,
+            node_size=node_size,
+        )
+        boxes = array("d")
+        indices = array("I")
+        features_data = []
+        feature_offsets = array("Q", [0])
+        for position, item in enumerate(order):
+            boxes.extend(feature_boxes[item])
+            indices.append(position)
+            feature_data = json.dumps(
+                indexed_features[item],
+                separators=(",", ":"),
+            ).encode()
+            features_data.append(feature_data)
+            feature_offsets.append(
+                feature_offsets[-1]
+                + len(feature_data)
+            )
+
+        level_bounds = array("I", [len(order)])
+        level_start = 0
+        while level_bounds[-1] - level_start > 1:
+            level_end = level_bounds[-1]
+            for start in range(
+                level_start, level_end, node_size
+            ):
+                end = min(
+                    start + node_size, level_end
+                )
+                node_boxes = boxes[
+                    start * 4 : end * 4
+                ]
+                boxes.extend(
+                    (
+                        min(node_boxes[0::4]),
+                        min(node_boxes[1::4]),
+                        max(node_boxes[2::4]),
+                        max(node_boxes[3::4]),
+                    )
+                )
+                indices.append(start)
+            level_start = level_end
+            level_bounds.append(len(indices))
+
+        index = cls(
+            node_size=node_size,
+            level_bounds=level_bounds,
+            boxes=boxes,
+            indices=indices,
+            feature_offsets=feature_offsets,
+        )
+        return index, features_data
+
+    def to_bytes(self) -> bytes:
+        """
+        Header and tree of the stored object, feature data is written after them
+        """
+        return b"".join(
+            (
+                SPATIAL_INDEX_HEADER.pack(
+                    SPATIAL_INDEX_MAGIC,
+                    self.items_count,
+                    len(self.indices),
+                    len(self.level_bounds),
+                    self.node_size,
+                ),
+                _to_little_endian(
+                    self.level_bounds
+                ),
+                _to_little_endian(self.boxes),
+                _to_little_endian(self.indices),
+                _to_little_endian(
+                    self.feature_offsets
+                ),
+            )
+        )
+
+    @classmethod
+    def from_stored(
+        cls,
+        read_range: Callable[[int, int], bytes],
+    ) -> "SpatialIndex":
+        """
+        Reads header and tree of the stored object, feature data is not read
+        """
+        (
+            magic,
+            items_count,
+            nodes_count,
+            levels_count,
+            node_size,
+        ) = SPATIAL_INDEX_HEADER.unpack(
+            read_range(
+                0, SPATIAL_INDEX_HEADER.size
+            )
+        )
+        if magic != SPATIAL_INDEX_MAGIC:
+            raise ValueError(
+                "Spatial index object is not valid"
+            )
+
+        sizes = (
+            levels_count * 4,
+            nodes_count * 4 * 8,
+            nodes_count * 4,
+            (items_count + 1) * 8,
+        )
+        data = read_range(
+            SPATIAL_INDEX_HEADER.size, sum(sizes)
+        )
+        sections = []
+        offset = 0
+        for size in sizes:
+            sections.append(
+                data[offset : offset + size]
+            )
+            offset += size
+
+        return cls(
+            node_size=node_size,
+            level_bounds=_from_little_endian(
+                "I", sections[0]
+            ),
+            boxes=_from_little_endian(
+                "d", sections[1]
+            ),
+            indices=_from_little_endian(
+                "I", sections[2]
+            ),
+            feature_offsets=_from_little_endian(
+                "Q", sections[3]
+            ),
+        )
+
+    def search(
+        self,
+        min_x: float,
+        min_y: float,
+        max_x: float,
+        max_y: float,
+    ) -> list[int]:
+        """
+        Sorted positions of features which bounding boxes intersect the bbox
+        """
+        if not self.indices:
+            return []
+
+        positions = []
+        boxes = self.boxes
+        stack = [
+            (
+                len(self.indices) - 1,
+                len(self.level_bounds) - 1,
+            )
+        ]
+        while stack:
+            node, level = stack.pop()
+            if (
+                boxes[node * 4] > max_x
+                or boxes[node * 4 + 1] > max_y
+                or boxes[node * 4 + 2] < min_x
+                or boxes[node * 4 + 3] < min_y
+            ):
+                continue
+            if level == 0:
+                positions.append(
+                    self.indices[node]
+                )
+                continue
+
+            start = self.indices[node]
+            end = min(
+                start + self.node_size,
+                self.level_bounds[level - 1],
+            )
+            stack.extend(
+                (child, level - 1)
+                for child in range(start, end)
+            )
+
+        positions.sort()
+        return positions
+
+    def get_feature_ranges(
+        self, positions: list[int], max_gap: int
+    ) -> Iterator[tuple[int, int, list[int]]]:
+        """
+        Yields byte ranges (start, end) of the stored object and feature positions
+        in them. Features separated by less than max_gap bytes are read by one range
+        """
+        range_positions: list[int] = []
+        for position in positions:
+            if range_positions and (
+                self.feature_offsets[position]
+                - self.feature_offsets[
+                    range_positions[-1] + 1
+                ]
+                > max_gap
+            ):
+                yield self._get_feature_range(
+                    range_positions
+                )
+                range_positions = []
+            range_positions.append(position)
+
+        if range_positions:
+            yield self._get_feature_range(
+                range_positions
+            )
+
+    def _get_feature_range(
+        self, positions: list[int]
+    ) -> tuple[int, int, list[int]]:
+        return (
+            self.features_offset
+            + self.feature_offsets[positions[0]],
+            self.features_offset
+            + self.feature_offsets[
+                positions[-1] + 1
+            ],
+            positions,
+        )
+
+    def get_feature(
+        self,
+        data: bytes,
+        data_offset: int,
+        position: int,
+    ) -> bytes:
+        """
+        Serialized feature from data of the range which starts at data_offset
+        """
+        start = (
+            self.features_offset
+            + self.feature_offsets[position]
+            - data_offset
+        )
+        end = (
+            self.features_offset
+            + self.feature_offsets[position + 1]
+            - data_offset
+        )
+        return data[start:end]
+
+
+class SpatialIndexCache:
+    """
+    LRU of loaded spatial index trees bounded by their size in bytes.
+    Stored objects are immutable, so entries are never invalidated
+    """
+
+    def __init__(self, max_size: int):
+        self._cache = LRUCache(
+            maxsize=max_size,
+            getsizeof=lambda index: index.size,
+        )
+        self._lock = threading.Lock()
+
+    def get(
+        self, object_name: str
+    ) -> SpatialIndex | None:
+        with self._lock:
+            return self._cache.get(object_name)
+
+    def put(
+        self,
+        object_name: str,
+        index: SpatialIndex,
+    ) -> None:
+        if index.size > self._cache.maxsize:
+            return
+        with self._lock:
+            self._cache[object_name] = index
+
+
+_shared_spatial_index_cache: (
+    SpatialIndexCache | None
+) = None
+_shared_spatial_index_cache_lock = (
+    threading.Lock()
+)
+
+
+def get_spatial_index_cache() -> (
+    SpatialIndexCache
+):
+    global _shared_spatial_index_cache
+
+    if _shared_spatial_index_cache is None:
+        with _shared_spatial_index_cache_lock:
+            if (
+                _shared_spatial_index_cache
+                is None
+            ):
+                _shared_spatial_index_cache = SpatialIndexCache(
+                    max_size=SPATIAL_INDEX_CACHE_SIZE
+                )
+
+    return _shared_spatial_index_cache
+
+
+def write_spatial_index(
+    minio_client: MinioInitializer,
+    index_object_name: str,
+    features: list,
+) -> tuple[SpatialIndex, list[bytes]]:
+    """
+    Builds spatial index of the features and uploads it as index_object_name.
+    Returns index and serialized features in the order of its leaves
+    """
+    spatial_index, features_data = (
+        SpatialIndex.build(
+            features=features,
+            node_size=SPATIAL_INDEX_NODE_SIZE,
+        )
+    )
+    with SpooledTemporaryFile(
+        max_size=SPOOLED_FILE_MAX_SIZE
+    ) as index_file:
+        index_file.write(spatial_index.to_bytes())
+        for feature_data in features_data:
+            index_file.write(feature_data)
+        index_size = index_file.tell()
+        index_file.seek(0)
+        minio_client.create_file(
+            filename=index_object_name,
+            data_buf=index_file,
+            length=index_size,
+        )
+    return spatial_index, features_data
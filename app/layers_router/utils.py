@@ -1,16 +1,67 @@
 import copy
-from typing import List, Optional
+import gzip
+import hashlib
+import os
+import shutil
+import zlib
+from collections import Counter
+from datetime import datetime
+from tempfile import SpooledTemporaryFile
+from typing import (
+    BinaryIO,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
+from urllib.parse import unquote, urlsplit
+from uuid import uuid4
 
 from fastapi import UploadFile
-from sqlalchemy import select
+from sqlalchemy import (
+    Integer,
+    String,
+    column,
+    delete,
+    func,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import (
+    insert,
+)
 from sqlalchemy.orm import Session
 
+from common.http_cache import (
+    parse_http_date,
+    to_http_date,
+)
+from config.minio_config import (
+    MINIO_BUCKET,
+    MINIO_URL,
+)
+from layers_router.constants import (
+    BLOB_OBJECT_PREFIX,
+    DEFAULT_CONTENT_TYPE,
+    FILE_CHUNK_SIZE,
+    GEO_FILE_CONTENT_TYPES,
+    MAX_BYTE_RANGES,
+    SPOOLED_FILE_MAX_SIZE,
+)
 from layers_router.exceptions import (
     FileOrLinkNotUploaded,
     FileAndLinkUploaded,
 )
 from layers_router.schemas import LinkModel
-from models import Layer
+from models import Layer, LayerBlob
+from layer_ingest.utils import (
+    enqueue_object_ingestions,
+)
+from object_deletion.utils import (
+    cancel_object_deletions,
+    lock_object_names,
+)
 
 
 class LayerDatabaseGetter:
@@ -49,6 +100,166 @@ class LayerDatabaseGetter:
 
         return None
 
+    def _detach(self, *instances) -> None:
+        for instance in instances:
+            if instance is not None:
+                self._session.expunge(instance)
+
+    def get_layer_instance_with_blob_etag(
+        self, layer_id: int
+    ) -> tuple[Layer | None, str | None]:
+        """
+        Layer and etag of its stored object in one query. Layer is detached
+        from the session, so it can be shared by requests with other sessions
+        """
+        query = (
+            select(Layer, LayerBlob.etag)
+            .outerjoin(
+                LayerBlob,
+                LayerBlob.object_name
+                == Layer.object_name,
+            )
+            .where(Layer.id == layer_id)
+        )
+        row = self._session.execute(query).first()
+        if not row:
+            return None, None
+        self._detach(row[0])
+        return row[0], row[1]
+
+    def get_layers_instances_with_blob_etags(
+        self, layer_ids: List[int]
+    ) -> List[tuple[Layer, str | None]]:
+        """
+        Layers and etags of their stored objects with one IN query
+        """
+        query = (
+            select(Layer, LayerBlob.etag)
+            .outerjoin(
+                LayerBlob,
+                LayerBlob.object_name
+                == Layer.object_name,
+            )
+            .where(Layer.id.in_(layer_ids))
+        )
+        return [
+            (layer, etag)
+            for layer, etag in self._session.execute(
+                query
+            ).all()
+        ]
+
+    def get_layer_instance_by_object_name(
+        self, object_name: str
+    ) -> Layer | None:
+        if object_name:
+            query = select(Layer).where(
+                Layer.object_name == object_name
+            )
+            layer_instance = (
+                self._session.execute(query)
+                .scalars()
+                .first()
+            )
+            return layer_instance
+
+        return None
+
+    def get_layer_instance_with_blob(
+        self, layer_id: int
+    ) -> tuple[Layer | None, LayerBlob | None]:
+        """
+        Layer and blob of its stored object in one query. Instances are detached
+        from the session, so they can be shared by requests with other sessions
+        """
+        query = (
+            select(Layer, LayerBlob)
+            .outerjoin(
+                LayerBlob,
+                LayerBlob.object_name
+                == Layer.object_name,
+            )
+            .where(Layer.id == layer_id)
+        )
+        row = self._session.execute(query).first()
+        if not row:
+            return None, None
+        self._detach(row[0], row[1])
+        return row[0], row[1]
+
+    def get_layer_blob_by_object_name(
+        self, object_name: str
+    ) -> LayerBlob | None:
+        if object_name:
+            query = select(LayerBlob).where(
+                LayerBlob.object_name
+                == object_name
+            )
+            return (
+                self._session.execute(query)
+                .scalars()
+                .first()
+            )
+
+        return None
+
+    def get_existing_blob_object_names(
+        self, object_names: Iterable[str]
+    ) -> set[str]:
+        object_names = set(object_names)
+        if not object_names:
+            return set()
+
+        query = select(
+            LayerBlob.object_name
+        ).where(
+            LayerBlob.object_name.in_(
+                object_names
+            )
+        )
+        return set(
+            self._session.execute(query)
+            .scalars()
+            .all()
+        )
+
+    def get_existing_layer_names(
+        self, layer_names: List[str]
+    ) -> set[str]:
+        if not layer_names:
+            return set()
+
+        query = select(Layer.name).where(
+            Layer.name.in_(layer_names)
+        )
+        return set(
+            self._session.execute(query)
+            .scalars()
+            .all()
+        )
+
+    def get_layers_version(
+        self,
+        folder_id: int | None = None,
+        by_folder: bool = False,
+    ) -> tuple:
+        """
+        Count, ids sum and last modification date of layers change
+        whenever a layer is created, updated or deleted
+        """
+        query = select(
+            func.count(Layer.id),
+            func.sum(Layer.id),
+            func.max(Layer.modification_date),
+        )
+        if by_folder:
+            query = query.where(
+                Layer.folder_id == folder_id
+            )
+        return tuple(
+            self._session.execute(query).one()
+        )
+
     def get_layers_instance_by_folder_id(
         self, parent_folder_id: int
     ) -> List[Layer] | None:
@@ -99,3 +310,486 @@ def save_layer_and_return(
     session.commit()
 
     return new_layer
+
+
+def generate_object_name(filename: str) -> str:
+    """
+    Object name for files uploaded directly to minio: random prefix keeps files
+    with the same name from overwriting each other
+    """
+    return f"{uuid4().hex}/{os.path.basename(filename)}"
+
+
+def get_file_extension(filename: str) -> str:
+    return filename.split(".")[-1].lower()
+
+
+def get_file_content_type(filename: str) -> str:
+    return GEO_FILE_CONTENT_TYPES.get(
+        get_file_extension(filename),
+        DEFAULT_CONTENT_TYPE,
+    )
+
+
+def get_response_media_type(
+    content_type: str | None,
+) -> str:
+    """
+    Objects stored without content type are sent as text
+    """
+    if content_type in (
+        None,
+        DEFAULT_CONTENT_TYPE,
+    ):
+        return "text/plain"
+    return content_type
+
+
+def get_layer_object_name(
+    layer: Layer,
+) -> str | None:
+    """
+    Name of the minio object with layer content. Layers uploaded before blobs
+    were introduced are stored by uploaded file name, which is the path of their
+    file link (/<bucket>/<object name>). Layers with server link have no object
+    """
+    if layer.object_name:
+        return layer.object_name
+
+    file_link = urlsplit(layer.file_link)
+    if file_link.netloc != MINIO_URL:
+        return None
+
+    bucket, _, object_name = (
+        unquote(file_link.path)
+        .lstrip("/")
+        .partition("/")
+    )
+    if bucket != MINIO_BUCKET or not object_name:
+        return None
+    return object_name
+
+
+def get_blob_object_name(
+    content_hash: str,
+) -> str:
+    return f"{BLOB_OBJECT_PREFIX}/{content_hash}"
+
+
+def get_file_hash(
+    file: BinaryIO,
+) -> tuple[str, int]:
+    """
+    Returns sha256 hex digest and size of the file
+    """
+    file_hash = hashlib.sha256()
+    file_size = 0
+
+    file.seek(0)
+    while chunk := file.read(FILE_CHUNK_SIZE):
+        file_hash.update(chunk)
+        file_size += len(chunk)
+    file.seek(0)
+
+    return file_hash.hexdigest(), file_size
+
+
+def compress_file(file: BinaryIO) -> BinaryIO:
+    """
+    Returns gzip compressed copy of the file. mtime is fixed, so equal files
+    are compressed to equal bytes and can be deduplicated by content hash
+    """
+    compressed_file = SpooledTemporaryFile(
+        max_size=SPOOLED_FILE_MAX_SIZE
+    )
+    file.seek(0)
+    with gzip.GzipFile(
+        fileobj=compressed_file,
+        mode="wb",
+        mtime=0,
+    ) as gzip_file:
+        shutil.copyfileobj(
+            file, gzip_file, FILE_CHUNK_SIZE
+        )
+    file.seek(0)
+    compressed_file.seek(0)
+    return compressed_file
+
+
+def decompress_chunks(
+    chunks: Iterable[bytes],
+) -> Iterator[bytes]:
+    decompressor = zlib.decompressobj(
+        16 + zlib.MAX_WBITS
+    )
+    for chunk in chunks:
+        decompressed_chunk = (
+            decompressor.decompress(chunk)
+        )
+        if decompressed_chunk:
+            yield decompressed_chunk
+
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def accepts_encoding(
+    accept_encoding: str | None, encoding: str
+) -> bool:
+    """
+    Checks Accept-Encoding request header, e.g. "gzip, deflate;q=0.5", for the encoding
+    """
+    if not accept_encoding:
+        return False
+
+    for accepted in accept_encoding.split(","):
+        name, _, params = (
+            accepted.strip().partition(";")
+        )
+        if name.strip().lower() not in (
+            encoding,
+            "*",
+        ):
+            continue
+
+        quality = params.strip().lower()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+
+    return False
+
+
+def parse_range_header(
+    range_header: str | None, size: int
+) -> List[tuple[int, int]] | None:
+    """
+    Parses Range header, e.g. "bytes=0-99, 200-, -50", into sorted inclusive byte ranges,
+    overlapping and adjacent ranges are merged. Returns None if header is missing
+    or not valid, so content is sent in full, and empty list if no range is satisfiable
+    """
+    if not range_header:
+        return None
+
+    unit, _, ranges_spec = range_header.partition(
+        "="
+    )
+    if unit.strip().lower() != "bytes":
+        return None
+
+    byte_ranges = []
+    range_specs = ranges_spec.split(",")
+    if len(range_specs) > MAX_BYTE_RANGES:
+        return None
+
+    for range_spec in range_specs:
+        first, separator, last = (
+            range_spec.strip().partition("-")
+        )
+        is_range_spec_valid = (
+            separator
+            and (first or last)
+            and (not first or first.isdigit())
+            and (not last or last.isdigit())
+        )
+        if not is_range_spec_valid:
+            return None
+
+        if not first:
+            if int(last) == 0:
+                continue
+            start = max(size - int(last), 0)
+            end = size - 1
+        else:
+            start = int(first)
+            end = (
+                min(int(last), size - 1)
+                if last
+                else size - 1
+            )
+            if last and int(last) < start:
+                return None
+
+        if start >= size:
+            continue
+        byte_ranges.append((start, end))
+
+    merged_byte_ranges = []
+    for start, end in sorted(byte_ranges):
+        if (
+            merged_byte_ranges
+            and start
+            <= merged_byte_ranges[-1][1] + 1
+        ):
+            merged_byte_ranges[-1] = (
+                merged_byte_ranges[-1][0],
+                max(
+                    merged_byte_ranges[-1][1], end
+                ),
+            )
+        else:
+            merged_byte_ranges.append(
+                (start, end)
+            )
+
+    return merged_byte_ranges
+
+
+def is_if_range_matched(
+    if_range: str | None,
+    etag: str,
+    last_modified: datetime | None,
+) -> bool:
+    """
+    If-Range contains strong etag or HTTP date of the representation,
+    ranges are ignored if it was changed
+    """
+    if not if_range:
+        return True
+
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == etag
+    if if_range.startswith("W/"):
+        return False
+
+    if_range_date = parse_http_date(if_range)
+    return (
+        if_range_date is not None
+        and last_modified is not None
+        and if_range_date
+        == parse_http_date(
+            to_http_date(last_modified)
+        )
+    )
+
+
+def add_layer_blob_reference(
+    session: Session,
+    object_name: str,
+    content_hash: str | None = None,
+    size: int | None = None,
+    etag: str | None = None,
+) -> None:
+    """
+    Creates blob for the object or increments its references count,
+    cancels pending deletion of the object and queues it for ingest.
+    Changes are committed together with the layer
+    """
+    add_layer_blob_references(
+        session=session,
+        blobs=[
+            {
+                "object_name": object_name,
+                "content_hash": content_hash,
+                "size": size,
+                "etag": etag,
+            }
+        ],
+    )
+
+
+def add_layer_blob_references(
+    session: Session, blobs: List[dict]
+) -> None:
+    """
+    Same as add_layer_blob_reference for many layers with one multi-row
+    INSERT, blobs are dicts with object_name, content_hash, size and etag keys.
+    Blob references count is incremented by the number of its occurrences,
+    objects are queued for ingest
+    """
+    references_count = Counter(
+        blob["object_name"] for blob in blobs
+    )
+    if not references_count:
+        return
+
+    lock_object_names(
+        session=session,
+        object_names=references_count,
+    )
+    unique_blobs = {
+        blob["object_name"]: blob
+        for blob in blobs
+    }
+    query = insert(LayerBlob).values(
+        [
+            {
+                "object_name": object_name,
+                "content_hash": blob.get(
+                    "content_hash"
+                ),
+                "size": blob.get("size"),
+                "etag": blob.get("etag"),
+                "ref_count": references_count[
+                    object_name
+                ],
+            }
+            for object_name, blob in unique_blobs.items()
+        ]
+    )
+    query = query.on_conflict_do_update(
+        index_elements=[LayerBlob.object_name],
+        set_={
+            "ref_count": LayerBlob.ref_count
+            + query.excluded.ref_count,
+            "etag": func.coalesce(
+                LayerBlob.etag,
+                query.excluded.etag,
+            ),
+        },
+    )
+    session.execute(query)
+    cancel_object_deletions(
+        session=session,
+        object_names=list(references_count),
+    )
+    enqueue_object_ingestions(
+        session=session,
+        object_names=list(references_count),
+    )
+
+
+def remove_layer_blob_references(
+    session: Session, object_names: List[str]
+) -> List[str]:
+    """
+    Decrements references count of the blobs by the number of times each
+    object name occurs with one UPDATE and deletes blobs without references.
+    Returns object names which are not referenced anymore
+    """
+    references_count = Counter(object_names)
+    if not references_count:
+        return []
+
+    released_references = values(
+        column("object_name", String),
+        column("count", Integer),
+        name="released_references",
+    ).data(list(references_count.items()))
+    query = (
+        update(LayerBlob)
+        .where(
+            LayerBlob.object_name
+            == released_references.c.object_name
+        )
+        .values(
+            ref_count=LayerBlob.ref_count
+            - released_references.c.count
+        )
+        .returning(
+            LayerBlob.object_name,
+            LayerBlob.ref_count,
+        )
+        .execution_options(
+            synchronize_session=False
+        )
+    )
+    ref_counts = dict(
+        session.execute(query).all()
+    )
+
+    unreferenced_blobs = [
+        object_name
+        for object_name, ref_count in ref_counts.items()
+        if ref_count <= 0
+    ]
+    if unreferenced_blobs:
+        session.execute(
+            delete(LayerBlob)
+            .where(
+                LayerBlob.object_name.in_(
+                    unreferenced_blobs
+                )
+            )
+            .execution_options(
+                synchronize_session=False
+            )
+        )
+
+    return [
+        object_name
+        for object_name in references_count
+        if ref_counts.get(object_name, 0) <= 0
+    ]
+
+
+def _get_used_legacy_object_names(
+    session: Session,
+    object_names: List[str],
+    released_layer_ids: List[int],
+) -> set[str]:
+    """
+    Names of legacy objects used by other layers. Legacy objects are stored by
+    uploaded file name, so layers with equal file names share one object
+    """
+    if not object_names:
+        return set()
+
+    query = select(Layer).where(
+        Layer.object_name.is_(None),
+        Layer.file_link.like(
+            f"%://{MINIO_URL}/{MINIO_BUCKET}/%"
+        ),
+        Layer.id.notin_(released_layer_ids),
+    )
+    used_object_names = {
+        get_layer_object_name(layer)
+        for layer in session.execute(query)
+        .scalars()
+        .all()
+    }
+    return used_object_names.intersection(
+        object_names
+    )
+
+
+def get_released_object_names(
+    session: Session, layers: Iterable[Layer]
+) -> List[str]:
+    """
+    Releases minio objects of the layers which are being deleted.
+    Returns names of objects which are not used by other layers anymore.
+    Legacy objects are locked, so layers sharing an object and deleted
+    concurrently see each other's deletion
+    """
+    object_names = []
+    legacy_object_names = []
+    released_layer_ids = []
+    for layer in layers:
+        released_layer_ids.append(layer.id)
+        object_name = get_layer_object_name(layer)
+        if layer.object_name:
+            object_names.append(object_name)
+        elif object_name:
+            legacy_object_names.append(
+                object_name
+            )
+
+    legacy_object_names = list(
+        dict.fromkeys(legacy_object_names)
+    )
+    lock_object_names(
+        session=session,
+        object_names=legacy_object_names,
+    )
+    used_legacy_object_names = (
+        _get_used_legacy_object_names(
+            session=session,
+            object_names=legacy_object_names,
+            released_layer_ids=released_layer_ids,
+        )
+    )
+    return remove_layer_blob_references(
+        session=session,
+        object_names=object_names,
+    ) + [
+        object_name
+        for object_name in legacy_object_names
+        if object_name
+        not in used_legacy_object_names
+    ]
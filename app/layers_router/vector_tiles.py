@@ -0,0 +1,527 @@
+import json
+import struct
+import threading
+from typing import Iterable, Iterator
+
+import numpy as np
+from cachetools import LRUCache
+
+from config.vector_tile_config import (
+    VECTOR_TILE_CACHE_SIZE,
+)
+from layers_router.geometry import (
+    clip_line,
+    clip_ring,
+    get_ring_area,
+    lon_lat_to_world,
+    simplify_coordinates,
+)
+
+POINT_GEOMETRY = 1
+LINESTRING_GEOMETRY = 2
+POLYGON_GEOMETRY = 3
+
+MOVE_TO_COMMAND = 1
+LINE_TO_COMMAND = 2
+CLOSE_PATH_COMMAND = 7
+
+GEOMETRY_TYPES = {
+    "Point": POINT_GEOMETRY,
+    "MultiPoint": POINT_GEOMETRY,
+    "LineString": LINESTRING_GEOMETRY,
+    "MultiLineString": LINESTRING_GEOMETRY,
+    "Polygon": POLYGON_GEOMETRY,
+    "MultiPolygon": POLYGON_GEOMETRY,
+}
+
+
+def _encode_varint(value: int) -> bytes:
+    data = bytearray()
+    while value > 0x7F:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def _encode_zigzag(value: int) -> int:
+    return (
+        value << 1
+        if value >= 0
+        else (-value << 1) - 1
+    )
+
+
+def _encode_field(
+    number: int, wire_type: int
+) -> bytes:
+    return _encode_varint(number << 3 | wire_type)
+
+
+def _encode_varint_field(
+    number: int, value: int
+) -> bytes:
+    return _encode_field(number, 0) + (
+        _encode_varint(value)
+    )
+
+
+def _encode_bytes_field(
+    number: int, data: bytes
+) -> bytes:
+    return (
+        _encode_field(number, 2)
+        + _encode_varint(len(data))
+        + data
+    )
+
+
+def _encode_packed_field(
+    number: int, values: Iterable[int]
+) -> bytes:
+    return _encode_bytes_field(
+        number,
+        b"".join(map(_encode_varint, values)),
+    )
+
+
+def _encode_value(value) -> bytes:
+    """
+    Value message of the tile layer, values which are not scalars
+    are encoded as json strings
+    """
+    if isinstance(value, bool):
+        return _encode_varint_field(7, int(value))
+    if (
+        isinstance(value, int)
+        and -(2**63) <= value < 2**63
+    ):
+        return _encode_varint_field(
+            6, _encode_zigzag(value)
+        )
+    if isinstance(value, float):
+        return _encode_field(3, 1) + struct.pack(
+            "<d", value
+        )
+    if not isinstance(value, str):
+        value = json.dumps(value)
+    return _encode_bytes_field(1, value.encode())
+
+
+def _command(command: int, count: int) -> int:
+    return command | count << 3
+
+
+def _encode_geometry(
+    geometry_type: int,
+    parts: list[np.ndarray],
+) -> list[int]:
+    """
+    Geometry commands with zigzag encoded deltas, deltas of all points
+    of a part are computed at once
+    """
+    commands = []
+    cursor = np.zeros((1, 2), dtype=np.int64)
+    for points in parts:
+        deltas = np.diff(
+            points, axis=0, prepend=cursor
+        )
+        cursor = points[-1:]
+        parameters = (
+            (deltas << 1) ^ (deltas >> 63)
+        ).tolist()
+
+        if geometry_type == POINT_GEOMETRY:
+            commands.append(
+                _command(
+                    MOVE_TO_COMMAND, len(points)
+                )
+            )
+            for parameter in parameters:
+                commands.extend(parameter)
+            continue
+
+        commands.append(
+            _command(MOVE_TO_COMMAND, 1)
+        )
+        commands.extend(parameters[0])
+        commands.append(
+            _command(
+                LINE_TO_COMMAND, len(points) - 1
+            )
+        )
+        for parameter in parameters[1:]:
+            commands.extend(parameter)
+        if geometry_type == POLYGON_GEOMETRY:
+            commands.append(
+                _command(CLOSE_PATH_COMMAND, 1)
+            )
+    return commands
+
+
+def _remove_repeated_points(
+    points: np.ndarray,
+) -> np.ndarray:
+    if len(points) < 2:
+        return points
+    changed = np.ones(len(points), dtype=bool)
+    changed[1:] = np.any(
+        points[1:] != points[:-1], axis=1
+    )
+    return points[changed]
+
+
+def _iter_geometries(
+    geometry: dict | None,
+) -> Iterator[tuple[int, list]]:
+    """
+    Yields tile geometry type and coordinates of polygons, lines or points of
+    the geometry, geometry collections are split by geometry type
+    """
+    if not isinstance(geometry, dict):
+        return
+
+    geometry_type = geometry.get("type")
+    if geometry_type == "GeometryCollection":
+        for member in (
+            geometry.get("geometries") or []
+        ):
+            yield from _iter_geometries(member)
+        return
+
+    coordinates = geometry.get("coordinates")
+    if (
+        geometry_type not in GEOMETRY_TYPES
+        or not coordinates
+    ):
+        return
+
+    if geometry_type in (
+        "Point",
+        "LineString",
+        "Polygon",
+    ):
+        coordinates = [coordinates]
+    yield (
+        GEOMETRY_TYPES[geometry_type],
+        coordinates,
+    )
+
+
+class VectorTileEncoder:
+    """
+    Encodes geojson features into one layer of Mapbox Vector Tile.
+    Features are transformed to tile coordinates, clipped by the tile with
+    buffer and simplified with tolerance in tile coordinate units
+    """
+
+    def __init__(
+        self,
+        z: int,
+        x: int,
+        y: int,
+        extent: int,
+        buffer: int,
+        tolerance: float,
+    ):
+        self._tiles_count = 2**z
+        self._offset = np.array([x, y])
+        self._extent = extent
+        self._min_value = -buffer
+        self._max_value = extent + buffer
+        self._tolerance = tolerance
+
+    def _to_tile(
+        self, coordinates: list
+    ) -> np.ndarray:
+        try:
+            points = np.asarray(
+                coordinates, dtype=float
+            )[:, :2]
+        except ValueError:
+            # positions have different dimensions
+            points = np.array(
+                [
+                    position[:2]
+                    for position in coordinates
+                ],
+                dtype=float,
+            )
+        return (
+            lon_lat_to_world(points)
+            * self._tiles_count
+            - self._offset
+        ) * self._extent
+
+    def _get_points(
+        self, points: list
+    ) -> list[np.ndarray]:
+        points = self._to_tile(points)
+        points = points[
+            np.all(
+                (points >= self._min_value)
+                & (points <= self._max_value),
+                axis=1,
+            )
+        ]
+        if not len(points):
+            return []
+        return [np.rint(points).astype(np.int64)]
+
+    def _get_lines(
+        self, lines: list
+    ) -> list[np.ndarray]:
+        parts = []
+        for line in lines:
+            if len(line) < 2:
+                continue
+            for part in clip_line(
+                self._to_tile(line),
+                self._min_value,
+                self._max_value,
+            ):
+                part = _remove_repeated_points(
+                    np.rint(
+                        simplify_coordinates(
+                            part, self._tolerance
+                        )
+                    ).astype(np.int64)
+                )
+                if len(part) >= 2:
+                    parts.append(part)
+        return parts
+
+    def _get_ring(
+        self, ring: list, exterior: bool
+    ) -> np.ndarray | None:
+        points = self._to_tile(ring)
+        if len(points) > 1 and np.array_equal(
+            points[0], points[-1]
+        ):
+            points = points[:-1]
+        points = clip_ring(
+            points,
+            self._min_value,
+            self._max_value,
+        )
+        if len(points) < 3:
+            return None
+
+        points = simplify_coordinates(
+            np.vstack((points, points[:1])),
+            self._tolerance,
+        )
+        points = _remove_repeated_points(
+            np.rint(points).astype(np.int64)
+        )[:-1]
+        if len(points) < 3:
+            return None
+
+        area = get_ring_area(points)
+        if not area:
+            return None
+        # exterior rings have positive area in tile coordinates (y axis points down)
+        if (area > 0) != exterior:
+            points = points[::-1]
+        return points
+
+    def _get_polygons(
+        self, polygons: list
+    ) -> list[np.ndarray]:
+        parts = []
+        for polygon in polygons:
+            rings = []
+            for index, ring in enumerate(polygon):
+                if len(ring) < 3:
+                    continue
+                ring = self._get_ring(
+                    ring, exterior=index == 0
+                )
+                if ring is None:
+                    if index == 0:
+                        break
+                    continue
+                rings.append(ring)
+            parts.extend(rings)
+        return parts
+
+    def _get_parts(
+        self,
+        geometry_type: int,
+        coordinates: list,
+    ) -> list[np.ndarray]:
+        if geometry_type == POINT_GEOMETRY:
+            return self._get_points(coordinates)
+        if geometry_type == LINESTRING_GEOMETRY:
+            return self._get_lines(coordinates)
+        return self._get_polygons(coordinates)
+
+    def encode(
+        self,
+        layer_name: str,
+        features: Iterable[dict],
+    ) -> bytes:
+        """
+        Returns tile with one layer, empty tile if no feature is in the tile
+        """
+        keys: dict[str, int] = {}
+        values: dict[tuple[str, str], int] = {}
+        encoded_values = []
+        encoded_features = []
+
+        for feature in features:
+            tags = []
+            for key, value in (
+                feature.get("properties") or {}
+            ).items():
+                if value is None:
+                    continue
+                value_key = (
+                    type(value).__name__,
+                    json.dumps(value),
+                )
+                if value_key not in values:
+                    values[value_key] = len(
+                        encoded_values
+                    )
+                    encoded_values.append(
+                        _encode_value(value)
+                    )
+                tags.extend(
+                    (
+                        keys.setdefault(
+                            key, len(keys)
+                        ),
+                        values[value_key],
+                    )
+                )
+
+            feature_id = feature.get("id")
+            for (
+                geometry_type,
+                coordinates,
+            ) in _iter_geometries(
+                feature.get("geometry")
+            ):
+                parts = self._get_parts(
+                    geometry_type, coordinates
+                )
+                if not parts:
+                    continue
+
+                encoded_feature = b""
+                if (
+                    isinstance(feature_id, int)
+                    and not isinstance(
+                        feature_id, bool
+                    )
+                    and 0 <= feature_id < 2**64
+                ):
+                    encoded_feature += (
+                        _encode_varint_field(
+                            1, feature_id
+                        )
+                    )
+                if tags:
+                    encoded_feature += (
+                        _encode_packed_field(
+                            2, tags
+                        )
+                    )
+                encoded_feature += (
+                    _encode_varint_field(
+                        3, geometry_type
+                    )
+                    + _encode_packed_field(
+                        4,
+                        _encode_geometry(
+                            geometry_type, parts
+                        ),
+                    )
+                )
+                encoded_features.append(
+                    encoded_feature
+                )
+
+        if not encoded_features:
+            return b""
+
+        encoded_layer = b"".join(
+            [
+                _encode_varint_field(15, 2),
+                _encode_bytes_field(
+                    1, layer_name.encode()
+                ),
+                *(
+                    _encode_bytes_field(
+                        2, encoded_feature
+                    )
+                    for encoded_feature in encoded_features
+                ),
+                *(
+                    _encode_bytes_field(
+                        3, key.encode()
+                    )
+                    for key in keys
+                ),
+                *(
+                    _encode_bytes_field(
+                        4, encoded_value
+                    )
+                    for encoded_value in encoded_values
+                ),
+                _encode_varint_field(
+                    5, self._extent
+                ),
+            ]
+        )
+        return _encode_bytes_field(
+            3, encoded_layer
+        )
+
+
+class VectorTileCache:
+    """
+    LRU of encoded tiles bounded by their size in bytes. Tiles are keyed by etag of
+    the layer object, so tiles of changed content are never served
+    """
+
+    def __init__(self, max_size: int):
+        self._cache = LRUCache(
+            maxsize=max_size,
+            getsizeof=lambda tile: max(
+                len(tile), 1
+            ),
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            return self._cache.get(key)
+
+    def put(
+        self, key: tuple, tile: bytes
+    ) -> None:
+        if len(tile) > self._cache.maxsize:
+            return
+        with self._lock:
+            self._cache[key] = tile
+
+
+_shared_vector_tile_cache: (
+    VectorTileCache | None
+) = None
+_shared_vector_tile_cache_lock = threading.Lock()
+
+
+def get_vector_tile_cache() -> VectorTileCache:
+    global _shared_vector_tile_cache
+
+    if _shared_vector_tile_cache is None:
+        with _shared_vector_tile_cache_lock:
+            if _shared_vector_tile_cache is None:
+                _shared_vector_tile_cache = VectorTileCache(
+                    max_size=VECTOR_TILE_CACHE_SIZE
+                )
+
+    return _shared_vector_tile_cache
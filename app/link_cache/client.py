@@ -0,0 +1,187 @@
+import asyncio
+import ipaddress
+import socket
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+from yarl import URL
+
+from config.link_cache_config import (
+    LINK_CACHE_ALLOWED_HOSTS,
+    LINK_CACHE_CONNECT_TIMEOUT,
+    LINK_CACHE_FETCH_TIMEOUT,
+    LINK_CACHE_MAX_CONNECTIONS,
+)
+from link_cache.exceptions import (
+    LinkNotAllowed,
+    LinkNotAvailable,
+)
+
+LINK_MAX_REDIRECTS = 10
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+_shared_link_http_client: (
+    aiohttp.ClientSession | None
+) = None
+_shared_link_http_client_loop: (
+    asyncio.AbstractEventLoop | None
+) = None
+
+
+def check_link_address(
+    host: str, address: str
+) -> None:
+    """
+    Server links may reach public addresses only, so a link can't be used to fetch
+    internal services (private, loopback, link-local and other reserved networks).
+    Hosts of LINK_CACHE_ALLOWED_HOSTS may have any address
+    """
+    if host in LINK_CACHE_ALLOWED_HOSTS:
+        return
+
+    ip_address = ipaddress.ip_address(address)
+    if (
+        ip_address.version == 6
+        and ip_address.ipv4_mapped
+    ):
+        ip_address = ip_address.ipv4_mapped
+    if (
+        ip_address.is_global
+        and not ip_address.is_multicast
+    ):
+        return
+
+    raise LinkNotAllowed(
+        status_code=422,
+        detail=f"Server link host {host} has not allowed address {address}",
+    )
+
+
+class PublicAddressResolver(AbstractResolver):
+    """
+    Resolves hosts to allowed addresses only. The connection is opened to the
+    checked address, so DNS can't be rebound between the check and the connection
+    """
+
+    def __init__(self):
+        self._resolver = DefaultResolver()
+
+    async def resolve(
+        self,
+        host: str,
+        port: int = 0,
+        family: int = socket.AF_INET,
+    ) -> list[dict]:
+        hosts = await self._resolver.resolve(
+            host, port, family
+        )
+        for resolved_host in hosts:
+            check_link_address(
+                host=host,
+                address=resolved_host["host"],
+            )
+        return hosts
+
+    async def close(self) -> None:
+        await self._resolver.close()
+
+
+def check_link_url(url: URL) -> None:
+    """
+    Hosts given as ip addresses are connected without resolving, so they are
+    checked before the request
+    """
+    if url.scheme not in ("http", "https"):
+        raise LinkNotAllowed(
+            status_code=422,
+            detail=f"Server link {url} is not an http link",
+        )
+
+    host = url.raw_host
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return
+    check_link_address(host=host, address=host)
+
+
+def get_link_http_client() -> (
+    aiohttp.ClientSession
+):
+    """
+    Returns http client shared by all server link fetches of the event loop.
+    Connections to external servers are pooled and kept alive between fetches,
+    only public addresses are connected
+    """
+    global _shared_link_http_client
+    global _shared_link_http_client_loop
+
+    loop = asyncio.get_running_loop()
+    if (
+        _shared_link_http_client is None
+        or _shared_link_http_client.closed
+        or _shared_link_http_client_loop
+        is not loop
+    ):
+        _shared_link_http_client = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=LINK_CACHE_MAX_CONNECTIONS,
+                ttl_dns_cache=5 * 60,
+                resolver=PublicAddressResolver(),
+            ),
+            timeout=aiohttp.ClientTimeout(
+                total=LINK_CACHE_FETCH_TIMEOUT,
+                connect=LINK_CACHE_CONNECT_TIMEOUT,
+            ),
+        )
+        _shared_link_http_client_loop = loop
+
+    return _shared_link_http_client
+
+
+async def close_link_http_client():
+    global _shared_link_http_client
+
+    if _shared_link_http_client is not None:
+        await _shared_link_http_client.close()
+        _shared_link_http_client = None
+
+
+@asynccontextmanager
+async def get_link_response(
+    url: str, headers: dict
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    GET response of a server link. Redirects are followed here instead of the http
+    client, so every redirect is checked before it is requested
+    """
+    link_url = URL(url)
+    for _ in range(LINK_MAX_REDIRECTS + 1):
+        check_link_url(link_url)
+        async with get_link_http_client().get(
+            link_url,
+            headers=headers,
+            allow_redirects=False,
+        ) as response:
+            location = response.headers.get(
+                "Location"
+            )
+            if (
+                response.status
+                not in REDIRECT_STATUSES
+                or not location
+            ):
+                yield response
+                return
+
+            link_url = response.url.join(
+                URL(location)
+            )
+
+    raise LinkNotAvailable(
+        status_code=502,
+        detail=f"Server link {url} has too many redirects",
+    )
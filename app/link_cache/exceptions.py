@@ -0,0 +1,21 @@
+class LinkCacheException(Exception):
+    def __init__(self, detail, status_code=None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+    def __str__(self):
+        if self.status_code:
+            return f"[Error {self.status_code}]: {self.detail}"
+        return self.detail
+
+
+__all__ = ["LinkCacheException"]
+
+
+class LinkNotAvailable(LinkCacheException):
+    pass
+
+
+class LinkNotAllowed(LinkCacheException):
+    pass
@@ -0,0 +1,248 @@
+import asyncio
+from datetime import datetime, timedelta
+from tempfile import SpooledTemporaryFile
+
+import aiohttp
+from sqlalchemy import update
+from sqlmodel import Session
+
+from common.http_cache import (
+    get_freshness_lifetime,
+    is_shared_cache_storable,
+)
+from common.initializers import Initializer
+from config.link_cache_config import (
+    LINK_CACHE_DEFAULT_TTL,
+    LINK_CACHE_MAX_SIZE,
+)
+from layers_router.constants import (
+    DEFAULT_CONTENT_TYPE,
+    FILE_CHUNK_SIZE,
+    SPOOLED_FILE_MAX_SIZE,
+)
+from link_cache.client import (
+    get_link_response,
+)
+from link_cache.exceptions import (
+    LinkNotAvailable,
+)
+from link_cache.utils import (
+    LinkCacheDatabaseGetter,
+    get_link_object_name,
+    get_url_hash,
+    save_link_cache_entry,
+)
+from models import LinkCacheEntry
+
+
+class FetchLinkContent(Initializer):
+    """
+    Fetch-through cache of an external server link. Fresh cached content is returned
+    without requests to the server, stale content is revalidated with a conditional
+    request. Responses which shared caches must not store, or which are larger than
+    LINK_CACHE_MAX_SIZE, are not cached and None is returned
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session: Session,
+        force_refresh: bool = False,
+    ):
+        super().__init__(session=session)
+        self._url = url
+        self._force_refresh = force_refresh
+
+        self._link_cache_db_getter = (
+            LinkCacheDatabaseGetter(
+                session=session
+            )
+        )
+        self._link_cache_entry = self._link_cache_db_getter.get_link_cache_entry(
+            url=self._url
+        )
+
+    def _is_entry_fresh(self) -> bool:
+        return (
+            not self._force_refresh
+            and self._link_cache_entry is not None
+            and self._link_cache_entry.expiration_date
+            > datetime.utcnow()
+        )
+
+    def _get_conditional_headers(self) -> dict:
+        if (
+            self._force_refresh
+            or not self._link_cache_entry
+        ):
+            return {}
+
+        headers = {}
+        if self._link_cache_entry.etag:
+            headers["If-None-Match"] = (
+                self._link_cache_entry.etag
+            )
+        if self._link_cache_entry.last_modified:
+            headers["If-Modified-Since"] = (
+                self._link_cache_entry.last_modified
+            )
+        return headers
+
+    @staticmethod
+    def _get_expiration_date(
+        response: aiohttp.ClientResponse,
+    ) -> datetime:
+        return datetime.utcnow() + timedelta(
+            seconds=get_freshness_lifetime(
+                cache_control=response.headers.get(
+                    "Cache-Control"
+                ),
+                expires=response.headers.get(
+                    "Expires"
+                ),
+                date=response.headers.get("Date"),
+                default=LINK_CACHE_DEFAULT_TTL,
+            )
+        )
+
+    def _get_entry(self) -> LinkCacheEntry:
+        self._session.commit()
+        return self._link_cache_db_getter.get_link_cache_entry(
+            url=self._url
+        )
+
+    def _revalidate_entry(
+        self, response: aiohttp.ClientResponse
+    ) -> LinkCacheEntry:
+        values = {
+            "expiration_date": self._get_expiration_date(
+                response
+            )
+        }
+        for name, header in (
+            ("etag", "ETag"),
+            ("last_modified", "Last-Modified"),
+        ):
+            if header in response.headers:
+                values[name] = response.headers[
+                    header
+                ]
+
+        self._session.execute(
+            update(LinkCacheEntry)
+            .where(
+                LinkCacheEntry.url_hash
+                == get_url_hash(self._url)
+            )
+            .values(**values)
+            .execution_options(
+                synchronize_session=False
+            )
+        )
+        return self._get_entry()
+
+    async def _store_response(
+        self, response: aiohttp.ClientResponse
+    ) -> LinkCacheEntry | None:
+        if not is_shared_cache_storable(
+            response.headers.get("Cache-Control")
+        ) or (
+            response.content_length
+            and response.content_length
+            > LINK_CACHE_MAX_SIZE
+        ):
+            return None
+
+        content_type = response.headers.get(
+            "Content-Type",
+            DEFAULT_CONTENT_TYPE,
+        )
+        with SpooledTemporaryFile(
+            max_size=SPOOLED_FILE_MAX_SIZE
+        ) as file:
+            size = 0
+            async for (
+                chunk
+            ) in response.content.iter_chunked(
+                FILE_CHUNK_SIZE
+            ):
+                size += len(chunk)
+                if size > LINK_CACHE_MAX_SIZE:
+                    return None
+                await self._async_minio_client.run_in_executor(
+                    file.write, chunk
+                )
+            file.seek(0)
+
+            object_write_result = await self._async_minio_client.create_file(
+                filename=get_link_object_name(
+                    self._url
+                ),
+                data_buf=file,
+                length=size,
+                content_type=content_type,
+            )
+
+        save_link_cache_entry(
+            session=self._session,
+            url=self._url,
+            object_etag=object_write_result.etag,
+            content_type=content_type,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get(
+                "Last-Modified"
+            ),
+            expiration_date=self._get_expiration_date(
+                response
+            ),
+        )
+        return self._get_entry()
+
+    async def execute(
+        self,
+    ) -> LinkCacheEntry | None:
+        """
+        If the server is not available or responds with a server error,
+        stale cached content is returned
+        """
+        if self._is_entry_fresh():
+            return self._link_cache_entry
+
+        try:
+            async with get_link_response(
+                self._url,
+                headers=self._get_conditional_headers(),
+            ) as response:
+                if (
+                    response.status == 304
+                    and self._link_cache_entry
+                ):
+                    return self._revalidate_entry(
+                        response
+                    )
+                if response.status == 200:
+                    return await self._store_response(
+                        response
+                    )
+                status = response.status
+
+        except (
+            aiohttp.ClientError,
+            asyncio.TimeoutError,
+        ):
+            status = None
+
+        if self._link_cache_entry and (
+            status is None or status >= 500
+        ):
+            return self._link_cache_entry
+
+        raise LinkNotAvailable(
+            status_code=502,
+            detail=f"Server link {self._url} is not available"
+            + (
+                f", it responded with {status}"
+                if status
+                else ""
+            ),
+        )
@@ -0,0 +1,120 @@
+import hashlib
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects.postgresql import (
+    insert,
+)
+from sqlalchemy.orm import Session
+
+from models import Layer, LinkCacheEntry
+from object_deletion.utils import (
+    cancel_object_deletions,
+)
+
+LINK_OBJECT_PREFIX = "links"
+
+
+class LinkCacheDatabaseGetter:
+    def __init__(self, session: Session):
+        self._session = session
+
+    def get_link_cache_entry(
+        self, url: str
+    ) -> LinkCacheEntry | None:
+        query = (
+            select(LinkCacheEntry)
+            .where(
+                LinkCacheEntry.url_hash
+                == get_url_hash(url)
+            )
+            .execution_options(
+                populate_existing=True
+            )
+        )
+        return (
+            self._session.execute(query)
+            .scalars()
+            .first()
+        )
+
+
+def get_url_hash(url: str) -> str:
+    return hashlib.sha256(
+        url.encode()
+    ).hexdigest()
+
+
+def get_link_object_name(url: str) -> str:
+    """
+    Every link has one object which is overwritten when the link content changes
+    """
+    return f"{LINK_OBJECT_PREFIX}/{get_url_hash(url)}"
+
+
+def save_link_cache_entry(
+    session: Session, url: str, **values
+) -> None:
+    """
+    Inserts or updates cache entry of the link with one upsert, so concurrent
+    fetches of the same link from several workers don't conflict
+    """
+    now = datetime.utcnow()
+    entry_values = {
+        "url_hash": get_url_hash(url),
+        "url": url,
+        "object_name": get_link_object_name(url),
+        "creation_date": now,
+        "modification_date": now,
+        **values,
+    }
+    session.execute(
+        insert(LinkCacheEntry)
+        .values(**entry_values)
+        .on_conflict_do_update(
+            index_elements=[
+                LinkCacheEntry.url_hash
+            ],
+            set_={
+                name: value
+                for name, value in entry_values.items()
+                if name
+                not in (
+                    "url_hash",
+                    "creation_date",
+                )
+            },
+        )
+    )
+    cancel_object_deletions(
+        session=session,
+        object_names=[
+            entry_values["object_name"]
+        ],
+    )
+
+
+def release_orphaned_link_cache_entries(
+    session: Session,
+) -> List[str]:
+    """
+    Deletes cache entries of links which are not used by any layer.
+    Returns names of their objects
+    """
+    query = (
+        delete(LinkCacheEntry)
+        .where(
+            ~exists().where(
+                Layer.file_link
+                == LinkCacheEntry.url
+            )
+        )
+        .returning(LinkCacheEntry.object_name)
+        .execution_options(
+            synchronize_session=False
+        )
+    )
+    return list(
+        session.execute(query).scalars().all()
+    )
@@ -2,13 +2,42 @@ import database  # noqa
 from starlette.middleware.cors import (
     CORSMiddleware,
 )
+from starlette.requests import Request
+from starlette.responses import JSONResponse
 from config.app_config import DEBUG
 from config.minio_config import MINIO_BUCKET
 from folder_router import router as folder_router
 from layers_router import router as layer_router
+from upload_session_router import (
+    router as upload_session_router,
+)
+from upload_session_router.tasks import (
+    expired_upload_sessions_collector,
+)
+from object_deletion.tasks import (
+    object_deletion_worker,
+)
+from layer_ingest.tasks import (
+    layer_ingest_worker,
+)
+from content_cache.disk_cache import (
+    get_disk_content_cache,
+)
 from init_app import create_app
+from link_cache.client import (
+    close_link_http_client,
+)
+from link_cache.exceptions import (
+    LinkCacheException,
+)
+from services.storage_service.async_storage import (
+    get_async_minio_initializer,
+)
+from services.storage_service.exceptions import (
+    StorageException,
+)
 from services.storage_service.utils import (
-    MinioInitializer,
+    get_minio_initializer,
 )
 
 app_title = "Layers"
@@ -37,15 +66,39 @@ if DEBUG:
 
 app_v1 = create_app(**v1_options)
 
+
+@app_v1.exception_handler(StorageException)
+async def storage_exception_handler(
+    request: Request, exc: StorageException
+):
+    return JSONResponse(
+        status_code=exc.status_code or 500,
+        content={"detail": exc.detail},
+    )
+
+
+@app_v1.exception_handler(LinkCacheException)
+async def link_cache_exception_handler(
+    request: Request, exc: LinkCacheException
+):
+    return JSONResponse(
+        status_code=exc.status_code or 500,
+        content={"detail": exc.detail},
+    )
+
+
 app_v1.include_router(folder_router.router)
 app_v1.include_router(layer_router.router)
+app_v1.include_router(
+    upload_session_router.router
+)
 
 app.mount(v1_options["root_path"], app_v1)
 
 
 @app.on_event("startup")
-def on_startup():
-    minio_client = MinioInitializer()
+async def on_startup():
+    minio_client = get_minio_initializer()
     minio_client = minio_client.get_minio_client()
 
     if (
@@ -55,3 +108,18 @@ def on_startup():
         )
     ):
         minio_client.make_bucket(MINIO_BUCKET)
+
+    get_async_minio_initializer()
+
+    expired_upload_sessions_collector.start()
+    object_deletion_worker.start()
+    layer_ingest_worker.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await expired_upload_sessions_collector.stop()
+    await object_deletion_worker.stop()
+    await layer_ingest_worker.stop()
+    get_disk_content_cache().close()
+    await close_link_http_client()
@@ -1,6 +1,14 @@
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import Column, Integer, ForeignKey
+from uuid import uuid4
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    ForeignKey,
+    String,
+)
 from sqlalchemy.ext.declarative import (
     declarative_base,
 )
@@ -49,6 +57,7 @@ class Folder(FolderBase, table=True):
         back_populates="folder",
         sa_relationship_kwargs={
             "cascade": "all, delete",
+            "passive_deletes": True,
             "order_by": "Layer.id",
         },
     )
@@ -76,13 +85,216 @@ class Layer(LayerBase, table=True):
         )
     )
     file_link: str = Field(nullable=False)
+    object_name: Optional[str] = Field(
+        default=None, nullable=True
+    )
+    content_encoding: Optional[str] = Field(
+        default=None, nullable=True
+    )
+    # spatial index with feature data converted from the object on ingest
+    features_object_name: Optional[str] = Field(
+        default=None, nullable=True
+    )
     created_by: str = Field(nullable=False)
     modified_by: str = Field(nullable=False)
     creation_date: datetime = Field(
         default_factory=datetime.utcnow,
         nullable=False,
     )
+    modification_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+    )
 
     folder: Folder = Relationship(
         back_populates="layers"
     )
+
+
+class LayerBlob(SQLModel, table=True):
+    """
+    Minio object which can be shared by several layers. Object is deleted
+    from minio when the last layer referencing it is deleted.
+    tiles_max_zoom and simplified_max_zoom are set when tile pyramid
+    and geometry simplification levels of the object are stored
+    """
+
+    object_name: str = Field(primary_key=True)
+    content_hash: Optional[str] = Field(
+        default=None,
+        nullable=True,
+        index=True,
+        unique=True,
+    )
+    size: Optional[int] = Field(
+        sa_column=Column(
+            BigInteger, nullable=True
+        ),
+        default=None,
+    )
+    etag: Optional[str] = Field(
+        default=None, nullable=True
+    )
+    ref_count: int = Field(
+        default=1, nullable=False
+    )
+    tiles_max_zoom: Optional[int] = Field(
+        default=None, nullable=True
+    )
+    simplified_max_zoom: Optional[int] = Field(
+        default=None, nullable=True
+    )
+    creation_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+    )
+
+
+class ObjectDeletion(SQLModel, table=True):
+    """
+    Minio object waiting to be deleted. Rows are written in the same transaction
+    as the layer delete and are drained by the object deletion worker
+    """
+
+    id: Optional[int] = Field(
+        default=None,
+        nullable=False,
+        primary_key=True,
+    )
+    object_name: str = Field(
+        nullable=False, index=True
+    )
+    attempts: int = Field(
+        default=0, nullable=False
+    )
+    last_error: Optional[str] = Field(
+        default=None, nullable=True
+    )
+    creation_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+    )
+    next_attempt_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+        index=True,
+    )
+
+
+class ObjectIngestion(SQLModel, table=True):
+    """
+    Stored layer object waiting for ingest, which writes objects derived from it
+    (spatial index, tile pyramid). Rows are written in the same transaction
+    as the layer and are drained by the ingest worker
+    """
+
+    id: Optional[int] = Field(
+        default=None,
+        nullable=False,
+        primary_key=True,
+    )
+    object_name: str = Field(
+        nullable=False, index=True, unique=True
+    )
+    attempts: int = Field(
+        default=0, nullable=False
+    )
+    last_error: Optional[str] = Field(
+        default=None, nullable=True
+    )
+    creation_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+    )
+    next_attempt_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+        index=True,
+    )
+
+
+class LinkCacheEntry(SQLModel, table=True):
+    """
+    Response of an external server link cached in minio. Validators of the
+    response are kept for conditional revalidation
+    """
+
+    url_hash: str = Field(primary_key=True)
+    url: str = Field(nullable=False)
+    object_name: str = Field(nullable=False)
+    object_etag: str = Field(nullable=False)
+    content_type: Optional[str] = Field(
+        default=None, nullable=True
+    )
+    etag: Optional[str] = Field(
+        default=None, nullable=True
+    )
+    last_modified: Optional[str] = Field(
+        default=None, nullable=True
+    )
+    creation_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+    )
+    modification_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+    )
+    expiration_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+    )
+
+
+class UploadSession(SQLModel, table=True):
+    id: str = Field(
+        default_factory=lambda: uuid4().hex,
+        primary_key=True,
+    )
+    layer_name: str = Field(nullable=False)
+    folder_id: Optional[int] = Field(
+        default=None, nullable=True
+    )
+    filename: str = Field(nullable=False)
+    object_name: str = Field(nullable=False)
+    upload_id: str = Field(nullable=False)
+    created_by: str = Field(nullable=False)
+    creation_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+    )
+    modification_date: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+        index=True,
+    )
+
+    parts: List["UploadSessionPart"] = (
+        Relationship(
+            back_populates="upload_session",
+            sa_relationship_kwargs={
+                "cascade": "all, delete",
+                "order_by": "UploadSessionPart.part_number",
+            },
+        )
+    )
+
+
+class UploadSessionPart(SQLModel, table=True):
+    session_id: str = Field(
+        sa_column=Column(
+            String,
+            ForeignKey(
+                column="uploadsession.id",
+                ondelete="CASCADE",
+            ),
+            primary_key=True,
+        )
+    )
+    part_number: int = Field(primary_key=True)
+    etag: str = Field(nullable=False)
+    size: int = Field(nullable=False)
+
+    upload_session: UploadSession = Relationship(
+        back_populates="parts"
+    )
@@ -0,0 +1,151 @@
+import datetime
+import logging
+
+from sqlmodel import Session
+
+from common.initializers import Initializer
+from config.object_deletion_config import (
+    OBJECT_DELETION_BATCH_SIZE,
+    OBJECT_DELETION_INTERVAL,
+)
+from layers_router.constants import (
+    DERIVED_OBJECT_SUFFIXES,
+)
+from object_deletion.utils import (
+    ObjectDeletionDatabaseGetter,
+    get_retry_delay,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class DeleteQueuedObjects(Initializer):
+    """
+    Deletes a batch of queued objects from minio with one batch delete request.
+    Objects which were referenced again since they were queued are kept,
+    failed deletions are retried with exponential backoff. Objects locked by
+    a layer being created are postponed without counting an attempt
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        batch_size: int = OBJECT_DELETION_BATCH_SIZE,
+        **kwargs,
+    ):
+        super().__init__(
+            session=session, **kwargs
+        )
+        self._batch_size = batch_size
+        self._object_deletion_db_getter = (
+            ObjectDeletionDatabaseGetter(
+                session=session
+            )
+        )
+
+    def _delete_objects(
+        self, object_names: list[str]
+    ) -> dict[str, str]:
+        """
+        Objects derived from the deleted objects are deleted with them,
+        error of a derived object is reported for its source object
+        """
+        if not object_names:
+            return {}
+
+        derived_object_names = {
+            f"{object_name}{suffix}": object_name
+            for object_name in object_names
+            for suffix in DERIVED_OBJECT_SUFFIXES
+        }
+        try:
+            errors = (
+                self._minio_client.delete_files(
+                    filenames=object_names
+                    + list(derived_object_names)
+                )
+            )
+        except Exception as e:
+            logger.exception(
+                "Batch delete of %s objects failed",
+                len(object_names),
+            )
+            return {
+                object_name: str(e)
+                for object_name in object_names
+            }
+
+        return {
+            derived_object_names.get(
+                object_name, object_name
+            ): error
+            for object_name, error in errors.items()
+        }
+
+    def execute(self) -> int:
+        now = datetime.datetime.utcnow()
+        object_deletions = self._object_deletion_db_getter.get_due_object_deletions(
+            due_date=now, limit=self._batch_size
+        )
+        if not object_deletions:
+            self._session.commit()
+            return 0
+
+        object_names = list(
+            {
+                object_deletion.object_name
+                for object_deletion in object_deletions
+            }
+        )
+        locked_object_names = self._object_deletion_db_getter.try_lock_object_names(
+            object_names=object_names
+        )
+        referenced_object_names = self._object_deletion_db_getter.get_referenced_object_names(
+            object_names=list(locked_object_names)
+        )
+        errors = self._delete_objects(
+            object_names=[
+                object_name
+                for object_name in object_names
+                if object_name
+                in locked_object_names
+                and object_name
+                not in referenced_object_names
+            ]
+        )
+
+        for object_deletion in object_deletions:
+            if (
+                object_deletion.object_name
+                not in locked_object_names
+            ):
+                object_deletion.next_attempt_date = (
+                    now
+                    + datetime.timedelta(
+                        seconds=OBJECT_DELETION_INTERVAL
+                    )
+                )
+                self._session.add(object_deletion)
+                continue
+
+            error = errors.get(
+                object_deletion.object_name
+            )
+            if error is None:
+                self._session.delete(
+                    object_deletion
+                )
+                continue
+
+            object_deletion.attempts += 1
+            object_deletion.last_error = error
+            object_deletion.next_attempt_date = (
+                now
+                + get_retry_delay(
+                    object_deletion.attempts
+                )
+            )
+            self._session.add(object_deletion)
+
+        self._session.commit()
+        return len(object_deletions)
@@ -0,0 +1,37 @@
+from sqlmodel import Session
+
+import database
+from common.periodic import PeriodicTask
+from config.object_deletion_config import (
+    OBJECT_DELETION_BATCH_SIZE,
+    OBJECT_DELETION_INTERVAL,
+)
+from object_deletion.processors import (
+    DeleteQueuedObjects,
+)
+
+
+def delete_queued_objects():
+    """
+    Drains the deletion queue batch by batch until no due deletions are left
+    """
+    while True:
+        with Session(database.engine) as session:
+            task = DeleteQueuedObjects(
+                session=session,
+                batch_size=OBJECT_DELETION_BATCH_SIZE,
+            )
+            processed_count = task.execute()
+
+        if (
+            processed_count
+            < OBJECT_DELETION_BATCH_SIZE
+        ):
+            return
+
+
+object_deletion_worker = PeriodicTask(
+    name="object_deletion_worker",
+    func=delete_queued_objects,
+    interval=OBJECT_DELETION_INTERVAL,
+)
@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+from sqlalchemy import (
+    delete,
+    func,
+    insert,
+    select,
+)
+from sqlalchemy.orm import Session
+
+from config.object_deletion_config import (
+    OBJECT_DELETION_INTERVAL,
+    OBJECT_DELETION_MAX_RETRY_DELAY,
+)
+from models import LayerBlob, ObjectDeletion
+
+
+class ObjectDeletionDatabaseGetter:
+    def __init__(self, session: Session):
+        self._session = session
+
+    def get_due_object_deletions(
+        self, due_date: datetime, limit: int
+    ) -> List[ObjectDeletion]:
+        """
+        Locks due deletions, rows locked by another worker are skipped
+        """
+        query = (
+            select(ObjectDeletion)
+            .where(
+                ObjectDeletion.next_attempt_date
+                <= due_date
+            )
+            .order_by(ObjectDeletion.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return (
+            self._session.execute(query)
+            .scalars()
+            .all()
+        )
+
+    def try_lock_object_names(
+        self, object_names: List[str]
+    ) -> set[str]:
+        """
+        Names of the objects locked without waiting, see lock_object_names
+        """
+        return {
+            object_name
+            for object_name in sorted(
+                object_names
+            )
+            if self._session.execute(
+                select(
+                    func.pg_try_advisory_xact_lock(
+                        _get_object_lock_key(
+                            object_name
+                        )
+                    )
+                )
+            ).scalar()
+        }
+
+    def get_referenced_object_names(
+        self, object_names: List[str]
+    ) -> set[str]:
+        if not object_names:
+            return set()
+
+        query = select(
+            LayerBlob.object_name
+        ).where(
+            LayerBlob.object_name.in_(
+                object_names
+            )
+        )
+        return set(
+            self._session.execute(query)
+            .scalars()
+            .all()
+        )
+
+
+def _get_object_lock_key(object_name: str):
+    return func.hashtext(object_name)
+
+
+def lock_object_names(
+    session: Session, object_names: Iterable[str]
+) -> None:
+    """
+    Waits for deletion of the objects in progress and blocks their deletion
+    until the transaction ends. Taken before checking whether the object exists,
+    so a new reference never points to an object deleted by the worker
+    """
+    for object_name in sorted(set(object_names)):
+        session.execute(
+            select(
+                func.pg_advisory_xact_lock(
+                    _get_object_lock_key(
+                        object_name
+                    )
+                )
+            )
+        )
+
+
+def enqueue_object_deletions(
+    session: Session, object_names: Iterable[str]
+) -> None:
+    """
+    Adds objects to the deletion queue with one multi-row INSERT.
+    Changes are committed together with the rows which referenced the objects
+    """
+    now = datetime.utcnow()
+    object_deletions = [
+        {
+            "object_name": object_name,
+            "attempts": 0,
+            "creation_date": now,
+            "next_attempt_date": now,
+        }
+        for object_name in object_names
+    ]
+    if not object_deletions:
+        return
+
+    session.execute(
+        insert(ObjectDeletion).values(
+            object_deletions
+        )
+    )
+
+
+def cancel_object_deletions(
+    session: Session, object_names: List[str]
+) -> None:
+    """
+    Removes pending deletions of the objects which are referenced again
+    """
+    session.execute(
+        delete(ObjectDeletion)
+        .where(
+            ObjectDeletion.object_name.in_(
+                object_names
+            )
+        )
+        .execution_options(
+            synchronize_session=False
+        )
+    )
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    """
+    Exponential backoff starting from OBJECT_DELETION_INTERVAL seconds
+    """
+    delay = OBJECT_DELETION_INTERVAL * 2 ** min(
+        attempts, 16
+    )
+    return timedelta(
+        seconds=min(
+            delay, OBJECT_DELETION_MAX_RETRY_DELAY
+        )
+    )
@@ -0,0 +1,265 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable
+
+from minio.datatypes import Object, Part
+from minio.helpers import ObjectWriteResult
+
+from config.minio_config import (
+    MINIO_EXECUTOR_WORKERS,
+    MINIO_OPERATION_TIMEOUT,
+    MINIO_UPLOAD_TIMEOUT,
+)
+from services.storage_service.exceptions import (
+    StorageOperationTimeout,
+)
+from services.storage_service.utils import (
+    MinioInitializer,
+    get_minio_initializer,
+)
+
+
+class AsyncMinioInitializer:
+    """
+    Async facade over MinioInitializer. Blocking minio calls are run on a bounded
+    thread pool, so a slow minio request does not stall the event loop.
+    On timeout StorageOperationTimeout is raised, the call itself can't be interrupted
+    and finishes in its worker thread
+    """
+
+    def __init__(
+        self,
+        minio_client: MinioInitializer,
+        executor: ThreadPoolExecutor,
+        operation_timeout: float = MINIO_OPERATION_TIMEOUT,
+        upload_timeout: float = MINIO_UPLOAD_TIMEOUT,
+    ):
+        self._minio_client = minio_client
+        self._executor = executor
+        self._operation_timeout = (
+            operation_timeout
+        )
+        self._upload_timeout = upload_timeout
+
+    async def _run(
+        self,
+        func: Callable,
+        *args,
+        timeout: float | None = None,
+        **kwargs,
+    ):
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(
+                    self._executor,
+                    functools.partial(
+                        func, *args, **kwargs
+                    ),
+                ),
+                timeout=timeout
+                or self._operation_timeout,
+            )
+        except asyncio.TimeoutError:
+            raise StorageOperationTimeout(
+                status_code=504,
+                detail=f"Storage operation {getattr(func, '__name__', repr(func))} timed out",
+            )
+
+    async def get_file(
+        self, filename: str, **kwargs
+    ) -> str:
+        return await self._run(
+            self._minio_client.get_file,
+            filename=filename,
+            **kwargs,
+        )
+
+    async def get_file_redirect_url(
+        self, filename: str, **kwargs
+    ) -> str:
+        return await self._run(
+            self._minio_client.get_file_redirect_url,
+            filename=filename,
+            **kwargs,
+        )
+
+    async def create_file(
+        self,
+        filename: str,
+        data_buf: BinaryIO,
+        **kwargs,
+    ) -> ObjectWriteResult:
+        return await self._run(
+            self._minio_client.create_file,
+            filename=filename,
+            data_buf=data_buf,
+            timeout=self._upload_timeout,
+            **kwargs,
+        )
+
+    async def delete_file(
+        self, filename: str, **kwargs
+    ) -> None:
+        return await self._run(
+            self._minio_client.delete_file,
+            filename=filename,
+            **kwargs,
+        )
+
+    async def delete_files(
+        self, filenames: list[str], **kwargs
+    ) -> dict[str, str]:
+        return await self._run(
+            self._minio_client.delete_files,
+            filenames=filenames,
+            **kwargs,
+        )
+
+    async def stat_file(
+        self, filename: str, **kwargs
+    ) -> Object | None:
+        return await self._run(
+            self._minio_client.stat_file,
+            filename=filename,
+            **kwargs,
+        )
+
+    async def create_multipart_upload(
+        self, filename: str, **kwargs
+    ) -> str:
+        return await self._run(
+            self._minio_client.create_multipart_upload,
+            filename=filename,
+            **kwargs,
+        )
+
+    async def upload_part(
+        self,
+        filename: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+        **kwargs,
+    ) -> str:
+        return await self._run(
+            self._minio_client.upload_part,
+            filename=filename,
+            upload_id=upload_id,
+            part_number=part_number,
+            data=data,
+            timeout=self._upload_timeout,
+            **kwargs,
+        )
+
+    async def complete_multipart_upload(
+        self,
+        filename: str,
+        upload_id: str,
+        parts: list[Part],
+        **kwargs,
+    ):
+        return await self._run(
+            self._minio_client.complete_multipart_upload,
+            filename=filename,
+            upload_id=upload_id,
+            parts=parts,
+            **kwargs,
+        )
+
+    async def abort_multipart_upload(
+        self,
+        filename: str,
+        upload_id: str,
+        **kwargs,
+    ) -> None:
+        return await self._run(
+            self._minio_client.abort_multipart_upload,
+            filename=filename,
+            upload_id=upload_id,
+            **kwargs,
+        )
+
+    async def list_parts(
+        self,
+        filename: str,
+        upload_id: str,
+        **kwargs,
+    ) -> list[Part]:
+        return await self._run(
+            self._minio_client.list_parts,
+            filename=filename,
+            upload_id=upload_id,
+            **kwargs,
+        )
+
+    async def get_upload_url(
+        self, filename: str, **kwargs
+    ) -> str:
+        return await self._run(
+            self._minio_client.get_upload_url,
+            filename=filename,
+            **kwargs,
+        )
+
+    async def get_upload_part_url(
+        self,
+        filename: str,
+        upload_id: str,
+        part_number: int,
+        **kwargs,
+    ) -> str:
+        return await self._run(
+            self._minio_client.get_upload_part_url,
+            filename=filename,
+            upload_id=upload_id,
+            part_number=part_number,
+            **kwargs,
+        )
+
+    async def run_in_executor(
+        self,
+        func: Callable,
+        *args,
+        timeout: float | None = None,
+        **kwargs,
+    ):
+        """
+        Runs other blocking storage related work (file hashing, compression)
+        on the same bounded thread pool
+        """
+        return await self._run(
+            func, *args, timeout=timeout, **kwargs
+        )
+
+
+_shared_async_minio_initializer: (
+    AsyncMinioInitializer | None
+) = None
+_shared_async_minio_initializer_lock = (
+    threading.Lock()
+)
+
+
+def get_async_minio_initializer() -> (
+    AsyncMinioInitializer
+):
+    global _shared_async_minio_initializer
+
+    if _shared_async_minio_initializer is None:
+        with _shared_async_minio_initializer_lock:
+            if (
+                _shared_async_minio_initializer
+                is None
+            ):
+                _shared_async_minio_initializer = AsyncMinioInitializer(
+                    minio_client=get_minio_initializer(),
+                    executor=ThreadPoolExecutor(
+                        max_workers=MINIO_EXECUTOR_WORKERS,
+                        thread_name_prefix="minio",
+                    ),
+                )
+
+    return _shared_async_minio_initializer
@@ -0,0 +1,168 @@
+import math
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import BinaryIO
+
+from minio import Minio
+from minio.datatypes import Part
+from minio.helpers import (
+    MAX_MULTIPART_COUNT,
+    MIN_PART_SIZE,
+    ObjectWriteResult,
+)
+
+from config.minio_config import (
+    MINIO_BUCKET,
+    MINIO_PARALLEL_UPLOADS,
+    MINIO_PART_SIZE,
+)
+
+
+class MultipartUploader:
+    """
+    Uploads a stream to minio as multipart upload. Parts are read sequentially from the stream
+    and uploaded from a thread pool, at most parallel_uploads parts are in flight at a time,
+    so memory usage stays bounded to (parallel_uploads + 1) * part_size bytes.
+    Multipart upload is completed only if all parts were uploaded, otherwise it is aborted
+    """
+
+    def __init__(
+        self,
+        minio_client: Minio,
+        part_size: int = MINIO_PART_SIZE,
+        parallel_uploads: int = MINIO_PARALLEL_UPLOADS,
+    ):
+        self._minio_client = minio_client
+        self._part_size = max(
+            part_size, MIN_PART_SIZE
+        )
+        self._parallel_uploads = max(
+            parallel_uploads, 1
+        )
+
+    def _get_part_size(self, length: int) -> int:
+        if length < 0:
+            return self._part_size
+        return max(
+            self._part_size,
+            math.ceil(
+                length / MAX_MULTIPART_COUNT
+            ),
+        )
+
+    def _upload_part(
+        self,
+        minio_bucket: str,
+        object_name: str,
+        upload_id: str,
+        part_number: int,
+        part_data: bytes,
+    ) -> Part:
+        etag = self._minio_client._upload_part(
+            bucket_name=minio_bucket,
+            object_name=object_name,
+            data=part_data,
+            headers=None,
+            upload_id=upload_id,
+            part_number=part_number,
+        )
+        return Part(part_number, etag)
+
+    def upload(
+        self,
+        object_name: str,
+        data: BinaryIO,
+        length: int = -1,
+        content_type: str = "application/octet-stream",
+        content_encoding: str | None = None,
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> ObjectWriteResult:
+        part_size = self._get_part_size(length)
+        headers = {"Content-Type": content_type}
+        if content_encoding:
+            headers["Content-Encoding"] = (
+                content_encoding
+            )
+        upload_id = self._minio_client._create_multipart_upload(
+            minio_bucket,
+            object_name,
+            headers,
+        )
+
+        parts: list[Part] = []
+        in_flight: set[Future] = set()
+        executor = ThreadPoolExecutor(
+            max_workers=self._parallel_uploads,
+            thread_name_prefix="minio-multipart",
+        )
+        try:
+            part_number = 0
+            while True:
+                part_data = data.read(part_size)
+                if not part_data and part_number:
+                    break
+
+                part_number += 1
+                in_flight.add(
+                    executor.submit(
+                        self._upload_part,
+                        minio_bucket,
+                        object_name,
+                        upload_id,
+                        part_number,
+                        part_data,
+                    )
+                )
+                del part_data
+
+                if (
+                    len(in_flight)
+                    >= self._parallel_uploads
+                ):
+                    done, in_flight = wait(
+                        in_flight,
+                        return_when=FIRST_COMPLETED,
+                    )
+                    parts.extend(
+                        future.result()
+                        for future in done
+                    )
+
+            done, _ = wait(in_flight)
+            parts.extend(
+                future.result() for future in done
+            )
+            parts.sort(
+                key=lambda part: part.part_number
+            )
+
+            result = self._minio_client._complete_multipart_upload(
+                minio_bucket,
+                object_name,
+                upload_id,
+                parts,
+            )
+            return ObjectWriteResult(
+                result.bucket_name,
+                result.object_name,
+                result.version_id,
+                result.etag,
+                result.http_headers,
+                location=result.location,
+            )
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self._minio_client._abort_multipart_upload(
+                minio_bucket,
+                object_name,
+                upload_id,
+            )
+            raise
+        finally:
+            executor.shutdown(wait=True)
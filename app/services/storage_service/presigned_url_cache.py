@@ -0,0 +1,36 @@
+import threading
+from typing import Callable
+
+from cachetools import TTLCache
+
+
+class PresignedUrlCache:
+    """
+    Presigned urls by object name. Urls are kept for ttl seconds, which is
+    shorter than url expiration, so a cached url is never close to expiry
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(
+            maxsize=maxsize, ttl=ttl
+        )
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        object_name: str,
+        create_url: Callable[[], str],
+    ) -> str:
+        with self._lock:
+            url = self._cache.get(object_name)
+        if url:
+            return url
+
+        url = create_url()
+        with self._lock:
+            self._cache[object_name] = url
+        return url
+
+    def __delitem__(self, object_name: str):
+        with self._lock:
+            self._cache.pop(object_name, None)
@@ -1,6 +1,15 @@
-from io import BytesIO
+import os
+import socket
+import threading
+from datetime import timedelta
+from typing import BinaryIO, Iterator
 
-from minio import Minio
+import certifi
+import urllib3
+from minio import Minio, S3Error
+from minio.datatypes import Object, Part
+from minio.deleteobjects import DeleteObject
+from minio.helpers import ObjectWriteResult
 
 from config.minio_config import (
     MINIO_URL,
@@ -8,7 +17,55 @@ from config.minio_config import (
     MINIO_PASSWORD,
     MINIO_SECURE,
     MINIO_BUCKET,
+    MINIO_PART_SIZE,
+    MINIO_MULTIPART_THRESHOLD,
+    MINIO_PRESIGNED_URL_EXPIRES,
+    MINIO_MAX_CONNECTIONS,
+    MINIO_CONNECT_TIMEOUT,
+    MINIO_READ_TIMEOUT,
+    MINIO_RETRIES,
+    MINIO_REDIRECT_URL_EXPIRES,
+    MINIO_REDIRECT_URL_REFRESH_MARGIN,
+    MINIO_REDIRECT_URL_CACHE_SIZE,
 )
+from services.storage_service.multipart import (
+    MultipartUploader,
+)
+from services.storage_service.presigned_url_cache import (
+    PresignedUrlCache,
+)
+
+
+def create_http_client() -> urllib3.PoolManager:
+    """
+    Connection pool shared by all minio requests of the process. Connections are kept alive
+    between requests, so TLS handshake is done once per pooled connection
+    """
+    return urllib3.PoolManager(
+        num_pools=1,
+        maxsize=MINIO_MAX_CONNECTIONS,
+        block=False,
+        timeout=urllib3.util.Timeout(
+            connect=MINIO_CONNECT_TIMEOUT,
+            read=MINIO_READ_TIMEOUT,
+        ),
+        retries=urllib3.Retry(
+            total=MINIO_RETRIES,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE")
+        or certifi.where(),
+        socket_options=urllib3.connection.HTTPConnection.default_socket_options
+        + [
+            (
+                socket.SOL_SOCKET,
+                socket.SO_KEEPALIVE,
+                1,
+            )
+        ],
+    )
 
 
 class MinioInitializer:
@@ -18,23 +75,39 @@ class MinioInitializer:
         minio_user: str = MINIO_USER,
         minio_password: str = MINIO_PASSWORD,
         minio_secure: bool = MINIO_SECURE,
+        http_client: urllib3.PoolManager
+        | None = None,
     ):
         self._minio_url = minio_url
         self._minio_user = minio_user
         self._minio_password = minio_password
         self._minio_secure = minio_secure
+        self._http_client = http_client
+        self._redirect_url_cache = PresignedUrlCache(
+            maxsize=MINIO_REDIRECT_URL_CACHE_SIZE,
+            ttl=max(
+                MINIO_REDIRECT_URL_EXPIRES
+                - MINIO_REDIRECT_URL_REFRESH_MARGIN,
+                1,
+            ),
+        )
 
+        self._minio_client = None
         self._minio_client = (
             self.get_minio_client()
         )
 
     def get_minio_client(self) -> Minio | None:
+        if self._minio_client:
+            return self._minio_client
+
         if self._minio_url:
             self._minio_client = Minio(
                 self._minio_url,
                 self._minio_user,
                 self._minio_password,
                 secure=self._minio_secure,
+                http_client=self._http_client,
             )
             return self._minio_client
 
@@ -43,27 +116,112 @@ class MinioInitializer:
     def get_file(
         self,
         filename: str,
+        expires: int | None = None,
         minio_bucket: str = MINIO_BUCKET,
     ) -> str:
+        kwargs = {}
+        if expires:
+            kwargs["expires"] = timedelta(
+                seconds=expires
+            )
         minio_file_link = self._minio_client.presigned_get_object(
             bucket_name=minio_bucket,
             object_name=filename,
+            **kwargs,
         )
         return minio_file_link
 
+    def get_file_redirect_url(
+        self,
+        filename: str,
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> str:
+        """
+        Short-lived presigned url for redirecting clients to minio. Url is signed once
+        and reused until MINIO_REDIRECT_URL_REFRESH_MARGIN seconds before its expiry
+        """
+        return self._redirect_url_cache.get(
+            object_name=f"{minio_bucket}/{filename}",
+            create_url=lambda: self.get_file(
+                filename=filename,
+                expires=MINIO_REDIRECT_URL_EXPIRES,
+                minio_bucket=minio_bucket,
+            ),
+        )
+
     def create_file(
         self,
         filename: str,
-        data_buf: BytesIO,
-        length: int,
+        data_buf: BinaryIO,
+        length: int = -1,
+        part_size: int = MINIO_PART_SIZE,
+        content_type: str = "application/octet-stream",
+        content_encoding: str | None = None,
         minio_bucket: str = MINIO_BUCKET,
-    ) -> None:
-        self._minio_client.put_object(
+    ) -> ObjectWriteResult:
+        """
+        Upload data_buf to minio. Files larger than MINIO_MULTIPART_THRESHOLD are uploaded
+        by parts in parallel. If length is unknown (-1) data is read and sent by parts
+        of part_size bytes, so only one part is kept in memory at a time
+        """
+        if length >= MINIO_MULTIPART_THRESHOLD:
+            uploader = MultipartUploader(
+                minio_client=self._minio_client,
+                part_size=part_size,
+            )
+            return uploader.upload(
+                object_name=filename,
+                data=data_buf,
+                length=length,
+                content_type=content_type,
+                content_encoding=content_encoding,
+                minio_bucket=minio_bucket,
+            )
+
+        metadata = None
+        if content_encoding:
+            metadata = {
+                "Content-Encoding": content_encoding
+            }
+
+        return self._minio_client.put_object(
             bucket_name=minio_bucket,
             object_name=filename,
             data=data_buf,
             length=length,
+            content_type=content_type,
+            metadata=metadata,
+            part_size=part_size
+            if length < 0
+            else 0,
+            num_parallel_uploads=1,
+        )
+
+    def get_file_chunks(
+        self,
+        filename: str,
+        offset: int = 0,
+        length: int = 0,
+        chunk_size: int = 1024 * 1024,
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> Iterator[bytes]:
+        """
+        Yields stored file content by chunks (content encoding is not decoded),
+        connection is released when iteration is finished
+        """
+        response = self._minio_client.get_object(
+            bucket_name=minio_bucket,
+            object_name=filename,
+            offset=offset,
+            length=length,
         )
+        try:
+            yield from response.stream(
+                chunk_size, decode_content=False
+            )
+        finally:
+            response.close()
+            response.release_conn()
 
     def delete_file(
         self,
@@ -74,3 +232,195 @@ class MinioInitializer:
             bucket_name=minio_bucket,
             object_name=filename,
         )
+        del self._redirect_url_cache[
+            f"{minio_bucket}/{filename}"
+        ]
+
+    def delete_files(
+        self,
+        filenames: list[str],
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> dict[str, str]:
+        """
+        Deletes objects with batch delete requests (up to 1000 objects per request).
+        Returns error messages of objects which were not deleted by object name
+        """
+        errors = (
+            self._minio_client.remove_objects(
+                bucket_name=minio_bucket,
+                delete_object_list=(
+                    DeleteObject(filename)
+                    for filename in filenames
+                ),
+            )
+        )
+        for filename in filenames:
+            del self._redirect_url_cache[
+                f"{minio_bucket}/{filename}"
+            ]
+        return {
+            error.name: f"{error.code}: {error.message}"
+            for error in errors
+        }
+
+    def create_multipart_upload(
+        self,
+        filename: str,
+        content_type: str = "application/octet-stream",
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> str:
+        return self._minio_client._create_multipart_upload(
+            minio_bucket,
+            filename,
+            {"Content-Type": content_type},
+        )
+
+    def upload_part(
+        self,
+        filename: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> str:
+        return self._minio_client._upload_part(
+            bucket_name=minio_bucket,
+            object_name=filename,
+            data=data,
+            headers=None,
+            upload_id=upload_id,
+            part_number=part_number,
+        )
+
+    def complete_multipart_upload(
+        self,
+        filename: str,
+        upload_id: str,
+        parts: list[Part],
+        minio_bucket: str = MINIO_BUCKET,
+    ):
+        return self._minio_client._complete_multipart_upload(
+            minio_bucket,
+            filename,
+            upload_id,
+            parts,
+        )
+
+    def abort_multipart_upload(
+        self,
+        filename: str,
+        upload_id: str,
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> None:
+        try:
+            self._minio_client._abort_multipart_upload(
+                minio_bucket, filename, upload_id
+            )
+        except S3Error as e:
+            if e.code != "NoSuchUpload":
+                raise
+
+    def list_parts(
+        self,
+        filename: str,
+        upload_id: str,
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> list[Part]:
+        parts = []
+        part_number_marker = None
+        while True:
+            result = self._minio_client._list_parts(
+                minio_bucket,
+                filename,
+                upload_id,
+                part_number_marker=part_number_marker,
+            )
+            parts.extend(result.parts)
+            if not result.is_truncated:
+                return parts
+            part_number_marker = (
+                result.next_part_number_marker
+            )
+
+    def get_upload_url(
+        self,
+        filename: str,
+        expires: int = MINIO_PRESIGNED_URL_EXPIRES,
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> str:
+        return (
+            self._minio_client.get_presigned_url(
+                "PUT",
+                bucket_name=minio_bucket,
+                object_name=filename,
+                expires=timedelta(
+                    seconds=expires
+                ),
+            )
+        )
+
+    def get_upload_part_url(
+        self,
+        filename: str,
+        upload_id: str,
+        part_number: int,
+        expires: int = MINIO_PRESIGNED_URL_EXPIRES,
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> str:
+        return (
+            self._minio_client.get_presigned_url(
+                "PUT",
+                bucket_name=minio_bucket,
+                object_name=filename,
+                expires=timedelta(
+                    seconds=expires
+                ),
+                extra_query_params={
+                    "uploadId": upload_id,
+                    "partNumber": str(
+                        part_number
+                    ),
+                },
+            )
+        )
+
+    def stat_file(
+        self,
+        filename: str,
+        minio_bucket: str = MINIO_BUCKET,
+    ) -> Object | None:
+        try:
+            return self._minio_client.stat_object(
+                bucket_name=minio_bucket,
+                object_name=filename,
+            )
+        except S3Error as e:
+            if e.code in (
+                "NoSuchKey",
+                "NoSuchObject",
+            ):
+                return None
+            raise
+
+
+_shared_minio_initializer: (
+    MinioInitializer | None
+) = None
+_shared_minio_initializer_lock = threading.Lock()
+
+
+def get_minio_initializer() -> MinioInitializer:
+    """
+    Returns minio client shared by the whole process. Minio client is thread safe,
+    so it is created once with a tuned connection pool instead of once per request
+    """
+    global _shared_minio_initializer
+
+    if _shared_minio_initializer is None:
+        with _shared_minio_initializer_lock:
+            if _shared_minio_initializer is None:
+                _shared_minio_initializer = MinioInitializer(
+                    http_client=create_http_client()
+                )
+
+    return _shared_minio_initializer
@@ -0,0 +1,4 @@
+# S3 multipart upload limits
+MIN_PART_NUMBER = 1
+MAX_PART_NUMBER = 10000
+MIN_PART_SIZE = 5 * 1024 * 1024
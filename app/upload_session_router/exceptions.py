@@ -0,0 +1,37 @@
+class UploadSessionException(Exception):
+    def __init__(self, detail, status_code=None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+    def __str__(self):
+        if self.status_code:
+            return f"[Error {self.status_code}]: {self.detail}"
+        return self.detail
+
+
+__all__ = ["UploadSessionException"]
+
+
+class UploadSessionDoesNotExists(
+    UploadSessionException
+):
+    pass
+
+
+class PartNumberNotValid(UploadSessionException):
+    pass
+
+
+class PartTooLarge(UploadSessionException):
+    pass
+
+
+class PartTooSmall(UploadSessionException):
+    pass
+
+
+class UploadSessionIncomplete(
+    UploadSessionException
+):
+    pass
@@ -0,0 +1,354 @@
+import datetime
+import logging
+import os
+from uuid import uuid4
+
+from minio.datatypes import Part
+from sqlmodel import Session
+
+from common.initializers import Initializer
+from config.upload_session_config import (
+    UPLOAD_SESSION_TTL,
+)
+from layers_router.processors import (
+    CreateLayerFromObject,
+)
+from layers_router.utils import (
+    get_file_content_type,
+)
+from models import (
+    UploadSession,
+    UploadSessionPart,
+)
+from object_deletion.utils import (
+    enqueue_object_deletions,
+)
+from upload_session_router.constants import (
+    MAX_PART_NUMBER,
+    MIN_PART_NUMBER,
+    MIN_PART_SIZE,
+)
+from upload_session_router.exceptions import (
+    PartNumberNotValid,
+    PartTooSmall,
+    UploadSessionDoesNotExists,
+    UploadSessionIncomplete,
+)
+from upload_session_router.schemas import (
+    UploadSessionCreateRequest,
+)
+from upload_session_router.utils import (
+    upload_session_to_response,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class UploadSessionProcessor(Initializer):
+    def __init__(
+        self,
+        upload_session_id: str,
+        session: Session,
+    ):
+        super().__init__(session=session)
+        self._upload_session_id = (
+            upload_session_id
+        )
+
+        self._upload_session_instance = self._upload_session_db_getter.get_upload_session_instance_by_id(
+            upload_session_id=self._upload_session_id
+        )
+
+    def check(self):
+        if self._upload_session_instance:
+            return
+
+        raise UploadSessionDoesNotExists(
+            status_code=422,
+            detail=f"Upload session with id {self._upload_session_id} does not exists",
+        )
+
+
+class CreateUploadSession(Initializer):
+    def __init__(
+        self,
+        request: UploadSessionCreateRequest,
+        session: Session,
+    ):
+        super().__init__(session=session)
+        self._request = request
+        self._filename = os.path.basename(
+            request.filename
+        )
+
+        self._layer_creator = (
+            CreateLayerFromObject(
+                layer_name=request.layer_name,
+                folder_id=request.folder_id,
+                filename=self._filename,
+                object_name=None,
+                session=session,
+            )
+        )
+
+    def check(self):
+        self._layer_creator.check()
+
+    def execute(self):
+        upload_session_id = uuid4().hex
+        object_name = f"{upload_session_id}/{self._filename}"
+        upload_id = self._minio_client.create_multipart_upload(
+            filename=object_name,
+            content_type=get_file_content_type(
+                self._filename
+            ),
+        )
+
+        new_upload_session = UploadSession(
+            id=upload_session_id,
+            layer_name=self._request.layer_name,
+            folder_id=self._request.folder_id,
+            filename=self._filename,
+            object_name=object_name,
+            upload_id=upload_id,
+            created_by="test_client",
+        )
+        self._session.add(new_upload_session)
+        self._session.flush()
+        response = upload_session_to_response(
+            new_upload_session
+        )
+        self._session.commit()
+
+        return response
+
+
+class GetUploadSession(UploadSessionProcessor):
+    def execute(self):
+        return upload_session_to_response(
+            self._upload_session_instance
+        )
+
+
+class UploadSessionPartUpload(
+    UploadSessionProcessor
+):
+    def __init__(
+        self,
+        upload_session_id: str,
+        part_number: int,
+        data: bytes,
+        session: Session,
+    ):
+        super().__init__(
+            upload_session_id=upload_session_id,
+            session=session,
+        )
+        self._part_number = part_number
+        self._data = data
+
+    def check(self):
+        super().check()
+
+        if not (
+            MIN_PART_NUMBER
+            <= self._part_number
+            <= MAX_PART_NUMBER
+        ):
+            raise PartNumberNotValid(
+                status_code=422,
+                detail=f"Part number must be between {MIN_PART_NUMBER} and {MAX_PART_NUMBER}",
+            )
+
+    async def execute(self):
+        upload_session = (
+            self._upload_session_instance
+        )
+        etag = await self._async_minio_client.upload_part(
+            filename=upload_session.object_name,
+            upload_id=upload_session.upload_id,
+            part_number=self._part_number,
+            data=self._data,
+        )
+
+        self._session.merge(
+            UploadSessionPart(
+                session_id=upload_session.id,
+                part_number=self._part_number,
+                etag=etag,
+                size=len(self._data),
+            )
+        )
+        upload_session.modification_date = (
+            datetime.datetime.utcnow()
+        )
+        self._session.add(upload_session)
+        self._session.flush()
+        self._session.refresh(upload_session)
+        response = upload_session_to_response(
+            upload_session
+        )
+        self._session.commit()
+
+        return response
+
+
+class CompleteUploadSession(
+    UploadSessionProcessor
+):
+    def __init__(
+        self,
+        upload_session_id: str,
+        session: Session,
+    ):
+        super().__init__(
+            upload_session_id=upload_session_id,
+            session=session,
+        )
+        self._layer_creator = None
+        if self._upload_session_instance:
+            self._layer_creator = CreateLayerFromObject(
+                layer_name=self._upload_session_instance.layer_name,
+                folder_id=self._upload_session_instance.folder_id,
+                filename=self._upload_session_instance.filename,
+                object_name=self._upload_session_instance.object_name,
+                session=session,
+                file_size=sum(
+                    part.size
+                    for part in self._upload_session_instance.parts
+                ),
+            )
+
+    def check(self):
+        super().check()
+
+        part_numbers = [
+            part.part_number
+            for part in self._upload_session_instance.parts
+        ]
+        if not part_numbers:
+            raise UploadSessionIncomplete(
+                status_code=422,
+                detail="No parts were uploaded",
+            )
+
+        missing_part_numbers = sorted(
+            set(range(1, max(part_numbers) + 1))
+            - set(part_numbers)
+        )
+        if missing_part_numbers:
+            raise UploadSessionIncomplete(
+                status_code=422,
+                detail=f"Parts {missing_part_numbers} were not uploaded",
+            )
+
+        # storage rejects parts smaller than MIN_PART_SIZE, except the last one
+        small_part_numbers = sorted(
+            part.part_number
+            for part in self._upload_session_instance.parts
+            if part.size < MIN_PART_SIZE
+            and part.part_number
+            != max(part_numbers)
+        )
+        if small_part_numbers:
+            raise PartTooSmall(
+                status_code=422,
+                detail=f"Parts {small_part_numbers} are smaller than {MIN_PART_SIZE} bytes, "
+                "only the last part can be smaller",
+            )
+
+        self._layer_creator.check()
+
+    def _release_completed_object(
+        self, object_name: str
+    ):
+        """
+        Completed multipart upload can't be completed again, so the upload
+        session is deleted and its object is queued for deletion
+        """
+        self._session.rollback()
+        enqueue_object_deletions(
+            session=self._session,
+            object_names=[object_name],
+        )
+        self._session.delete(
+            self._upload_session_instance
+        )
+        self._session.commit()
+
+    async def execute(self):
+        """
+        If the layer is not created after the upload is completed,
+        the completed object is released instead of being orphaned
+        """
+        upload_session = (
+            self._upload_session_instance
+        )
+        object_name = upload_session.object_name
+        await self._async_minio_client.complete_multipart_upload(
+            filename=upload_session.object_name,
+            upload_id=upload_session.upload_id,
+            parts=[
+                Part(part.part_number, part.etag)
+                for part in upload_session.parts
+            ],
+        )
+
+        try:
+            self._session.delete(upload_session)
+            return await self._layer_creator.execute()
+        except Exception:
+            try:
+                self._release_completed_object(
+                    object_name=object_name
+                )
+            except Exception:
+                logger.exception(
+                    "Object %s of completed upload session was not released",
+                    object_name,
+                )
+            raise
+
+
+class DeleteUploadSession(UploadSessionProcessor):
+    def execute(self):
+        upload_session = (
+            self._upload_session_instance
+        )
+        self._minio_client.abort_multipart_upload(
+            filename=upload_session.object_name,
+            upload_id=upload_session.upload_id,
+        )
+
+        self._session.delete(upload_session)
+        self._session.commit()
+
+
+class DeleteExpiredUploadSessions(Initializer):
+    """
+    Aborts multipart uploads of upload sessions which were not modified
+    for UPLOAD_SESSION_TTL seconds and deletes them
+    """
+
+    def execute(self) -> int:
+        modified_before = (
+            datetime.datetime.utcnow()
+            - datetime.timedelta(
+                seconds=UPLOAD_SESSION_TTL
+            )
+        )
+        expired_upload_sessions = self._upload_session_db_getter.get_expired_upload_sessions(
+            modified_before=modified_before
+        )
+
+        for (
+            upload_session
+        ) in expired_upload_sessions:
+            self._minio_client.abort_multipart_upload(
+                filename=upload_session.object_name,
+                upload_id=upload_session.upload_id,
+            )
+            self._session.delete(upload_session)
+            self._session.commit()
+
+        return len(expired_upload_sessions)
@@ -0,0 +1,183 @@
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+)
+from fastapi.requests import Request
+from sqlmodel import Session
+
+from config.upload_session_config import (
+    UPLOAD_SESSION_MAX_PART_SIZE,
+)
+from database import get_session
+from layers_router.exceptions import (
+    LayerException,
+)
+from layers_router.schemas import (
+    LayerCreateResponse,
+)
+from upload_session_router.exceptions import (
+    UploadSessionException,
+)
+from upload_session_router.processors import (
+    CreateUploadSession,
+    GetUploadSession,
+    UploadSessionPartUpload,
+    CompleteUploadSession,
+    DeleteUploadSession,
+)
+from upload_session_router.schemas import (
+    UploadSessionCreateRequest,
+    UploadSessionResponse,
+)
+from upload_session_router.utils import (
+    read_part_body,
+)
+
+router = APIRouter()
+
+
+@router.post(
+    path="/upload_sessions/create_upload_session",
+    tags=["Upload sessions"],
+    response_model=UploadSessionResponse,
+)
+def create_upload_session(
+    upload_session_create_request: UploadSessionCreateRequest,
+    session: Session = Depends(get_session),
+):
+    try:
+        task = CreateUploadSession(
+            request=upload_session_create_request,
+            session=session,
+        )
+        task.check()
+        new_upload_session = task.execute()
+        return new_upload_session
+
+    except (
+        LayerException,
+        UploadSessionException,
+    ) as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
+
+
+@router.get(
+    path="/upload_sessions/get_upload_session/{upload_session_id}",
+    tags=["Upload sessions"],
+    response_model=UploadSessionResponse,
+)
+def get_upload_session(
+    upload_session_id: str,
+    session: Session = Depends(get_session),
+):
+    task = GetUploadSession(
+        upload_session_id=upload_session_id,
+        session=session,
+    )
+
+    try:
+        task.check()
+        upload_session = task.execute()
+        return upload_session
+
+    except UploadSessionException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
+
+
+@router.put(
+    path="/upload_sessions/upload_part/{upload_session_id}",
+    tags=["Upload sessions"],
+    response_model=UploadSessionResponse,
+)
+async def upload_part(
+    upload_session_id: str,
+    part_number: int,
+    request: Request,
+    session: Session = Depends(get_session),
+):
+    """
+    Request body is raw part content. All parts except the last one must be at least 5 MiB
+    """
+    try:
+        data = await read_part_body(
+            request=request,
+            max_size=UPLOAD_SESSION_MAX_PART_SIZE,
+        )
+        task = UploadSessionPartUpload(
+            upload_session_id=upload_session_id,
+            part_number=part_number,
+            data=data,
+            session=session,
+        )
+        task.check()
+        upload_session = await task.execute()
+        return upload_session
+
+    except UploadSessionException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
+
+
+@router.post(
+    path="/upload_sessions/complete_upload_session/{upload_session_id}",
+    tags=["Upload sessions"],
+    response_model=LayerCreateResponse,
+)
+async def complete_upload_session(
+    upload_session_id: str,
+    session: Session = Depends(get_session),
+):
+    task = CompleteUploadSession(
+        upload_session_id=upload_session_id,
+        session=session,
+    )
+
+    try:
+        task.check()
+        new_layer = await task.execute()
+        return new_layer
+
+    except (
+        LayerException,
+        UploadSessionException,
+    ) as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
+
+
+@router.delete(
+    path="/upload_sessions/delete_upload_session/{upload_session_id}",
+    tags=["Upload sessions"],
+)
+def delete_upload_session(
+    upload_session_id: str,
+    session: Session = Depends(get_session),
+):
+    task = DeleteUploadSession(
+        upload_session_id=upload_session_id,
+        session=session,
+    )
+
+    try:
+        task.check()
+        task.execute()
+        return {
+            "status": f"Upload session with id {upload_session_id} was successfully deleted"
+        }
+
+    except UploadSessionException as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+        )
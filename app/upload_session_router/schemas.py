@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel
+
+
+class UploadSessionCreateRequest(BaseModel):
+    layer_name: str
+    folder_id: int | None
+    filename: str
+
+
+class UploadSessionPartResponse(BaseModel):
+    part_number: int
+    etag: str
+    size: int
+
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    layer_name: str
+    folder_id: int | None
+    filename: str
+    created_by: str
+    creation_date: datetime
+    modification_date: datetime
+    received_parts: List[
+        UploadSessionPartResponse
+    ]
+    received_ranges: List[List[int]]
@@ -0,0 +1,25 @@
+from sqlmodel import Session
+
+import database
+from common.periodic import PeriodicTask
+from config.upload_session_config import (
+    UPLOAD_SESSION_GC_INTERVAL,
+)
+from upload_session_router.processors import (
+    DeleteExpiredUploadSessions,
+)
+
+
+def delete_expired_upload_sessions():
+    with Session(database.engine) as session:
+        task = DeleteExpiredUploadSessions(
+            session=session
+        )
+        task.execute()
+
+
+expired_upload_sessions_collector = PeriodicTask(
+    name="expired_upload_sessions_collector",
+    func=delete_expired_upload_sessions,
+    interval=UPLOAD_SESSION_GC_INTERVAL,
+)
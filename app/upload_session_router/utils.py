@@ -0,0 +1,117 @@
+import copy
+from datetime import datetime
+from typing import List
+
+from fastapi.requests import Request
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import (
+    UploadSession,
+    UploadSessionPart,
+)
+from upload_session_router.exceptions import (
+    PartTooLarge,
+)
+
+
+class UploadSessionDatabaseGetter:
+    def __init__(self, session: Session):
+        self._session = session
+
+    def get_upload_session_instance_by_id(
+        self, upload_session_id: str
+    ) -> UploadSession | None:
+        if upload_session_id:
+            query = select(UploadSession).where(
+                UploadSession.id
+                == upload_session_id
+            )
+            upload_session_instance = (
+                self._session.execute(query)
+                .scalars()
+                .first()
+            )
+            return upload_session_instance
+
+        return None
+
+    def get_expired_upload_sessions(
+        self, modified_before: datetime
+    ) -> List[UploadSession]:
+        query = select(UploadSession).where(
+            UploadSession.modification_date
+            < modified_before
+        )
+        return (
+            self._session.execute(query)
+            .scalars()
+            .all()
+        )
+
+
+def get_received_ranges(
+    parts: List[UploadSessionPart],
+) -> List[List[int]]:
+    """
+    Groups received part numbers into [first, last] ranges of consecutive parts,
+    e.g. parts 1, 2, 3, 5 -> [[1, 3], [5, 5]]
+    """
+    received_ranges = []
+    for part_number in sorted(
+        part.part_number for part in parts
+    ):
+        if (
+            received_ranges
+            and received_ranges[-1][1] + 1
+            == part_number
+        ):
+            received_ranges[-1][1] = part_number
+        else:
+            received_ranges.append(
+                [part_number, part_number]
+            )
+    return received_ranges
+
+
+def upload_session_to_response(
+    upload_session: UploadSession,
+) -> dict:
+    upload_session_data = copy.deepcopy(
+        upload_session.dict()
+    )
+    parts = [
+        part.dict()
+        for part in upload_session.parts
+    ]
+    upload_session_data["received_parts"] = parts
+    upload_session_data["received_ranges"] = (
+        get_received_ranges(upload_session.parts)
+    )
+    return upload_session_data
+
+
+async def read_part_body(
+    request: Request, max_size: int
+) -> bytes:
+    content_length = request.headers.get(
+        "content-length"
+    )
+    if (
+        content_length
+        and int(content_length) > max_size
+    ):
+        raise PartTooLarge(
+            status_code=413,
+            detail=f"Part size can't be larger than {max_size} bytes",
+        )
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_size:
+            raise PartTooLarge(
+                status_code=413,
+                detail=f"Part size can't be larger than {max_size} bytes",
+            )
+    return bytes(body)
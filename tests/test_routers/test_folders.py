@@ -1,8 +1,16 @@
+import io
+import json
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from sqlmodel import Session, select
 
-from models import Folder
+from models import (
+    Folder,
+    Layer,
+    LayerBlob,
+    ObjectDeletion,
+)
 
 URL = "/api/layers/v1/folders"
 
@@ -46,6 +54,33 @@ def test_get_folders(
     assert response.json() == expected_response
 
 
+def test_get_folders_not_modified(
+    session: Session, client: TestClient
+):
+    response = client.get(f"{URL}/get_folders")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get(
+        f"{URL}/get_folders",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    response = client.post(
+        f"{URL}/create_folder",
+        json={"name": "new_folder"},
+    )
+    assert response.status_code == 200
+
+    response = client.get(
+        f"{URL}/get_folders",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
 def test_get_folders_without_any_folders(
     session: Session, client: TestClient
 ):
@@ -404,6 +439,76 @@ def test_delete_child_folders_while_and_NOT_deleting_parent(
     assert not session.get(Folder, 3)
 
 
+def test_delete_folder_queues_subtree_layer_objects(
+    session: Session, client: TestClient
+):
+    request = {
+        "name": "child_folder",
+        "parent_id": 1,
+    }
+    response = client.post(
+        f"{URL}/create_folder", json=request
+    )
+    assert response.status_code == 200
+    child_folder_id = response.json()["id"]
+
+    layer_ids = []
+    for layer_name, folder_id, content in (
+        ("parent_layer", 1, "parent"),
+        ("child_layer", child_folder_id, "child"),
+        (
+            "child_layer_copy",
+            child_folder_id,
+            "child",
+        ),
+    ):
+        file = io.BytesIO(
+            json.dumps(
+                {
+                    "type": "FeatureCollection",
+                    "features": [],
+                    "name": content,
+                }
+            ).encode()
+        )
+        file.name = "data.geojson"
+        response = client.post(
+            f"/api/layers/v1/layers/create_layer?layer_name={layer_name}",
+            data={"folder_id": folder_id},
+            files={"file": file},
+        )
+        assert response.status_code == 200
+        layer_ids.append(response.json()["id"])
+
+    object_names = {
+        session.get(Layer, layer_id).object_name
+        for layer_id in layer_ids
+    }
+    assert len(object_names) == 2
+
+    response = client.delete(
+        f"{URL}/delete_folder?folder_id=1"
+    )
+    assert response.status_code == 200
+
+    session.expire_all()
+    assert not session.get(
+        Folder, child_folder_id
+    )
+    assert not session.exec(select(Layer)).all()
+    assert not session.exec(
+        select(LayerBlob)
+    ).all()
+    object_deletions = session.exec(
+        select(ObjectDeletion)
+    ).all()
+    assert {
+        object_deletion.object_name
+        for object_deletion in object_deletions
+    } == object_names
+    assert len(object_deletions) == 2
+
+
 def test_get_child_folders(
     session: Session, client: TestClient
 ):
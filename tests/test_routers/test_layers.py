@@ -1,15 +1,94 @@
+import asyncio
+import email
+import functools
+import hashlib
 import io
 import json
+import struct
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from random import Random
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
 
+import numpy as np
 import pytest
+import requests
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from sqlmodel import Session, select
 
+from common.single_flight import SingleFlight
 from config.test_config import (
     TESTS_MINIO_URL,
     TESTS_MINIO_BUCKET,
 )
-from models import Folder, Layer
+from content_cache.disk_cache import (
+    DiskContentCache,
+)
+from content_cache.memory_cache import (
+    CachedContent,
+    MemoryContentCache,
+    get_memory_content_cache,
+)
+from layers_router.geometry import (
+    clip_line,
+    clip_ring,
+    get_ring_area,
+    simplify_coordinates,
+)
+from layers_router.pmtiles import (
+    PMTilesReader,
+    PMTilesWriter,
+    zxy_to_tile_id,
+)
+from layers_router.processors import (
+    get_shared_layer_with_blob,
+    get_shared_layer_with_blob_etag,
+)
+from layers_router.spatial_index import (
+    SpatialIndex,
+    get_geometry_bbox,
+)
+from layers_router.utils import (
+    LayerDatabaseGetter,
+)
+from link_cache.client import (
+    PublicAddressResolver,
+)
+from link_cache.exceptions import (
+    LinkNotAllowed,
+)
+from models import (
+    Folder,
+    Layer,
+    LayerBlob,
+    LinkCacheEntry,
+    ObjectDeletion,
+    ObjectIngestion,
+)
+from layer_ingest.processors import (
+    IngestQueuedObjects,
+)
+from object_deletion.processors import (
+    DeleteQueuedObjects,
+)
+from object_deletion.utils import (
+    lock_object_names,
+)
+from services.storage_service.async_storage import (
+    AsyncMinioInitializer,
+)
+from services.storage_service.exceptions import (
+    StorageOperationTimeout,
+)
+from services.storage_service.utils import (
+    get_minio_initializer,
+)
 
 URL = "/api/layers/v1/layers"
 
@@ -30,6 +109,13 @@ def generate_geojson_in_memory(default_data=None):
     return file
 
 
+def get_blob_file_link(file) -> str:
+    content_hash = hashlib.sha256(
+        file.getvalue()
+    ).hexdigest()
+    return f"http://{TESTS_MINIO_URL}/{TESTS_MINIO_BUCKET}/blobs/{content_hash}"
+
+
 @pytest.fixture(scope="function", autouse=True)
 def session_fixture(session):
     layer_default_data = {
@@ -179,7 +265,7 @@ def test_create_layer(
     assert response.status_code == 200
     real_response = response.json()
 
-    cut_file_link = f"http://{TESTS_MINIO_URL}/{TESTS_MINIO_BUCKET}/data.geojson"
+    cut_file_link = get_blob_file_link(file)
     assert (
         real_response["file_link"].split("?")[0]
         == cut_file_link
@@ -262,7 +348,7 @@ def test_create_layer_in_folder(
     assert response.status_code == 200
 
     real_response = response.json()
-    cut_file_link = f"http://{TESTS_MINIO_URL}/{TESTS_MINIO_BUCKET}/data.geojson"
+    cut_file_link = get_blob_file_link(file)
 
     assert (
         real_response["file_link"].split("?")[0]
@@ -542,6 +628,46 @@ def test_get_layer_content(
         "features": [],
         "type": "FeatureCollection",
     }
+    assert (
+        response.headers["content-type"]
+        == "application/geo+json"
+    )
+    assert response.headers[
+        "content-length"
+    ] == str(len(file.getvalue()))
+
+
+def test_get_legacy_layer_content(
+    session: Session, client: TestClient
+):
+    # layers created before blobs were introduced are stored by uploaded file name
+    content = json.dumps(
+        {
+            "type": "FeatureCollection",
+            "features": [],
+            "name": "legacy_content",
+        }
+    ).encode()
+    get_minio_initializer().create_file(
+        filename="legacy content.geojson",
+        data_buf=io.BytesIO(content),
+        length=len(content),
+    )
+    legacy_layer = Layer(
+        name="legacy_content_layer",
+        file_link=f"http://{TESTS_MINIO_URL}/{TESTS_MINIO_BUCKET}/legacy%20content.geojson?X-Amz-Expires=604800",
+        created_by="test_client",
+        modified_by="test_client",
+    )
+    session.add(legacy_layer)
+    session.commit()
+
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={legacy_layer.id}"
+    )
+
+    assert response.status_code == 200
+    assert response.content == content
 
 
 def test_get_layer_content_from_server_url(
@@ -604,3 +730,2386 @@ def test_delete_not_exists_layer(
     assert response.json() == {
         "detail": "Layer with id 1111 does not exists"
     }
+
+
+def test_create_layer_by_upload_url(
+    session: Session, client: TestClient
+):
+    response = client.post(
+        f"{URL}/create_layer_upload_url",
+        json={
+            "layer_name": "uploaded_layer",
+            "folder_id": None,
+            "filename": "data.geojson",
+        },
+    )
+    assert response.status_code == 200
+    upload_url = response.json()
+
+    file = generate_geojson_in_memory()
+    upload_response = requests.put(
+        upload_url["upload_url"],
+        data=file.read(),
+        timeout=30,
+    )
+    assert upload_response.status_code == 200
+
+    response = client.post(
+        f"{URL}/complete_layer_upload",
+        json={
+            "layer_name": "uploaded_layer",
+            "folder_id": None,
+            "filename": "data.geojson",
+            "object_name": upload_url[
+                "object_name"
+            ],
+        },
+    )
+    assert response.status_code == 200
+
+    real_response = response.json()
+    cut_file_link = f"http://{TESTS_MINIO_URL}/{TESTS_MINIO_BUCKET}/{upload_url['object_name']}"
+    assert (
+        real_response["file_link"].split("?")[0]
+        == cut_file_link
+    )
+    assert (
+        real_response["name"] == "uploaded_layer"
+    )
+
+
+def test_complete_layer_upload_without_file(
+    session: Session, client: TestClient
+):
+    response = client.post(
+        f"{URL}/create_layer_upload_url",
+        json={
+            "layer_name": "uploaded_layer",
+            "folder_id": None,
+            "filename": "data.geojson",
+        },
+    )
+    assert response.status_code == 200
+    object_name = response.json()["object_name"]
+
+    response = client.post(
+        f"{URL}/complete_layer_upload",
+        json={
+            "layer_name": "uploaded_layer",
+            "folder_id": None,
+            "filename": "data.geojson",
+            "object_name": object_name,
+        },
+    )
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": f"File {object_name} was not uploaded"
+    }
+
+
+def test_create_layers_with_same_file_content(
+    session: Session, client: TestClient
+):
+    layer_ids = []
+    for layer_name in (
+        "first_copy",
+        "second_copy",
+    ):
+        file = generate_geojson_in_memory()
+        response = client.post(
+            f"{URL}/create_layer?layer_name={layer_name}",
+            data={"type": "multipart/form-data"},
+            files={"file": file},
+        )
+        assert response.status_code == 200
+        assert response.json()["file_link"].split(
+            "?"
+        )[0] == get_blob_file_link(file)
+        layer_ids.append(response.json()["id"])
+
+    object_name = session.get(
+        Layer, ident=layer_ids[0]
+    ).object_name
+    blob = session.get(
+        LayerBlob, ident=object_name
+    )
+    assert blob.ref_count == 2
+
+    response = client.delete(
+        f"{URL}/delete_layer?layer_id={layer_ids[0]}"
+    )
+    assert response.status_code == 200
+    session.refresh(blob)
+    assert blob.ref_count == 1
+
+    response = client.delete(
+        f"{URL}/delete_layer?layer_id={layer_ids[1]}"
+    )
+    assert response.status_code == 200
+    session.expire_all()
+    assert not session.get(
+        LayerBlob, ident=object_name
+    )
+
+
+def test_delete_layer_object_by_deletion_queue(
+    session: Session, client: TestClient
+):
+    file = generate_geojson_in_memory()
+    response = client.post(
+        f"{URL}/create_layer?layer_name=queued_layer",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    layer_id = response.json()["id"]
+    object_name = session.get(
+        Layer, ident=layer_id
+    ).object_name
+
+    response = client.delete(
+        f"{URL}/delete_layer?layer_id={layer_id}"
+    )
+    assert response.status_code == 200
+    object_deletion = session.exec(
+        select(ObjectDeletion)
+    ).one()
+    assert (
+        object_deletion.object_name == object_name
+    )
+    assert get_minio_initializer().stat_file(
+        object_name
+    )
+
+    task = DeleteQueuedObjects(session=session)
+    assert task.execute() == 1
+    assert not session.exec(
+        select(ObjectDeletion)
+    ).all()
+    assert not get_minio_initializer().stat_file(
+        object_name
+    )
+
+
+def test_delete_legacy_layer_object(
+    session: Session, client: TestClient
+):
+    # layers created before blobs were introduced are stored by uploaded file name
+    legacy_layer = Layer(
+        name="legacy_layer",
+        file_link=f"http://{TESTS_MINIO_URL}/{TESTS_MINIO_BUCKET}/legacy%20data.geojson?X-Amz-Expires=604800",
+        created_by="test_client",
+        modified_by="test_client",
+    )
+    session.add(legacy_layer)
+    session.commit()
+
+    response = client.delete(
+        f"{URL}/delete_layer?layer_id={legacy_layer.id}"
+    )
+    assert response.status_code == 200
+    object_deletion = session.exec(
+        select(ObjectDeletion)
+    ).one()
+    assert (
+        object_deletion.object_name
+        == "legacy data.geojson"
+    )
+
+
+def test_delete_shared_legacy_layer_object(
+    session: Session, client: TestClient
+):
+    # legacy layers uploaded with equal file names share one object
+    legacy_layers = [
+        Layer(
+            name=f"shared_legacy_layer_{index}",
+            file_link=f"http://{TESTS_MINIO_URL}/{TESTS_MINIO_BUCKET}/shared%20data.geojson?X-Amz-Expires={index}",
+            created_by="test_client",
+            modified_by="test_client",
+        )
+        for index in range(2)
+    ]
+    session.add_all(legacy_layers)
+    session.commit()
+    layer_ids = [
+        legacy_layer.id
+        for legacy_layer in legacy_layers
+    ]
+
+    response = client.delete(
+        f"{URL}/delete_layer?layer_id={layer_ids[0]}"
+    )
+    assert response.status_code == 200
+    assert not session.exec(
+        select(ObjectDeletion)
+    ).all()
+
+    response = client.delete(
+        f"{URL}/delete_layer?layer_id={layer_ids[1]}"
+    )
+    assert response.status_code == 200
+    object_deletion = session.exec(
+        select(ObjectDeletion)
+    ).one()
+    assert (
+        object_deletion.object_name
+        == "shared data.geojson"
+    )
+
+
+def test_queued_object_deletion_canceled_by_new_reference(
+    session: Session, client: TestClient
+):
+    file = generate_geojson_in_memory()
+    response = client.post(
+        f"{URL}/create_layer?layer_name=deleted_layer",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    layer_id = response.json()["id"]
+    object_name = session.get(
+        Layer, ident=layer_id
+    ).object_name
+    response = client.delete(
+        f"{URL}/delete_layer?layer_id={layer_id}"
+    )
+    assert response.status_code == 200
+    assert session.exec(
+        select(ObjectDeletion)
+    ).all()
+
+    file.seek(0)
+    response = client.post(
+        f"{URL}/create_layer?layer_name=recreated_layer",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    session.expire_all()
+    assert not session.exec(
+        select(ObjectDeletion)
+    ).all()
+
+    task = DeleteQueuedObjects(session=session)
+    assert task.execute() == 0
+    assert get_minio_initializer().stat_file(
+        object_name
+    )
+
+
+def test_queued_object_deletion_postponed_while_referenced(
+    session: Session,
+    client: TestClient,
+    engine,
+):
+    file = generate_geojson_in_memory()
+    response = client.post(
+        f"{URL}/create_layer?layer_name=deleted_layer",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    layer_id = response.json()["id"]
+    object_name = session.get(
+        Layer, ident=layer_id
+    ).object_name
+    response = client.delete(
+        f"{URL}/delete_layer?layer_id={layer_id}"
+    )
+    assert response.status_code == 200
+
+    with Session(bind=engine) as other_session:
+        lock_object_names(
+            session=other_session,
+            object_names=[object_name],
+        )
+        task = DeleteQueuedObjects(
+            session=session
+        )
+        assert task.execute() == 1
+        other_session.rollback()
+
+    assert get_minio_initializer().stat_file(
+        object_name
+    )
+    session.expire_all()
+    object_deletion = session.exec(
+        select(ObjectDeletion)
+    ).one()
+    assert object_deletion.attempts == 0
+    assert (
+        object_deletion.next_attempt_date
+        > object_deletion.creation_date
+    )
+
+
+def test_get_compressed_layer_content(
+    session: Session, client: TestClient
+):
+    file = generate_geojson_in_memory()
+
+    response = client.post(
+        f"{URL}/create_layer?layer_name={file.name}",
+        data={
+            "type": "multipart/form-data",
+            "compress": True,
+        },
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    layer_id = response.json()["id"]
+    assert (
+        session.get(
+            Layer, ident=layer_id
+        ).content_encoding
+        == "gzip"
+    )
+
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}",
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    assert (
+        response.headers["content-encoding"]
+        == "gzip"
+    )
+    assert response.json() == {
+        "features": [],
+        "type": "FeatureCollection",
+    }
+
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}",
+        headers={"Accept-Encoding": "identity"},
+    )
+    assert response.status_code == 200
+    assert (
+        "content-encoding" not in response.headers
+    )
+    assert response.json() == {
+        "features": [],
+        "type": "FeatureCollection",
+    }
+
+
+def test_get_layer_content_ranges(
+    session: Session, client: TestClient
+):
+    file = generate_geojson_in_memory()
+    content = file.getvalue()
+    response = client.post(
+        f"{URL}/create_layer?layer_name=ranged_layer",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    content_url = f"{URL}/get_layer_content?layer_id={response.json()['id']}"
+
+    response = client.get(content_url)
+    assert (
+        response.headers["accept-ranges"]
+        == "bytes"
+    )
+    etag = response.headers["etag"]
+
+    response = client.get(
+        content_url,
+        headers={"Range": "bytes=2-9"},
+    )
+    assert response.status_code == 206
+    assert response.content == content[2:10]
+    assert (
+        response.headers["content-range"]
+        == f"bytes 2-9/{len(content)}"
+    )
+
+    response = client.get(
+        content_url,
+        headers={"Range": "bytes=0-1, -5"},
+    )
+    assert response.status_code == 206
+    content_type, boundary = response.headers[
+        "content-type"
+    ].split("; boundary=")
+    assert content_type == "multipart/byteranges"
+    assert response.headers[
+        "content-length"
+    ] == str(len(response.content))
+    parts = response.content.split(
+        f"--{boundary}".encode()
+    )
+    assert parts[0] == b""
+    assert parts[-1] == b"--\r\n"
+    assert parts[1].endswith(
+        b"\r\n\r\n" + content[:2] + b"\r\n"
+    )
+    assert (
+        f"Content-Range: bytes 0-1/{len(content)}".encode()
+        in parts[1]
+    )
+    assert parts[2].endswith(
+        b"\r\n\r\n" + content[-5:] + b"\r\n"
+    )
+
+    response = client.get(
+        content_url,
+        headers={
+            "Range": f"bytes={len(content)}-"
+        },
+    )
+    assert response.status_code == 416
+    assert (
+        response.headers["content-range"]
+        == f"bytes */{len(content)}"
+    )
+
+    response = client.get(
+        content_url,
+        headers={
+            "Range": "bytes=2-9",
+            "If-Range": etag,
+        },
+    )
+    assert response.status_code == 206
+
+    response = client.get(
+        content_url,
+        headers={
+            "Range": "bytes=2-9",
+            "If-Range": '"changed"',
+        },
+    )
+    assert response.status_code == 200
+    assert response.content == content
+
+
+def test_get_layer_content_not_modified(
+    session: Session, client: TestClient
+):
+    response = client.post(
+        f"{URL}/create_layer?layer_name=cached_layer",
+        data={"type": "multipart/form-data"},
+        files={
+            "file": generate_geojson_in_memory()
+        },
+    )
+    assert response.status_code == 200
+    content_url = f"{URL}/get_layer_content?layer_id={response.json()['id']}"
+
+    response = client.get(content_url)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    last_modified = response.headers[
+        "last-modified"
+    ]
+    assert etag.startswith('"')
+
+    response = client.get(
+        content_url,
+        headers={
+            "If-None-Match": f'"other", {etag}'
+        },
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    response = client.get(
+        content_url,
+        headers={
+            "If-Modified-Since": last_modified
+        },
+    )
+    assert response.status_code == 304
+
+    response = client.get(
+        content_url,
+        headers={
+            "If-None-Match": '"other"',
+            "If-Modified-Since": last_modified,
+        },
+    )
+    assert response.status_code == 200
+
+
+def test_get_layer_content_redirect(
+    session: Session, client: TestClient
+):
+    file = generate_geojson_in_memory()
+    response = client.post(
+        f"{URL}/create_layer?layer_name=redirected_layer",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    content_url = f"{URL}/get_layer_content?layer_id={response.json()['id']}&delivery=redirect"
+
+    response = client.get(
+        content_url, follow_redirects=False
+    )
+    assert response.status_code == 307
+    redirect_url = response.headers["location"]
+    assert redirect_url.startswith(
+        f"{get_blob_file_link(file)}?"
+    )
+
+    response = client.get(
+        content_url, follow_redirects=False
+    )
+    assert response.status_code == 307
+    assert (
+        response.headers["location"]
+        == redirect_url
+    )
+
+    response = requests.get(
+        redirect_url, timeout=10
+    )
+    assert response.status_code == 200
+    assert response.content == file.getvalue()
+
+
+def test_get_layer_content_from_memory_cache(
+    session: Session, client: TestClient
+):
+    get_memory_content_cache().clear()
+    file = generate_geojson_in_memory()
+    response = client.post(
+        f"{URL}/create_layer?layer_name=cached_layer",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    layer_id = response.json()["id"]
+    content_url = f"{URL}/get_layer_content?layer_id={layer_id}"
+
+    stats = client.get(
+        f"{URL}/get_content_cache_stats"
+    ).json()["memory"]
+
+    response = client.get(content_url)
+    assert response.status_code == 200
+    assert response.content == file.getvalue()
+
+    response = client.get(
+        content_url,
+        headers={"Range": "bytes=1-4"},
+    )
+    assert response.status_code == 206
+    assert (
+        response.content == file.getvalue()[1:5]
+    )
+
+    cached_stats = client.get(
+        f"{URL}/get_content_cache_stats"
+    ).json()["memory"]
+    assert (
+        cached_stats["misses"]
+        == stats["misses"] + 1
+    )
+    assert (
+        cached_stats["hits"] == stats["hits"] + 1
+    )
+    assert cached_stats["items"] == 1
+    assert cached_stats["size"] == len(
+        file.getvalue()
+    )
+
+    response = client.delete(
+        f"{URL}/delete_layer?layer_id={layer_id}"
+    )
+    assert response.status_code == 200
+
+    stats = client.get(
+        f"{URL}/get_content_cache_stats"
+    ).json()["memory"]
+    assert stats["items"] == 0
+    assert stats["size"] == 0
+
+
+def test_get_layer_content_from_disk_cache(
+    session: Session, client: TestClient, mocker
+):
+    mocker.patch.object(
+        get_memory_content_cache(),
+        "is_cacheable",
+        return_value=False,
+    )
+    file = generate_geojson_in_memory(
+        {
+            "type": "FeatureCollection",
+            "features": [],
+            "name": "disk_cached_layer",
+        }
+    )
+    response = client.post(
+        f"{URL}/create_layer?layer_name=disk_cached_layer",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    content_url = f"{URL}/get_layer_content?layer_id={response.json()['id']}"
+
+    stats = client.get(
+        f"{URL}/get_content_cache_stats"
+    ).json()["disk"]
+
+    response = client.get(content_url)
+    assert response.status_code == 200
+    assert response.content == file.getvalue()
+    assert (
+        response.headers["content-type"]
+        == "application/geo+json"
+    )
+    assert response.headers["etag"].startswith(
+        '"'
+    )
+
+    response = client.get(
+        content_url, headers={"Range": "bytes=-3"}
+    )
+    assert response.status_code == 206
+    assert (
+        response.content == file.getvalue()[-3:]
+    )
+
+    cached_stats = client.get(
+        f"{URL}/get_content_cache_stats"
+    ).json()["disk"]
+    assert (
+        cached_stats["misses"]
+        == stats["misses"] + 1
+    )
+    assert (
+        cached_stats["hits"] == stats["hits"] + 1
+    )
+
+
+def test_disk_content_cache_eviction(tmp_path):
+    content_cache = DiskContentCache(
+        directory=str(tmp_path),
+        max_size=10,
+        max_item_size=6,
+    )
+    for object_name in ("first", "second"):
+        content_cache.put(
+            object_name=object_name,
+            etag="etag",
+            content_type=None,
+            chunks=[b"123", b"45"],
+        )
+    assert content_cache.get(
+        object_name="first", etag="etag"
+    )
+    cached_file = content_cache.put(
+        object_name="third",
+        etag="etag",
+        content_type="text/plain",
+        chunks=[b"12345"],
+    )
+
+    assert not content_cache.get(
+        object_name="second", etag="etag"
+    )
+    assert (
+        b"".join(
+            cached_file.get_chunks(
+                offset=1, length=3, chunk_size=2
+            )
+        )
+        == b"234"
+    )
+    assert (
+        content_cache.get_stats()["evictions"]
+        == 1
+    )
+    assert len(list(tmp_path.rglob("*"))) == 3
+
+    content_cache.close()
+    assert not list(tmp_path.iterdir())
+
+
+def test_disk_content_cache_evicted_file_readable(
+    tmp_path,
+):
+    content_cache = DiskContentCache(
+        directory=str(tmp_path),
+        max_size=6,
+        max_item_size=6,
+    )
+    content_cache.put(
+        object_name="first",
+        etag="etag",
+        content_type=None,
+        chunks=[b"12345"],
+    )
+    cached_file = content_cache.get(
+        object_name="first", etag="etag"
+    )
+    content_cache.put(
+        object_name="second",
+        etag="etag",
+        content_type=None,
+        chunks=[b"67890"],
+    )
+
+    assert not content_cache.get(
+        object_name="first", etag="etag"
+    )
+    assert (
+        b"".join(cached_file.get_chunks())
+        == b"12345"
+    )
+    cached_file.close()
+    content_cache.close()
+
+
+def test_disk_content_cache_caching_chunks(
+    tmp_path,
+):
+    content_cache = DiskContentCache(
+        directory=str(tmp_path),
+        max_size=10,
+        max_item_size=10,
+    )
+    chunks = content_cache.get_caching_chunks(
+        object_name="partial",
+        etag="etag",
+        content_type=None,
+        chunks=[b"123", b"45"],
+    )
+    assert next(chunks) == b"123"
+    chunks.close()
+    assert not content_cache.get(
+        object_name="partial", etag="etag"
+    )
+
+    assert (
+        b"".join(
+            content_cache.get_caching_chunks(
+                object_name="whole",
+                etag="etag",
+                content_type="text/plain",
+                chunks=[b"123", b"45"],
+            )
+        )
+        == b"12345"
+    )
+    cached_file = content_cache.get(
+        object_name="whole", etag="etag"
+    )
+    assert cached_file.size == 5
+    assert (
+        b"".join(cached_file.get_chunks())
+        == b"12345"
+    )
+    cached_file.close()
+    assert len(list(tmp_path.rglob("*"))) == 2
+    content_cache.close()
+
+
+def test_memory_content_cache_eviction():
+    content_cache = MemoryContentCache(
+        max_size=10, max_item_size=6
+    )
+    for layer_id in range(3):
+        content_cache.put(
+            layer_id=layer_id,
+            etag="etag",
+            cached_content=CachedContent(
+                content=b"12345",
+                content_type=None,
+            ),
+        )
+    content_cache.put(
+        layer_id=4,
+        etag="etag",
+        cached_content=CachedContent(
+            content=b"1234567", content_type=None
+        ),
+    )
+
+    assert not content_cache.get(
+        layer_id=0, etag="etag"
+    )
+    assert content_cache.get(
+        layer_id=2, etag="etag"
+    )
+    assert not content_cache.get(
+        layer_id=4, etag="etag"
+    )
+    assert content_cache.get_stats() == {
+        "hits": 1,
+        "misses": 2,
+        "evictions": 1,
+        "items": 2,
+        "size": 10,
+        "max_size": 10,
+    }
+
+
+def test_shared_layer_instances_detached(
+    session: Session, client: TestClient
+):
+    file = generate_geojson_in_memory()
+    response = client.post(
+        f"{URL}/create_layer?layer_name=shared_layer",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    layer_id = response.json()["id"]
+
+    layer_db_getter = LayerDatabaseGetter(
+        session=session
+    )
+    (
+        layer,
+        etag,
+    ) = layer_db_getter.get_layer_instance_with_blob_etag(
+        layer_id=layer_id
+    )
+    assert etag
+    assert layer not in session
+    (
+        layer,
+        layer_blob,
+    ) = layer_db_getter.get_layer_instance_with_blob(
+        layer_id=layer_id
+    )
+    assert layer not in session
+    assert layer_blob not in session
+    assert (
+        layer.object_name
+        == layer_blob.object_name
+    )
+
+    # shared lookups don't use the session of the request
+    layer, shared_etag = (
+        get_shared_layer_with_blob_etag(
+            layer_id=layer_id
+        )
+    )
+    assert layer.id == layer_id
+    assert shared_etag == etag
+    layer, layer_blob = (
+        get_shared_layer_with_blob(
+            layer_id=layer_id
+        )
+    )
+    assert layer_blob.etag == etag
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value == "failed":
+            raise ValueError(value)
+        return value
+
+    async def run_concurrently():
+        results = await asyncio.gather(
+            *(
+                single_flight.run(
+                    key="layer",
+                    func=lambda: fetch("layer"),
+                )
+                for _ in range(10)
+            ),
+            *(
+                single_flight.run(
+                    key="failed",
+                    func=lambda: fetch("failed"),
+                )
+                for _ in range(3)
+            ),
+            return_exceptions=True,
+        )
+        assert not len(single_flight)
+        return results
+
+    results = asyncio.run(run_concurrently())
+
+    assert calls == ["layer", "failed"]
+    assert results[:10] == ["layer"] * 10
+    assert all(
+        isinstance(result, ValueError)
+        for result in results[10:]
+    )
+
+
+class LinkServerHandler(BaseHTTPRequestHandler):
+    content = json.dumps(
+        {
+            "type": "FeatureCollection",
+            "features": [],
+        }
+    ).encode()
+    cache_control = {
+        "/cached.geojson": "max-age=60",
+        "/revalidated.geojson": "no-cache",
+        "/private.geojson": "no-store",
+    }
+    statuses: list[tuple[str, int]] = []
+
+    def do_GET(self):
+        if self.path == "/redirect.geojson":
+            self.statuses.append((self.path, 302))
+            self.send_response(302)
+            self.send_header(
+                "Location",
+                f"http://127.0.0.2:{self.server.server_port}/cached.geojson",
+            )
+            self.end_headers()
+            return
+
+        if self.path not in self.cache_control:
+            self.statuses.append((self.path, 404))
+            self.send_error(404)
+            return
+
+        status = (
+            304
+            if self.headers.get("If-None-Match")
+            == '"v1"'
+            else 200
+        )
+        self.statuses.append((self.path, status))
+        self.send_response(status)
+        self.send_header("ETag", '"v1"')
+        self.send_header(
+            "Cache-Control",
+            self.cache_control[self.path],
+        )
+        if status == 304:
+            self.end_headers()
+            return
+
+        self.send_header(
+            "Content-Type", "application/geo+json"
+        )
+        self.send_header(
+            "Content-Length",
+            str(len(self.content)),
+        )
+        self.end_headers()
+        self.wfile.write(self.content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def link_server(mocker):
+    mocker.patch(
+        "link_cache.client.LINK_CACHE_ALLOWED_HOSTS",
+        new={"127.0.0.1"},
+    )
+    LinkServerHandler.statuses = []
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), LinkServerHandler
+    )
+    thread = threading.Thread(
+        target=server.serve_forever, daemon=True
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def create_server_link_layer(
+    client: TestClient, server_link: str
+) -> int:
+    response = client.post(
+        f"{URL}/create_layer?layer_name={server_link}",
+        data={
+            "server_link": server_link,
+            "type": "multipart/form-data",
+        },
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_get_layer_content_fetched_from_link_cache(
+    session: Session,
+    client: TestClient,
+    link_server,
+):
+    layer_id = create_server_link_layer(
+        client, f"{link_server}/cached.geojson"
+    )
+    content_url = f"{URL}/get_layer_content?layer_id={layer_id}&delivery=fetch"
+
+    for _ in range(2):
+        response = client.get(content_url)
+        assert response.status_code == 200
+        assert (
+            response.content
+            == LinkServerHandler.content
+        )
+        assert (
+            response.headers["content-type"]
+            == "application/geo+json"
+        )
+
+    assert LinkServerHandler.statuses == [
+        ("/cached.geojson", 200)
+    ]
+
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}"
+    )
+    assert (
+        response.text
+        == f"{link_server}/cached.geojson"
+    )
+
+    response = client.delete(
+        f"{URL}/delete_layer?layer_id={layer_id}"
+    )
+    assert response.status_code == 200
+    assert not session.exec(
+        select(LinkCacheEntry)
+    ).all()
+    assert (
+        session.exec(select(ObjectDeletion))
+        .one()
+        .object_name.startswith("links/")
+    )
+
+
+def test_get_layer_content_revalidated_by_link(
+    session: Session,
+    client: TestClient,
+    link_server,
+):
+    layer_id = create_server_link_layer(
+        client,
+        f"{link_server}/revalidated.geojson",
+    )
+    content_url = f"{URL}/get_layer_content?layer_id={layer_id}&delivery=fetch"
+
+    for _ in range(2):
+        response = client.get(content_url)
+        assert response.status_code == 200
+        assert (
+            response.content
+            == LinkServerHandler.content
+        )
+
+    assert LinkServerHandler.statuses == [
+        ("/revalidated.geojson", 200),
+        ("/revalidated.geojson", 304),
+    ]
+
+
+def test_get_layer_content_not_cached_link(
+    session: Session,
+    client: TestClient,
+    link_server,
+):
+    layer_id = create_server_link_layer(
+        client, f"{link_server}/private.geojson"
+    )
+
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}&delivery=fetch",
+        follow_redirects=False,
+    )
+    assert response.status_code == 307
+    assert (
+        response.headers["location"]
+        == f"{link_server}/private.geojson"
+    )
+    assert not session.exec(
+        select(LinkCacheEntry)
+    ).all()
+
+    layer_id = create_server_link_layer(
+        client, f"{link_server}/missing.geojson"
+    )
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}&delivery=fetch",
+    )
+    assert response.status_code == 502
+
+
+def test_get_layer_content_from_not_allowed_link(
+    session: Session,
+    client: TestClient,
+    link_server,
+    mocker,
+):
+    layer_id = create_server_link_layer(
+        client, f"{link_server}/redirect.geojson"
+    )
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}&delivery=fetch",
+    )
+    assert response.status_code == 422
+    assert LinkServerHandler.statuses == [
+        ("/redirect.geojson", 302)
+    ]
+
+    mocker.patch(
+        "link_cache.client.LINK_CACHE_ALLOWED_HOSTS",
+        new=set(),
+    )
+    layer_id = create_server_link_layer(
+        client, f"{link_server}/cached.geojson"
+    )
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}&delivery=fetch",
+    )
+    assert response.status_code == 422
+    assert len(LinkServerHandler.statuses) == 1
+    assert not session.exec(
+        select(LinkCacheEntry)
+    ).all()
+
+    async def resolve_localhost():
+        return (
+            await PublicAddressResolver().resolve(
+                "localhost"
+            )
+        )
+
+    with pytest.raises(LinkNotAllowed):
+        asyncio.run(resolve_localhost())
+
+
+def create_batch_layers(client: TestClient):
+    contents = {}
+    for layer_name, compress in (
+        ("plain_layer", False),
+        ("compressed_layer", True),
+    ):
+        file = generate_geojson_in_memory(
+            {
+                "type": "FeatureCollection",
+                "features": [],
+                "name": layer_name,
+            }
+        )
+        response = client.post(
+            f"{URL}/create_layer?layer_name={layer_name}",
+            data={
+                "type": "multipart/form-data",
+                "compress": compress,
+            },
+            files={"file": file},
+        )
+        assert response.status_code == 200
+        contents[response.json()["id"]] = (
+            file.getvalue()
+        )
+
+    response = client.post(
+        f"{URL}/create_layer?layer_name=link_layer",
+        data={
+            "server_link": "https://google.com",
+            "type": "multipart/form-data",
+        },
+    )
+    assert response.status_code == 200
+    contents[response.json()["id"]] = (
+        b"https://google.com"
+    )
+    return contents
+
+
+def test_get_layers_content_multipart(
+    session: Session, client: TestClient
+):
+    contents = create_batch_layers(client)
+    layer_ids = list(reversed(contents))
+
+    response = client.get(
+        f"{URL}/get_layers_content",
+        params={"layer_ids": layer_ids},
+    )
+    assert response.status_code == 200
+    content_type = response.headers[
+        "content-type"
+    ]
+    assert content_type.startswith(
+        "multipart/mixed; boundary="
+    )
+
+    message = email.message_from_bytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode()
+        + response.content
+    )
+    parts = message.get_payload()
+    assert [
+        part["Content-ID"] for part in parts
+    ] == [
+        f"<layer-{layer_id}>"
+        for layer_id in layer_ids
+    ]
+    assert [
+        part.get_payload(decode=True)
+        for part in parts
+    ] == [
+        contents[layer_id]
+        for layer_id in layer_ids
+    ]
+    assert (
+        parts[-1]["Content-Type"]
+        == "application/geo+json"
+    )
+
+
+def test_get_layers_content_frames(
+    session: Session, client: TestClient
+):
+    contents = create_batch_layers(client)
+
+    response = client.get(
+        f"{URL}/get_layers_content",
+        params={
+            "layer_ids": list(contents),
+            "format": "frames",
+        },
+    )
+    assert response.status_code == 200
+
+    received_contents = {}
+    finished_layer_ids = []
+    data = response.content
+    while data:
+        layer_id, length = struct.unpack(
+            ">II", data[:8]
+        )
+        payload, data = (
+            data[8 : 8 + length],
+            data[8 + length :],
+        )
+        if not length:
+            finished_layer_ids.append(layer_id)
+            continue
+        received_contents[layer_id] = (
+            received_contents.get(layer_id, b"")
+            + payload
+        )
+
+    assert finished_layer_ids == list(contents)
+    assert received_contents == contents
+
+
+def test_get_layers_content_not_exists_layers(
+    session: Session, client: TestClient
+):
+    response = client.get(
+        f"{URL}/get_layers_content",
+        params={"layer_ids": [1, 100, 101]},
+    )
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": "Layers with ids [100, 101] do not exist"
+    }
+
+
+def create_point_features(count: int):
+    return [
+        {
+            "type": "Feature",
+            "id": i,
+            "properties": {"name": f"point {i}"},
+            "geometry": {
+                "type": "Point",
+                "coordinates": [i % 20, i // 20],
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def test_get_layer_features(
+    session: Session, client: TestClient
+):
+    features = create_point_features(400) + [
+        {
+            "type": "Feature",
+            "id": "line",
+            "properties": {},
+            "geometry": {
+                "type": "LineString",
+                "coordinates": [[-5, 1], [-1, 1]],
+            },
+        },
+        {
+            "type": "Feature",
+            "id": "empty",
+            "properties": {},
+            "geometry": None,
+        },
+    ]
+    file = generate_geojson_in_memory(
+        {
+            "type": "FeatureCollection",
+            "features": features,
+        }
+    )
+    response = client.post(
+        f"{URL}/create_layer?layer_name=points",
+        data={
+            "type": "multipart/form-data",
+            "compress": True,
+        },
+        files={"file": file},
+    )
+    layer_id = response.json()["id"]
+
+    for _ in range(2):
+        response = client.get(
+            f"{URL}/{layer_id}/features",
+            params={"bbox": "-2,0.5,2.5,2"},
+        )
+        assert response.status_code == 200
+        assert (
+            response.headers["content-type"]
+            == "application/geo+json"
+        )
+        collection = response.json()
+        assert collection["type"] == (
+            "FeatureCollection"
+        )
+        assert sorted(
+            feature["id"]
+            for feature in collection["features"]
+            if feature["id"] != "line"
+        ) == [20, 21, 22, 40, 41, 42]
+        assert "line" in [
+            feature["id"]
+            for feature in collection["features"]
+        ]
+
+    response = client.get(
+        f"{URL}/{layer_id}/features",
+        params={"bbox": "100,100,200,200"},
+    )
+    assert response.json()["features"] == []
+
+    object_name = session.exec(
+        select(Layer.object_name).where(
+            Layer.id == layer_id
+        )
+    ).one()
+    assert get_minio_initializer().stat_file(
+        filename=f"{object_name}.rtree"
+    )
+
+
+def test_get_layer_features_not_valid(
+    session: Session, client: TestClient
+):
+    response = client.get(
+        f"{URL}/1/features",
+        params={"bbox": "1,2,3"},
+    )
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": "bbox has to be min_x,min_y,max_x,max_y"
+    }
+
+    file = io.BytesIO(b"<kml></kml>")
+    file.name = "data.kml"
+    response = client.post(
+        f"{URL}/create_layer?layer_name=data.kml",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    layer_id = response.json()["id"]
+    response = client.get(
+        f"{URL}/{layer_id}/features",
+        params={"bbox": "0,0,1,1"},
+    )
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": f"Layer with id {layer_id} is not a geojson layer"
+    }
+
+
+def test_spatial_index_search():
+    random = Random(1)
+    features = []
+    for i in range(1000):
+        x, y = (
+            random.uniform(-180, 170),
+            random.uniform(-90, 80),
+        )
+        features.append(
+            {
+                "type": "Feature",
+                "id": i,
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [
+                        [
+                            [x, y],
+                            [
+                                x
+                                + random.uniform(
+                                    0, 10
+                                ),
+                                y,
+                            ],
+                            [
+                                x,
+                                y
+                                + random.uniform(
+                                    0, 10
+                                ),
+                            ],
+                            [x, y],
+                        ]
+                    ],
+                },
+            }
+        )
+    boxes = [
+        get_geometry_bbox(feature["geometry"])
+        for feature in features
+    ]
+    index, features_data = SpatialIndex.build(
+        features=features, node_size=8
+    )
+    stored = index.to_bytes() + b"".join(
+        features_data
+    )
+    stored_index = SpatialIndex.from_stored(
+        read_range=lambda offset, length: stored[
+            offset : offset + length
+        ]
+    )
+
+    for min_x, min_y in ((0, 0), (-100, 20)):
+        max_x, max_y = min_x + 30, min_y + 15
+        expected_ids = sorted(
+            feature["id"]
+            for feature, (
+                feature_min_x,
+                feature_min_y,
+                feature_max_x,
+                feature_max_y,
+            ) in zip(features, boxes)
+            if feature_min_x <= max_x
+            and feature_min_y <= max_y
+            and feature_max_x >= min_x
+            and feature_max_y >= min_y
+        )
+        positions = stored_index.search(
+            min_x, min_y, max_x, max_y
+        )
+        found_ids = []
+        for (
+            start,
+            end,
+            range_positions,
+        ) in stored_index.get_feature_ranges(
+            positions=positions, max_gap=256
+        ):
+            for position in range_positions:
+                found_ids.append(
+                    json.loads(
+                        stored_index.get_feature(
+                            data=stored[
+                                start:end
+                            ],
+                            data_offset=start,
+                            position=position,
+                        )
+                    )["id"]
+                )
+        assert expected_ids
+        assert sorted(found_ids) == expected_ids
+
+
+def decode_protobuf(data: bytes) -> dict:
+    """
+    Fields of protobuf message by number, length delimited fields are left as bytes
+    """
+    fields = {}
+    offset = 0
+
+    def read_varint():
+        nonlocal offset
+        value = shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value
+
+    while offset < len(data):
+        key = read_varint()
+        if key & 7 == 0:
+            value = read_varint()
+        elif key & 7 == 1:
+            value = data[offset : offset + 8]
+            offset += 8
+        else:
+            length = read_varint()
+            value = data[offset : offset + length]
+            offset += length
+        fields.setdefault(key >> 3, []).append(
+            value
+        )
+    return fields
+
+
+def decode_packed(data: bytes) -> list[int]:
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append(value)
+            value = shift = 0
+    return values
+
+
+def test_get_layer_tile(
+    session: Session, client: TestClient
+):
+    file = generate_geojson_in_memory(
+        {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "id": 7,
+                    "properties": {
+                        "name": "square",
+                        "level": 3,
+                    },
+                    "geometry": {
+                        "type": "Polygon",
+                        "coordinates": [
+                            [
+                                [10, 10],
+                                [10, 60],
+                                [60, 60],
+                                [60, 10],
+                                [10, 10],
+                            ]
+                        ],
+                    },
+                },
+                {
+                    "type": "Feature",
+                    "properties": {
+                        "name": "point"
+                    },
+                    "geometry": {
+                        "type": "Point",
+                        "coordinates": [
+                            -100,
+                            -40,
+                        ],
+                    },
+                },
+            ],
+        }
+    )
+    response = client.post(
+        f"{URL}/create_layer?layer_name=tiles",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    layer_id = response.json()["id"]
+
+    for _ in range(2):
+        response = client.get(
+            f"{URL}/{layer_id}/tiles/1/1/0.mvt"
+        )
+        assert response.status_code == 200
+        assert (
+            response.headers["content-type"]
+            == "application/vnd.mapbox-vector-tile"
+        )
+        (layer,) = decode_protobuf(
+            response.content
+        )[3]
+        layer = decode_protobuf(layer)
+        assert layer[15] == [2]
+        assert layer[1] == [b"features"]
+        assert layer[5] == [4096]
+        assert layer[3] == [b"name", b"level"]
+
+        (feature,) = layer[2]
+        feature = decode_protobuf(feature)
+        assert feature[1] == [7]
+        assert feature[3] == [3]
+        geometry = decode_packed(feature[4][0])
+        # MoveTo(1), LineTo(3), ClosePath(1)
+        assert geometry[0] == 1 | 1 << 3
+        assert geometry[3] == 2 | 3 << 3
+        assert geometry[-1] == 7 | 1 << 3
+        assert len(geometry) == 11
+
+    response = client.get(
+        f"{URL}/{layer_id}/tiles/1/1/1.mvt"
+    )
+    assert response.status_code == 200
+    assert response.content == b""
+
+    response = client.get(
+        f"{URL}/{layer_id}/tiles/1/2/0.mvt"
+    )
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": "Tile 1/2/0 does not exist"
+    }
+
+
+def test_get_layer_tile_from_pyramid(
+    session: Session, client: TestClient
+):
+    file = generate_geojson_in_memory(
+        {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "properties": {
+                        "name": "line"
+                    },
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": [
+                            [20, 20],
+                            [40, 30],
+                        ],
+                    },
+                }
+            ],
+        }
+    )
+    response = client.post(
+        f"{URL}/create_layer?layer_name=pyramid",
+        data={"type": "multipart/form-data"},
+        files={"file": file},
+    )
+    layer_id = response.json()["id"]
+    object_name = session.get(
+        Layer, ident=layer_id
+    ).object_name
+    assert session.exec(
+        select(ObjectIngestion).where(
+            ObjectIngestion.object_name
+            == object_name
+        )
+    ).one()
+
+    while IngestQueuedObjects(
+        session=session
+    ).execute():
+        pass
+    session.expire_all()
+    assert not session.exec(
+        select(ObjectIngestion)
+    ).all()
+    assert (
+        session.get(
+            LayerBlob, ident=object_name
+        ).tiles_max_zoom
+        == 12
+    )
+
+    # tiles of the pyramid don't need the spatial index
+    minio_client = get_minio_initializer()
+    minio_client.delete_file(
+        f"{object_name}.rtree"
+    )
+    response = client.get(
+        f"{URL}/{layer_id}/tiles/3/4/3.mvt"
+    )
+    assert response.status_code == 200
+    (layer,) = decode_protobuf(response.content)[
+        3
+    ]
+    layer = decode_protobuf(layer)
+    assert layer[1] == [b"features"]
+    assert layer[3] == [b"name"]
+
+    response = client.get(
+        f"{URL}/{layer_id}/tiles/3/0/0.mvt"
+    )
+    assert response.status_code == 200
+    assert response.content == b""
+    assert not minio_client.stat_file(
+        f"{object_name}.rtree"
+    )
+
+    # deeper tiles are encoded on the fly
+    response = client.get(
+        f"{URL}/{layer_id}/tiles/13/4551/3631.mvt"
+    )
+    assert response.status_code == 200
+    assert minio_client.stat_file(
+        f"{object_name}.rtree"
+    )
+
+
+def test_get_simplified_layer_content(
+    session: Session, client: TestClient
+):
+    line = [
+        [index / 100, (index % 2) / 10000]
+        for index in range(1000)
+    ]
+    file = generate_geojson_in_memory(
+        {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "properties": {
+                        "name": "dense line"
+                    },
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": line,
+                    },
+                }
+            ],
+        }
+    )
+    response = client.post(
+        f"{URL}/create_layer?layer_name=simplified",
+        data={
+            "type": "multipart/form-data",
+            "compress": True,
+        },
+        files={"file": file},
+    )
+    layer_id = response.json()["id"]
+
+    # full content is served until the layer is ingested
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}&zoom=0"
+    )
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    (feature,) = response.json()["features"]
+    assert (
+        feature["geometry"]["coordinates"] == line
+    )
+
+    while IngestQueuedObjects(
+        session=session
+    ).execute():
+        pass
+
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}&zoom=0"
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    (feature,) = response.json()["features"]
+    assert feature["properties"] == {
+        "name": "dense line"
+    }
+    assert feature["geometry"]["coordinates"] == [
+        line[0],
+        line[-1],
+    ]
+
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}&tolerance=0.00001"
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] == etag
+
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layer_id}&zoom=0&tolerance=1"
+    )
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": "Only one of zoom and tolerance can be set"
+    }
+
+
+def test_ingest_kml_and_gpx_layers(
+    session: Session, client: TestClient
+):
+    kml = io.BytesIO(
+        b"""<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2"><Document>
+<Placemark><name>tower</name>
+<ExtendedData><Data name="height"><value>30</value></Data></ExtendedData>
+<Point><coordinates>10.5,20.5,0</coordinates></Point></Placemark>
+<Placemark><name>field</name><Polygon><outerBoundaryIs><LinearRing>
+<coordinates>30,30 31,30 31,31 30,31 30,30</coordinates>
+</LinearRing></outerBoundaryIs></Polygon></Placemark>
+</Document></kml>"""
+    )
+    kml.name = "places.kml"
+    gpx = io.BytesIO(
+        b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+<wpt lat="20.5" lon="10.5"><name>camp</name></wpt>
+<trk><name>walk</name><trkseg>
+<trkpt lat="20" lon="10"><ele>100</ele></trkpt>
+<trkpt lat="21" lon="11"><ele>120</ele></trkpt>
+</trkseg></trk>
+</gpx>"""
+    )
+    gpx.name = "walk.gpx"
+
+    layer_ids = []
+    for file in (kml, gpx):
+        response = client.post(
+            f"{URL}/create_layer?layer_name={file.name}",
+            data={"type": "multipart/form-data"},
+            files={"file": file},
+        )
+        assert response.status_code == 200
+        layer_ids.append(response.json()["id"])
+    kml_layer_id, gpx_layer_id = layer_ids
+
+    while IngestQueuedObjects(
+        session=session
+    ).execute():
+        pass
+    session.expire_all()
+    for layer_id in layer_ids:
+        layer = session.get(Layer, ident=layer_id)
+        assert layer.features_object_name == (
+            f"{layer.object_name}.rtree"
+        )
+        assert (
+            session.get(
+                LayerBlob, ident=layer.object_name
+            ).simplified_max_zoom
+            is None
+        )
+
+    response = client.get(
+        f"{URL}/{kml_layer_id}/features",
+        params={"bbox": "10,20,11,21"},
+    )
+    assert response.status_code == 200
+    assert response.json()["features"] == [
+        {
+            "type": "Feature",
+            "properties": {
+                "name": "tower",
+                "height": "30",
+            },
+            "geometry": {
+                "type": "Point",
+                "coordinates": [10.5, 20.5, 0],
+            },
+        }
+    ]
+
+    response = client.get(
+        f"{URL}/{gpx_layer_id}/features",
+        params={"bbox": "10.9,20.9,12,22"},
+    )
+    assert response.status_code == 200
+    (feature,) = response.json()["features"]
+    assert feature["properties"] == {
+        "name": "walk"
+    }
+    assert feature["geometry"] == {
+        "type": "MultiLineString",
+        "coordinates": [
+            [[10, 20, 100], [11, 21, 120]]
+        ],
+    }
+
+    response = client.get(
+        f"{URL}/{kml_layer_id}/tiles/3/4/3.mvt"
+    )
+    assert response.status_code == 200
+    (layer,) = decode_protobuf(response.content)[
+        3
+    ]
+    assert len(decode_protobuf(layer)[2]) == 2
+
+    # layers created later are linked by the ingest of their reference
+    kml.seek(0)
+    response = client.post(
+        f"{URL}/create_layer?layer_name=places_copy",
+        data={"type": "multipart/form-data"},
+        files={"file": ("places.kml", kml)},
+    )
+    layer_id = response.json()["id"]
+    while IngestQueuedObjects(
+        session=session
+    ).execute():
+        pass
+    session.expire_all()
+    layer = session.get(Layer, ident=layer_id)
+    assert layer.features_object_name == (
+        f"{layer.object_name}.rtree"
+    )
+
+
+def test_pmtiles_archive():
+    assert [
+        zxy_to_tile_id(*tile)
+        for tile in [
+            (0, 0, 0),
+            (1, 0, 0),
+            (1, 0, 1),
+            (1, 1, 1),
+            (1, 1, 0),
+            (2, 0, 0),
+        ]
+    ] == [0, 1, 2, 3, 4, 5]
+
+    tiles = {}
+    for z in range(7):
+        for x in range(2**z):
+            for y in range(2**z):
+                tiles[(z, x, y)] = b"tile %d" % (
+                    x % 3
+                )
+    writer = PMTilesWriter(tile_data=io.BytesIO())
+    for tile in sorted(
+        tiles,
+        key=lambda tile: zxy_to_tile_id(*tile),
+    ):
+        if tile != (6, 1, 1):
+            writer.add_tile(*tile, tiles[tile])
+    with pytest.raises(ValueError):
+        writer.add_tile(0, 0, 0, b"tile")
+
+    archive = io.BytesIO()
+    writer.write(
+        file=archive,
+        metadata={},
+        bounds=(-180, -85, 180, 85),
+    )
+    data = archive.getvalue()
+    reader = PMTilesReader(
+        read_range=lambda offset, length: data[
+            offset : offset + length
+        ]
+    )
+    assert reader.max_zoom == 6
+    for tile, content in tiles.items():
+        if tile == (6, 1, 1):
+            assert reader.get_tile(*tile) is None
+        else:
+            assert (
+                reader.get_tile(*tile) == content
+            )
+    assert reader.get_tile(7, 0, 0) is None
+
+
+def test_clip_and_simplify_geometry():
+    ring = np.array(
+        [
+            [-10, -10],
+            [10, -10],
+            [10, 10],
+            [-10, 10],
+        ],
+        dtype=float,
+    )
+    clipped_ring = clip_ring(ring, 0, 5)
+    assert get_ring_area(clipped_ring) == 25
+    assert set(map(tuple, clipped_ring)) == {
+        (0, 0),
+        (5, 0),
+        (5, 5),
+        (0, 5),
+    }
+
+    line = np.array(
+        [
+            [-5, 1],
+            [2, 1],
+            [2, 20],
+            [3, 20],
+            [3, 2],
+        ],
+        dtype=float,
+    )
+    parts = clip_line(line, 0, 10)
+    assert [part.tolist() for part in parts] == [
+        [[0, 1], [2, 1], [2, 10]],
+        [[3, 10], [3, 2]],
+    ]
+
+    points = np.array(
+        [
+            [0, 0],
+            [1, 0.1],
+            [2, -0.1],
+            [3, 5],
+            [4, 0],
+        ],
+        dtype=float,
+    )
+    assert simplify_coordinates(
+        points, 0.5
+    ).tolist() == [
+        [0, 0],
+        [2, -0.1],
+        [3, 5],
+        [4, 0],
+    ]
+
+
+def test_get_layers_not_modified(
+    session: Session, client: TestClient
+):
+    response = client.get(f"{URL}/get_layers")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    response = client.get(
+        f"{URL}/get_layers",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    response = client.patch(
+        f"{URL}/update_layer/1",
+        json={"folder_id": None},
+    )
+    assert response.status_code == 200
+
+    response = client.get(
+        f"{URL}/get_layers",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def generate_archive_in_memory(
+    members: dict[str, bytes], archive_type: str
+):
+    file = io.BytesIO()
+    if archive_type == "zip":
+        with zipfile.ZipFile(
+            file, "w"
+        ) as archive:
+            for name, content in members.items():
+                archive.writestr(name, content)
+    else:
+        with tarfile.open(
+            fileobj=file, mode="w:gz"
+        ) as archive:
+            for name, content in members.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                archive.addfile(
+                    info, io.BytesIO(content)
+                )
+    file.seek(0)
+    file.name = f"layers.{archive_type}"
+    return file
+
+
+@pytest.mark.parametrize(
+    "archive_type", ["zip", "tar.gz"]
+)
+def test_import_layers(
+    session: Session,
+    client: TestClient,
+    archive_type: str,
+):
+    geojson = (
+        generate_geojson_in_memory().getvalue()
+    )
+    archive = generate_archive_in_memory(
+        {
+            "points.geojson": geojson,
+            "roads/main.geojson": geojson,
+            "roads/rivers/river.kml": b"<kml></kml>",
+            "roads/readme.txt": b"readme",
+            "other/first_layer.geojson": geojson,
+            "__MACOSX/._points.geojson": b"",
+        },
+        archive_type,
+    )
+
+    response = client.post(
+        f"{URL}/import_layers",
+        data={"compress": True},
+        files={"file": archive},
+    )
+    assert response.status_code == 200
+    result = response.json()
+
+    folders = {
+        folder["name"]: folder
+        for folder in result["folders"]
+    }
+    assert set(folders) == {"roads", "rivers"}
+    assert folders["roads"]["parent_id"] is None
+    assert (
+        folders["rivers"]["parent_id"]
+        == folders["roads"]["id"]
+    )
+
+    layers = {
+        layer["name"]: layer
+        for layer in result["layers"]
+    }
+    assert set(layers) == {
+        "points",
+        "main",
+        "river",
+    }
+    assert layers["points"]["folder_id"] is None
+    assert (
+        layers["main"]["folder_id"]
+        == folders["roads"]["id"]
+    )
+    assert (
+        layers["river"]["folder_id"]
+        == folders["rivers"]["id"]
+    )
+
+    assert sorted(
+        result["failures"],
+        key=lambda failure: failure["member"],
+    ) == [
+        {
+            "member": "other/first_layer.geojson",
+            "detail": "Layer with name first_layer is already exists",
+        },
+        {
+            "member": "roads/readme.txt",
+            "detail": "File content type .txt is not available as geo file",
+        },
+    ]
+
+    object_name = session.get(
+        Layer, ident=layers["points"]["id"]
+    ).object_name
+    assert (
+        session.get(
+            Layer, ident=layers["main"]["id"]
+        ).object_name
+        == object_name
+    )
+    assert (
+        session.get(
+            LayerBlob, ident=object_name
+        ).ref_count
+        == 2
+    )
+    assert (
+        session.get(
+            Layer, ident=layers["river"]["id"]
+        ).content_encoding
+        == "gzip"
+    )
+
+    response = client.get(
+        f"{URL}/get_layer_content?layer_id={layers['points']['id']}"
+    )
+    assert response.status_code == 200
+    assert response.content == geojson
+
+
+def test_import_layers_into_existing_folders(
+    session: Session, client: TestClient
+):
+    folder = Folder(
+        name="target",
+        created_by="test_client",
+        modified_by="test_client",
+    )
+    session.add(folder)
+    session.commit()
+    session.add(
+        Folder(
+            name="existing",
+            parent_id=folder.id,
+            created_by="test_client",
+            modified_by="test_client",
+        )
+    )
+    session.add(
+        Folder(
+            name="taken",
+            created_by="test_client",
+            modified_by="test_client",
+        )
+    )
+    session.commit()
+
+    archive = generate_archive_in_memory(
+        {
+            "existing/imported.geojson": generate_geojson_in_memory().getvalue(),
+            "taken/skipped.geojson": b"{}",
+        },
+        "zip",
+    )
+    response = client.post(
+        f"{URL}/import_layers",
+        data={"folder_id": folder.id},
+        files={"file": archive},
+    )
+    assert response.status_code == 200
+    result = response.json()
+
+    assert result["folders"] == []
+    assert [
+        layer["name"]
+        for layer in result["layers"]
+    ] == ["imported"]
+    assert result["failures"] == [
+        {
+            "member": "taken/skipped.geojson",
+            "detail": "Folder with name taken is already exists",
+        }
+    ]
+
+
+def test_import_layers_corrupted_member(
+    session: Session, client: TestClient
+):
+    geojson = (
+        generate_geojson_in_memory().getvalue()
+    )
+    corrupted_content = b"corrupted" * 16
+    archive = generate_archive_in_memory(
+        {
+            "points.geojson": geojson,
+            "corrupted.geojson": corrupted_content,
+        },
+        "zip",
+    )
+    archive = io.BytesIO(
+        archive.getvalue().replace(
+            corrupted_content,
+            corrupted_content[::-1],
+        )
+    )
+    archive.name = "layers.zip"
+
+    response = client.post(
+        f"{URL}/import_layers",
+        files={"file": archive},
+    )
+    assert response.status_code == 200
+    result = response.json()
+
+    assert [
+        layer["name"]
+        for layer in result["layers"]
+    ] == ["points"]
+    assert [
+        failure["member"]
+        for failure in result["failures"]
+    ] == ["corrupted.geojson"]
+    assert result["failures"][0][
+        "detail"
+    ].startswith(
+        "Member corrupted.geojson can't be extracted"
+    )
+
+
+def test_import_layers_not_archive(
+    session: Session, client: TestClient
+):
+    response = client.post(
+        f"{URL}/import_layers",
+        files={
+            "file": generate_geojson_in_memory()
+        },
+    )
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": "File is not a zip or tar archive"
+    }
+
+
+def test_storage_operation_timeout():
+    async_minio_client = AsyncMinioInitializer(
+        minio_client=get_minio_initializer(),
+        executor=ThreadPoolExecutor(
+            max_workers=1
+        ),
+        operation_timeout=0.01,
+    )
+    with pytest.raises(StorageOperationTimeout):
+        asyncio.run(
+            async_minio_client.run_in_executor(
+                functools.partial(time.sleep, 0.2)
+            )
+        )
+
+
+def test_layer_ingest_skips_large_objects(
+    session: Session, client: TestClient, mocker
+):
+    point = {
+        "type": "Feature",
+        "properties": {},
+        "geometry": {
+            "type": "Point",
+            "coordinates": [10, 10],
+        },
+    }
+    file = generate_geojson_in_memory(
+        {
+            "type": "FeatureCollection",
+            "features": [point] * 1000,
+            "name": "large_layer",
+        }
+    )
+    response = client.post(
+        f"{URL}/create_layer?layer_name=large_layer",
+        data={
+            "type": "multipart/form-data",
+            "compress": True,
+        },
+        files={"file": file},
+    )
+    assert response.status_code == 200
+    layer_id = response.json()["id"]
+    object_name = session.get(
+        Layer, ident=layer_id
+    ).object_name
+
+    # compressed object fits the limit, its decoded content doesn't
+    max_size = len(file.getvalue()) - 1
+    assert (
+        session.get(
+            LayerBlob, ident=object_name
+        ).size
+        < max_size
+    )
+    mocker.patch(
+        "layer_ingest.processors.LAYER_INGEST_MAX_SIZE",
+        new=max_size,
+    )
+    while IngestQueuedObjects(
+        session=session
+    ).execute():
+        pass
+
+    session.expire_all()
+    assert not session.exec(
+        select(ObjectIngestion)
+    ).all()
+    assert not session.get(
+        Layer, ident=layer_id
+    ).features_object_name
@@ -0,0 +1,234 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from config.test_config import (
+    TESTS_MINIO_URL,
+    TESTS_MINIO_BUCKET,
+)
+from models import (
+    Layer,
+    LayerBlob,
+    ObjectDeletion,
+    UploadSession,
+)
+from upload_session_router.constants import (
+    MIN_PART_SIZE,
+)
+
+URL = "/api/layers/v1/upload_sessions"
+
+
+def create_upload_session(
+    client: TestClient,
+    layer_name: str = "data.geojson",
+    filename: str = "data.geojson",
+):
+    return client.post(
+        f"{URL}/create_upload_session",
+        json={
+            "layer_name": layer_name,
+            "folder_id": None,
+            "filename": filename,
+        },
+    )
+
+
+def test_create_upload_session(
+    session: Session, client: TestClient
+):
+    response = create_upload_session(client)
+    assert response.status_code == 200
+
+    real_response = response.json()
+    assert session.get(
+        UploadSession, ident=real_response["id"]
+    )
+
+    assert (
+        real_response["layer_name"]
+        == "data.geojson"
+    )
+    assert (
+        real_response["filename"]
+        == "data.geojson"
+    )
+    assert real_response["received_parts"] == []
+    assert real_response["received_ranges"] == []
+
+
+def test_create_upload_session_with_not_available_type(
+    session: Session, client: TestClient
+):
+    response = create_upload_session(
+        client, filename="data.txt"
+    )
+
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": "File content type .txt is not available as geo file"
+    }
+
+
+def test_upload_part_and_complete_upload_session(
+    session: Session, client: TestClient
+):
+    upload_session_id = create_upload_session(
+        client
+    ).json()["id"]
+
+    content = json.dumps(
+        {
+            "type": "FeatureCollection",
+            "features": [],
+        }
+    ).encode()
+    response = client.put(
+        f"{URL}/upload_part/{upload_session_id}?part_number=1",
+        content=content,
+    )
+    assert response.status_code == 200
+
+    real_response = response.json()
+    assert real_response["received_ranges"] == [
+        [1, 1]
+    ]
+    assert real_response["received_parts"][0][
+        "size"
+    ] == len(content)
+
+    response = client.post(
+        f"{URL}/complete_upload_session/{upload_session_id}"
+    )
+    assert response.status_code == 200
+
+    real_response = response.json()
+    cut_file_link = f"http://{TESTS_MINIO_URL}/{TESTS_MINIO_BUCKET}/{upload_session_id}/data.geojson"
+    assert (
+        real_response["file_link"].split("?")[0]
+        == cut_file_link
+    )
+    assert session.get(
+        Layer, ident=real_response["id"]
+    )
+    assert not session.get(
+        UploadSession, ident=upload_session_id
+    )
+
+
+def test_complete_upload_session_with_missing_parts(
+    session: Session, client: TestClient
+):
+    upload_session_id = create_upload_session(
+        client
+    ).json()["id"]
+
+    response = client.put(
+        f"{URL}/upload_part/{upload_session_id}?part_number=2",
+        content=b"{}",
+    )
+    assert response.status_code == 200
+
+    response = client.post(
+        f"{URL}/complete_upload_session/{upload_session_id}"
+    )
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": "Parts [1] were not uploaded"
+    }
+
+
+def test_get_not_exists_upload_session(
+    session: Session, client: TestClient
+):
+    response = client.get(
+        f"{URL}/get_upload_session/not_exists"
+    )
+
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": "Upload session with id not_exists does not exists"
+    }
+
+
+def test_delete_upload_session(
+    session: Session, client: TestClient
+):
+    upload_session_id = create_upload_session(
+        client
+    ).json()["id"]
+
+    response = client.delete(
+        f"{URL}/delete_upload_session/{upload_session_id}"
+    )
+    assert response.status_code == 200
+    assert not session.get(
+        UploadSession, ident=upload_session_id
+    )
+
+
+def test_complete_upload_session_with_small_parts(
+    session: Session, client: TestClient
+):
+    upload_session_id = create_upload_session(
+        client
+    ).json()["id"]
+
+    for part_number in (1, 2):
+        response = client.put(
+            f"{URL}/upload_part/{upload_session_id}?part_number={part_number}",
+            content=b"{}",
+        )
+        assert response.status_code == 200
+
+    response = client.post(
+        f"{URL}/complete_upload_session/{upload_session_id}"
+    )
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": f"Parts [1] are smaller than {MIN_PART_SIZE} bytes, "
+        "only the last part can be smaller"
+    }
+    assert session.get(
+        UploadSession, ident=upload_session_id
+    )
+
+
+def test_complete_upload_session_layer_not_created(
+    session: Session, client: TestClient, mocker
+):
+    upload_session_id = create_upload_session(
+        client
+    ).json()["id"]
+    response = client.put(
+        f"{URL}/upload_part/{upload_session_id}?part_number=1",
+        content=b"{}",
+    )
+    assert response.status_code == 200
+
+    mocker.patch(
+        "layers_router.processors.save_layer_and_return",
+        side_effect=RuntimeError(
+            "layer not saved"
+        ),
+    )
+    with pytest.raises(RuntimeError):
+        client.post(
+            f"{URL}/complete_upload_session/{upload_session_id}"
+        )
+
+    session.expire_all()
+    assert not session.get(
+        UploadSession, ident=upload_session_id
+    )
+    assert (
+        session.exec(select(ObjectDeletion))
+        .one()
+        .object_name
+        == f"{upload_session_id}/data.geojson"
+    )
+    assert not session.exec(
+        select(LayerBlob)
+    ).all()